@@ -0,0 +1,188 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+
+from percentiles import percentile_ms
+
+# ---- Configuration ----
+# Requests allowed to run at once per pool; the adaptive limit stays at or
+# below these. "interview" covers the LLM-bound routes (start_session and
+# turns), "speech" the STT and TTS routes.
+INTERVIEW_LIMIT = int(os.getenv("ADMISSION_INTERVIEW_LIMIT", "32"))
+SPEECH_LIMIT = int(os.getenv("ADMISSION_SPEECH_LIMIT", "8"))
+MIN_LIMIT = 2
+# How long a request may wait for a slot before it is shed
+TURN_MAX_WAIT_MS = float(os.getenv("ADMISSION_MAX_WAIT_MS", "2000"))
+START_MAX_WAIT_MS = float(os.getenv("ADMISSION_START_MAX_WAIT_MS", "500"))
+# Share of the limit new sessions may not use, kept for interviews in progress
+START_RESERVE = float(os.getenv("ADMISSION_START_RESERVE", "0.25"))
+# The limit is cut while admitted requests take longer than this (p90 over a
+# window) and grows back while they don't; 0 keeps the limits fixed.
+TARGET_MS = float(os.getenv("ADMISSION_TARGET_MS", "8000"))
+ADAPT_WINDOW_SECONDS = 1.0
+DECREASE_FACTOR = 0.8
+MAX_RETRY_AFTER_SECONDS = 30
+LATENCY_SAMPLES = 1000
+
+# Priorities; lower runs first
+TURN = 0
+START = 1
+PRIORITY_NAMES = {TURN: "turn", START: "start"}
+
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted; retry_after is in whole seconds"""
+
+    def __init__(self, pool, priority, retry_after):
+        super().__init__(f"{pool} is overloaded; retry in {retry_after}s")
+        self.pool = pool
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request's slot; release it (or leave the with block) when done"""
+
+    def __init__(self, controller, priority, wait_seconds):
+        self.controller = controller
+        self.priority = priority
+        self.wait_seconds = wait_seconds
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """Bounds the requests in flight in one pool and sheds what can't start in time.
+
+    A request that finds every slot taken waits up to its priority's max
+    wait, then is rejected with Overloaded instead of queueing without
+    bound. New sessions wait behind turns of interviews in progress and
+    can't take the last START_RESERVE of the slots, so a burst of new
+    patients doesn't stall the ones already talking.
+
+    The limit adapts (AIMD): it is cut by DECREASE_FACTOR when admitted
+    requests run slower than target_ms, which means the backends behind
+    them are saturated, and grows by one per window while they meet the
+    target and the pool is full.
+    """
+
+    def __init__(self, name, limit, min_limit=MIN_LIMIT, turn_max_wait_ms=None,
+                 start_max_wait_ms=None, start_reserve=None, target_ms=None):
+        self.name = name
+        self.max_limit = limit
+        self.min_limit = min(min_limit, limit)
+        self.limit = float(limit)
+        self.max_wait = {
+            TURN: (TURN_MAX_WAIT_MS if turn_max_wait_ms is None else turn_max_wait_ms) / 1000,
+            START: (START_MAX_WAIT_MS if start_max_wait_ms is None else start_max_wait_ms) / 1000,
+        }
+        self.start_reserve = START_RESERVE if start_reserve is None else start_reserve
+        self.target = (TARGET_MS if target_ms is None else target_ms) / 1000
+        self.cond = threading.Condition()
+        self.inflight = 0
+        self.waiting = {TURN: 0, START: 0}
+        self.admitted = {TURN: 0, START: 0}
+        self.rejected = {TURN: 0, START: 0}
+        self.waits = deque(maxlen=LATENCY_SAMPLES)
+        self.service_times = deque(maxlen=LATENCY_SAMPLES)
+        self.window_start = time.monotonic()
+        self.window = []
+        self.window_saturated = False
+        self.mean_service = None
+
+    # Called with self.cond held
+    def _capacity(self, priority):
+        limit = max(1, int(self.limit))
+        if priority == START:
+            return limit - math.ceil(limit * self.start_reserve)
+        return limit
+
+    def _can_run(self, priority):
+        if priority == START and self.waiting[TURN]:
+            return False
+        return self.inflight < self._capacity(priority)
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: queued work over the limit, times service time"""
+        service = self.mean_service or 1.0
+        queued = sum(self.waiting.values()) + 1
+        seconds = math.ceil(service * queued / max(1, int(self.limit)))
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, seconds))
+
+    def admit(self, priority=TURN):
+        """Take a slot, waiting up to the priority's max wait; raises Overloaded"""
+        arrived = time.monotonic()
+        deadline = arrived + self.max_wait[priority]
+        with self.cond:
+            if not self._can_run(priority):
+                self.window_saturated = True
+                self.waiting[priority] += 1
+                try:
+                    while not self._can_run(priority):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected[priority] += 1
+                            raise Overloaded(self.name, priority, self.retry_after())
+                        self.cond.wait(remaining)
+                finally:
+                    self.waiting[priority] -= 1
+            self.inflight += 1
+            self.admitted[priority] += 1
+            wait = time.monotonic() - arrived
+            self.waits.append(wait)
+        return Ticket(self, priority, wait)
+
+    def release(self, ticket):
+        service = time.monotonic() - ticket.started
+        with self.cond:
+            self.inflight -= 1
+            self.service_times.append(service)
+            self.mean_service = service if self.mean_service is None else 0.9 * self.mean_service + 0.1 * service
+            self._adapt(service)
+            self.cond.notify_all()
+
+    def _adapt(self, service):
+        if not self.target:
+            return
+        self.window.append(service)
+        now = time.monotonic()
+        if now - self.window_start < ADAPT_WINDOW_SECONDS:
+            return
+        slow = sorted(self.window)[int(len(self.window) * 0.9)] > self.target
+        if slow:
+            self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+        elif self.window_saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.window_start, self.window, self.window_saturated = now, [], False
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "limit": int(self.limit),
+                "max_limit": self.max_limit,
+                "inflight": self.inflight,
+                "waiting": {PRIORITY_NAMES[p]: n for p, n in self.waiting.items()},
+                "admitted": {PRIORITY_NAMES[p]: n for p, n in self.admitted.items()},
+                "rejected": {PRIORITY_NAMES[p]: n for p, n in self.rejected.items()},
+                "wait_p50_ms": percentile_ms(self.waits, 0.50),
+                "wait_p99_ms": percentile_ms(self.waits, 0.99),
+                "service_p50_ms": percentile_ms(self.service_times, 0.50),
+                "service_p99_ms": percentile_ms(self.service_times, 0.99),
+            }
+
+
+interview = AdmissionController("interview", INTERVIEW_LIMIT)
+speech = AdmissionController("speech", SPEECH_LIMIT)
@@ -0,0 +1,122 @@
+import time
+import threading
+
+import pytest
+
+import admission
+import voice_api
+from admission import START, TURN, AdmissionController, Overloaded
+
+
+def controller(limit, **options):
+    options.setdefault("turn_max_wait_ms", 1000)
+    options.setdefault("start_max_wait_ms", 0)
+    options.setdefault("target_ms", 0)
+    return AdmissionController("test", limit, **options)
+
+
+def test_requests_beyond_the_limit_wait_then_shed():
+    pool = controller(2, turn_max_wait_ms=50)
+    first, second = pool.admit(), pool.admit()
+
+    start = time.monotonic()
+    with pytest.raises(Overloaded) as shed:
+        pool.admit()
+    assert 0.04 < time.monotonic() - start < 0.5
+    assert shed.value.retry_after >= 1
+
+    # A waiting turn gets the slot as soon as one is released
+    threading.Timer(0.02, first.release).start()
+    with pool.admit() as ticket:
+        assert ticket.wait_seconds > 0.01
+        assert pool.snapshot()["inflight"] == 2
+    second.release()
+    snapshot = pool.snapshot()
+    assert snapshot["inflight"] == 0
+    assert snapshot["admitted"] == {"turn": 3, "start": 0}
+    assert snapshot["rejected"] == {"turn": 1, "start": 0}
+
+
+def test_new_sessions_cannot_take_the_reserved_slots():
+    pool = controller(4, start_reserve=0.25)
+    tickets = [pool.admit(START) for _ in range(3)]
+    with pytest.raises(Overloaded):
+        pool.admit(START)
+    tickets.append(pool.admit(TURN))
+    for ticket in tickets:
+        ticket.release()
+
+
+def test_waiting_turns_go_before_new_sessions():
+    pool = controller(1, start_max_wait_ms=1000, start_reserve=0)
+    held = pool.admit()
+    order = []
+
+    def wait_for(priority, name):
+        with pool.admit(priority):
+            order.append(name)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=wait_for, args=(START, "start"))]
+    threads[0].start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=wait_for, args=(TURN, "turn")))
+    threads[1].start()
+    time.sleep(0.02)
+    held.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["turn", "start"]
+
+
+def test_limit_adapts_to_slow_backends(monkeypatch):
+    monkeypatch.setattr(admission, "ADAPT_WINDOW_SECONDS", 0.0)
+    pool = controller(10, target_ms=5, min_limit=2)
+    for _ in range(3):
+        with pool.admit():
+            time.sleep(0.01)
+    assert pool.snapshot()["limit"] == 5  # 10 * 0.8^3
+
+    pool.target = 1.0
+    pool.window_saturated = True
+    with pool.admit():
+        pass
+    assert pool.snapshot()["limit"] == 6
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    pool = controller(2, turn_max_wait_ms=20)
+    monkeypatch.setattr(admission, "interview", pool)
+    return pool
+
+
+def test_overloaded_routes_answer_503_with_retry_after(session_dir, fake_llm, small_pool):
+    held = [small_pool.admit(), small_pool.admit()]
+    client = voice_api.app.test_client()
+    response = client.post("/api/start-session/busy")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+    response = client.post("/api/process-response/busy", json={"response": "a headache"})
+    assert response.status_code == 503
+    assert client.get("/api/admission/stats").get_json()["interview"]["rejected"] == {"turn": 1, "start": 1}
+    for ticket in held:
+        ticket.release()
+
+
+def test_shed_turns_can_repeat_the_question(session_dir, fake_llm, small_pool, monkeypatch):
+    monkeypatch.setattr(voice_api, "ADMISSION_FALLBACK_QUESTIONS", True)
+    held = [small_pool.admit(), small_pool.admit()]
+    client = voice_api.app.test_client()
+    response = client.post(
+        "/api/process-response/degraded", json={"response": "a headache", "current_field": "duration"}
+    )
+    body = response.get_json()
+    assert response.status_code == 200 and body["degraded"] is True
+    assert body["current_field"] == "duration" and "duration" in body["question"]
+    assert "Retry-After" in response.headers
+    assert fake_llm["count"] == 0
+    assert voice_api.load_schema("degraded")["duration"] == ""
+    for ticket in held:
+        ticket.release()
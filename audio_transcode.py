@@ -0,0 +1,248 @@
+import io
+import os
+import time
+import wave
+import shutil
+import warnings
+import threading
+import subprocess
+
+# ---- Configuration ----
+FFMPEG = os.getenv("FFMPEG_PATH") or shutil.which("ffmpeg") or "ffmpeg"
+STT_SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit PCM
+CHUNK_SIZE = 16 * 1024
+MAX_TRANSCODERS = int(os.getenv("MAX_TRANSCODERS", str(os.cpu_count() or 2)))
+
+# Encoder arguments per output format: (ffmpeg args, mimetype)
+OUTPUT_FORMATS = {
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "audio/ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"], "audio/mpeg"),
+    "wav": (["-c:a", "pcm_s16le", "-f", "wav"], "audio/wav"),
+}
+
+# Transcoding runs in ffmpeg child processes; request threads only pump pipes.
+# The semaphore bounds how many run at once so a burst of uploads can't
+# oversubscribe the CPU.
+_transcoders = threading.BoundedSemaphore(MAX_TRANSCODERS)
+
+
+class TranscodeError(Exception):
+    """Raised when audio cannot be decoded or encoded"""
+
+
+# ---- Stats ----
+class TranscodeStats:
+    """Wall time spent per second of audio, per operation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def record(self, operation, wall_seconds, audio_seconds, bytes_in, bytes_out):
+        with self.lock:
+            entry = self.totals.setdefault(operation, {
+                "count": 0, "wall_seconds": 0.0, "audio_seconds": 0.0, "bytes_in": 0, "bytes_out": 0
+            })
+            entry["count"] += 1
+            entry["wall_seconds"] += wall_seconds
+            entry["audio_seconds"] += audio_seconds
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+        if audio_seconds:
+            print(f"{operation}: {audio_seconds:.2f}s of audio in {wall_seconds * 1000:.1f} ms "
+                  f"({wall_seconds / audio_seconds * 1000:.1f} ms per audio second)")
+
+    def snapshot(self):
+        with self.lock:
+            report = {}
+            for operation, entry in self.totals.items():
+                report[operation] = dict(entry)
+                report[operation]["ms_per_audio_second"] = (
+                    round(entry["wall_seconds"] / entry["audio_seconds"] * 1000, 2)
+                    if entry["audio_seconds"] else None
+                )
+            return report
+
+
+stats = TranscodeStats()
+
+
+def ffmpeg_available():
+    """Whether the ffmpeg binary can be found"""
+    return shutil.which(FFMPEG) is not None
+
+
+def _pump(chunks, pipe, counter):
+    try:
+        for chunk in chunks:
+            counter[0] += len(chunk)
+            pipe.write(chunk)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+def iter_stream(stream, chunk_size=CHUNK_SIZE):
+    """Yield chunks from a file-like object without reading it all at once"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---- Decoding (browser -> STT) ----
+def _wav_to_pcm(data):
+    """Mono 16-bit PCM and sample rate from an integer PCM WAV, or (None, None).
+
+    Mono 16-bit frames are used as they are; 8/24/32-bit and stereo WAV are
+    converted here, as sr.AudioFile used to, so they don't need ffmpeg.
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width = wav.getnchannels(), wav.getsampwidth()
+            pcm, sample_rate = wav.readframes(wav.getnframes()), wav.getframerate()
+    except (wave.Error, EOFError):
+        return None, None
+    if channels == 1 and width == SAMPLE_WIDTH:
+        return pcm, sample_rate
+    if channels > 2:
+        return None, None
+    # Imported here rather than at module level to keep cold start fast;
+    # deprecated in 3.11-3.12, and provided by audioop-lts (a speechrecognition
+    # dependency) from 3.13
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+    if width == 1:
+        pcm = audioop.bias(pcm, 1, -128)  # 8-bit WAV is unsigned
+    if width != SAMPLE_WIDTH:
+        pcm = audioop.lin2lin(pcm, width, SAMPLE_WIDTH)
+    if channels == 2:
+        pcm = audioop.tomono(pcm, SAMPLE_WIDTH, 0.5, 0.5)
+    return pcm, sample_rate
+
+
+def decode_stream(chunks, content_type=""):
+    """Decode compressed audio (WebM/Opus, Ogg, MP3, WAV...) to mono 16-bit PCM.
+
+    Input is streamed into ffmpeg as it arrives and PCM is yielded as ffmpeg
+    produces it, so neither side is buffered whole and callers can act on
+    partial audio. Integer PCM WAV (mono or stereo, 8 to 32-bit) skips
+    ffmpeg entirely. Yields
+    (pcm_chunk, sample_rate).
+    """
+    start = time.perf_counter()
+    if "wav" in content_type:
+        data = b"".join(chunks)
+        pcm, sample_rate = _wav_to_pcm(data)
+        if pcm is not None:
+            audio_seconds = len(pcm) / (sample_rate * SAMPLE_WIDTH)
+            stats.record("decode", time.perf_counter() - start, audio_seconds, len(data), len(pcm))
+            yield pcm, sample_rate
+            return
+        chunks = [data]
+
+    with _transcoders:
+        try:
+            proc = subprocess.Popen(
+                [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+                 "-f", "s16le", "-ac", "1", "-ar", str(STT_SAMPLE_RATE), "pipe:1"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise TranscodeError("ffmpeg is not installed")
+        bytes_in = [0]
+        bytes_out = 0
+        writer = threading.Thread(target=_pump, args=(chunks, proc.stdin, bytes_in), daemon=True)
+        writer.start()
+        try:
+            while True:
+                pcm = proc.stdout.read1(CHUNK_SIZE)
+                if not pcm:
+                    break
+                bytes_out += len(pcm)
+                yield pcm, STT_SAMPLE_RATE
+        finally:
+            proc.stdout.close()
+            writer.join()
+            error = proc.stderr.read()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise TranscodeError(f"Could not decode audio: {error.decode(errors='replace').strip()}")
+
+    audio_seconds = bytes_out / (STT_SAMPLE_RATE * SAMPLE_WIDTH)
+    stats.record("decode", time.perf_counter() - start, audio_seconds, bytes_in[0], bytes_out)
+
+
+def decode_to_pcm(chunks, content_type=""):
+    """Decode a whole utterance to PCM. Returns (pcm_bytes, sample_rate)."""
+    pcm = bytearray()
+    sample_rate = STT_SAMPLE_RATE
+    for chunk, sample_rate in decode_stream(chunks, content_type):
+        pcm += chunk
+    return bytes(pcm), sample_rate
+
+
+# ---- Encoding (TTS -> browser) ----
+def wav_duration(path):
+    """Length of a WAV file in seconds, or 0 if it can't be read"""
+    try:
+        with wave.open(path) as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return 0.0
+
+
+def encode_file(path, output_format="opus", chunk_size=CHUNK_SIZE):
+    """Encode an audio file, yielding output chunks as ffmpeg produces them.
+
+    The source is read by ffmpeg straight from disk, so it is never loaded
+    into memory here.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise TranscodeError(f"Unsupported output format: {output_format}")
+    args, _ = OUTPUT_FORMATS[output_format]
+    audio_seconds = wav_duration(path)
+    bytes_in = os.path.getsize(path)
+
+    start = time.perf_counter()
+    if output_format == "wav" and audio_seconds:
+        with open(path, "rb") as f:
+            yield from iter_stream(f, chunk_size)
+        stats.record("encode_wav", time.perf_counter() - start, audio_seconds, bytes_in, bytes_in)
+        return
+
+    with _transcoders:
+        try:
+            proc = subprocess.Popen(
+                [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", path, *args, "pipe:1"],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise TranscodeError("ffmpeg is not installed")
+        bytes_out = 0
+        try:
+            while True:
+                chunk = proc.stdout.read1(chunk_size)
+                if not chunk:
+                    break
+                bytes_out += len(chunk)
+                yield chunk
+        finally:
+            proc.stdout.close()
+            error = proc.stderr.read()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise TranscodeError(f"Could not encode audio: {error.decode(errors='replace').strip()}")
+    stats.record(f"encode_{output_format}", time.perf_counter() - start, audio_seconds, bytes_in, bytes_out)
+
+
+def mimetype_for(output_format):
+    """Content type of an output format"""
+    return OUTPUT_FORMATS[output_format][1]
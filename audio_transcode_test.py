@@ -0,0 +1,89 @@
+import io
+import wave
+import struct
+import math
+
+import pytest
+
+import audio_transcode
+
+needs_ffmpeg = pytest.mark.skipif(
+    not audio_transcode.ffmpeg_available(), reason="ffmpeg is not installed"
+)
+
+
+def make_wav(seconds=1.0, sample_rate=16000, channels=1, width=2):
+    def sample(i):
+        value = int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+        if width == 1:
+            return struct.pack("<B", (value >> 8) + 128)
+        return (value << (8 * width - 16)).to_bytes(width, "little", signed=True)
+
+    frames = b"".join(sample(i) * channels for i in range(int(seconds * sample_rate)))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buf.getvalue()
+
+
+def test_mono_wav_decodes_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio_transcode, "FFMPEG", "/nonexistent/ffmpeg")
+    pcm, sample_rate = audio_transcode.decode_to_pcm([make_wav(0.5)], "audio/wav")
+
+    assert sample_rate == 16000
+    assert len(pcm) == 16000 * 2 // 2
+
+
+@pytest.mark.parametrize("channels,width", [(2, 2), (1, 1), (1, 3), (2, 4)])
+def test_other_wav_layouts_decode_without_ffmpeg(monkeypatch, channels, width):
+    monkeypatch.setattr(audio_transcode, "FFMPEG", "/nonexistent/ffmpeg")
+    expected, _ = audio_transcode.decode_to_pcm([make_wav(0.25)], "audio/wav")
+    pcm, sample_rate = audio_transcode.decode_to_pcm(
+        [make_wav(0.25, 22050 if channels == 2 else 16000, channels, width)], "audio/wav"
+    )
+
+    assert sample_rate == (22050 if channels == 2 else 16000)
+    assert len(pcm) == int(0.25 * sample_rate) * 2
+    if sample_rate == 16000:
+        # Within the 8-bit quantization step of the 16-bit original
+        samples = struct.unpack(f"<{len(pcm) // 2}h", pcm)
+        originals = struct.unpack(f"<{len(expected) // 2}h", expected)
+        assert max(abs(a - b) for a, b in zip(samples, originals)) <= 256
+
+
+def test_decode_without_ffmpeg_raises(monkeypatch):
+    monkeypatch.setattr(audio_transcode, "FFMPEG", "/nonexistent/ffmpeg")
+    with pytest.raises(audio_transcode.TranscodeError):
+        audio_transcode.decode_to_pcm([b"\x1aE\xdf\xa3webm"], "audio/webm")
+
+
+def test_wav_output_streams_file_in_chunks(tmp_path):
+    path = tmp_path / "speech.wav"
+    data = make_wav(1.0)
+    path.write_bytes(data)
+
+    chunks = list(audio_transcode.encode_file(str(path), "wav", chunk_size=4096))
+
+    assert len(chunks) > 1
+    assert b"".join(chunks) == data
+    assert audio_transcode.stats.snapshot()["encode_wav"]["audio_seconds"] >= 1.0
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("output_format", ["opus", "mp3"])
+def test_compressed_round_trip(tmp_path, output_format):
+    path = tmp_path / "speech.wav"
+    path.write_bytes(make_wav(1.0, sample_rate=22050, channels=2))
+
+    encoded = b"".join(audio_transcode.encode_file(str(path), output_format))
+    assert 0 < len(encoded) < path.stat().st_size
+
+    pcm, sample_rate = audio_transcode.decode_to_pcm(iter([encoded]), f"audio/{output_format}")
+    assert sample_rate == audio_transcode.STT_SAMPLE_RATE
+    assert abs(len(pcm) / (sample_rate * 2) - 1.0) < 0.1
+
+    snapshot = audio_transcode.stats.snapshot()
+    assert snapshot[f"encode_{output_format}"]["ms_per_audio_second"] is not None
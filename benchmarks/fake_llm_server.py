@@ -0,0 +1,343 @@
+"""Local OpenAI-compatible fake LLM server for benchmarks.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with a
+configurable latency distribution, token rate and error injection (each
+optionally per model, to exercise model routing and fallbacks), an optional
+concurrency capacity beyond which requests queue (to simulate a saturated
+provider), and
+answers the voice API's prompts with plausible canned content so interviews
+progress. GET /stats returns call counts; POST /stats/reset clears them.
+
+    python benchmarks/fake_llm_server.py --port 5055 --latency lognormal:5.3,0.4 --tokens-per-second 300
+    python benchmarks/fake_llm_server.py --model-latency llama-3.1-8b-instant=fixed:40 \
+        --model-latency llama-3.3-70b-versatile=lognormal:5.3,0.4
+    GROQ_BASE_URL=http://localhost:5055/v1 GROQ_API_KEY=fake python voice_api.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_distribution(spec):
+    """Parse a latency spec in milliseconds into a sampling function.
+
+    fixed:50 | uniform:20,80 | normal:60,15 | lognormal:4.1,0.5 (mu, sigma of ln ms)
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeLLMConfig:
+    """Behaviour of the fake server; mutable at runtime"""
+
+    def __init__(self, latency="fixed:0", tokens_per_second=0, error_rate=0.0,
+                 error_status=500, incomplete_rate=0.0, seed=None,
+                 model_latency=None, model_error_rate=None, verdict_style="exact", capacity=0):
+        self.latency = parse_distribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.incomplete_rate = incomplete_rate
+        self.random = random.Random(seed)
+        self.model_latency = {m: parse_distribution(spec) for m, spec in (model_latency or {}).items()}
+        self.model_error_rate = dict(model_error_rate or {})
+        self.verdict_style = verdict_style
+        # Completions served at once; later ones wait for a slot
+        self.capacity = threading.Semaphore(capacity) if capacity else None
+
+    def slot(self):
+        return self.capacity if self.capacity is not None else contextlib.nullcontext()
+
+    def latency_for(self, model):
+        return self.model_latency.get(model, self.latency)()
+
+    def error_rate_for(self, model):
+        return self.model_error_rate.get(model, self.error_rate)
+
+
+class FakeLLMStats:
+    """Thread-safe call counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.errors = 0
+            self.by_kind = {}
+            self.by_model = {}
+            self.verdicts = {"complete": 0, "incomplete": 0}
+
+    def record_verdict(self, complete):
+        with self.lock:
+            self.verdicts["complete" if complete else "incomplete"] += 1
+
+    def record(self, kind, error=False, model=None):
+        with self.lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+            if model:
+                self.by_model[model] = self.by_model.get(model, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {"calls": self.calls, "errors": self.errors,
+                    "by_kind": dict(self.by_kind), "by_model": dict(self.by_model),
+                    "verdicts": dict(self.verdicts)}
+
+
+# ---- Canned Completions ----
+def classify_prompt(messages):
+    """Guess which voice_api helper sent the request from its system prompt"""
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    # Both the JSON prompt and verdict_bench's legacy yes/no prompt
+    if "enough information to complete the field" in system:
+        return "completeness"
+    if "structured form data" in system:
+        return "summarize"
+    if "follow-up question" in system:
+        return "follow_up"
+    if "starting a standard patient intake" in system:
+        return "first_question"
+    return "transition"
+
+
+# Ways real models phrase a yes/no answer when not constrained
+LOOSE_VERDICTS = {
+    True: ["yes", "Yes.", "Yes", "YES", "Yes, the response is complete.", "**Yes**",
+           "yes - the patient gave a clear answer", "Complete."],
+    False: ["no", "No.", "No", "No, more detail is needed.", "**No**", "Incomplete."],
+}
+
+
+def render_verdict(complete, messages, config):
+    """Phrase a completeness answer according to config.verdict_style.
+
+    exact: bare "yes"/"no". loose: a random realistic phrasing. json: the
+    JSON object the prompt asks for. auto: json when the prompt asks for
+    JSON, else loose.
+    """
+    style = config.verdict_style
+    if style == "auto":
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        style = "json" if "JSON" in system else "loose"
+    if style == "json":
+        confidence = round(config.random.uniform(0.7, 1.0), 2)
+        return json.dumps({"complete": "yes" if complete else "no", "confidence": confidence})
+    if style == "loose":
+        return config.random.choice(LOOSE_VERDICTS[complete])
+    return "yes" if complete else "no"
+
+
+def canned_completion(kind, messages, config, stats=None):
+    user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    field_match = re.search(r"[Ff]ield(?: is)?: ['\"]?([\w ]+)", user) or re.search(r"field: '([\w ]+)'", user)
+    field = field_match.group(1).strip().replace("_", " ") if field_match else "your symptoms"
+    if kind == "completeness":
+        complete = config.random.random() >= config.incomplete_rate
+        if stats is not None:
+            stats.record_verdict(complete)
+        return render_verdict(complete, messages, config)
+    if kind == "summarize":
+        quoted = re.search(r'Response: "(.*)"', user, re.S)
+        return (quoted.group(1) if quoted else user)[:80]
+    if kind == "follow_up":
+        return f"Could you tell me a little more about your {field}?"
+    if kind == "first_question":
+        return f"Hello, thank you for joining. Could you tell me about your {field}?"
+    return f"Thank you for sharing that. Next, could you tell me about your {field}?"
+
+
+def count_tokens(text):
+    return max(1, len(text.split()))
+
+
+def make_handler(config, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self.send_json(200, stats.snapshot())
+            self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/stats/reset":
+                stats.reset()
+                return self.send_json(200, {"ok": True})
+            if not self.path.endswith("/chat/completions"):
+                return self.send_json(404, {"error": "not found"})
+
+            messages = body.get("messages", [])
+            kind = classify_prompt(messages)
+            model = body.get("model")
+            with config.slot():
+                time.sleep(config.latency_for(model) / 1000)
+
+            if config.random.random() < config.error_rate_for(model):
+                stats.record(kind, error=True, model=model)
+                return self.send_json(config.error_status, {
+                    "error": {"message": "Injected failure", "type": "server_error"}
+                })
+
+            content = canned_completion(kind, messages, config, stats)
+            prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+            completion_tokens = count_tokens(content)
+            stats.record(kind, model=model)
+
+            if body.get("stream"):
+                return self.stream(body, content, prompt_tokens, completion_tokens)
+
+            if config.tokens_per_second:
+                time.sleep(completion_tokens / config.tokens_per_second)
+            self.send_json(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+        def stream(self, body, content, prompt_tokens, completion_tokens):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_event(payload):
+                data = f"data: {payload}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                if config.tokens_per_second:
+                    time.sleep(1 / config.tokens_per_second)
+                delta = word if i == 0 else " " + word
+                write_event(json.dumps({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                }))
+            write_event(json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }))
+            write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_fake_llm_server(port=0, **config_kwargs):
+    """Start the fake server on a background thread; returns (server, config, stats)"""
+    config = FakeLLMConfig(**config_kwargs)
+    stats = FakeLLMStats()
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config, stats
+
+
+def parse_model_options(values):
+    """Parse repeated MODEL=VALUE options into a dict"""
+    options = {}
+    for value in values:
+        model, _, setting = value.partition("=")
+        options[model] = setting
+    return options
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", default="fixed:0", help="Latency distribution in ms")
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--incomplete-rate", type=float, default=0.0,
+                        help="Fraction of completeness checks answered 'no'")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SPEC",
+                        help="Latency distribution for one model (repeatable)")
+    parser.add_argument("--model-error-rate", action="append", default=[], metavar="MODEL=RATE",
+                        help="Error rate for one model (repeatable)")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Completions served concurrently; 0 for unlimited")
+    parser.add_argument("--verdict-style", default="exact", choices=["exact", "loose", "json", "auto"],
+                        help="How completeness answers are phrased")
+    args = parser.parse_args()
+
+    server, _, _ = start_fake_llm_server(
+        port=args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        incomplete_rate=args.incomplete_rate,
+        seed=args.seed,
+        model_latency=parse_model_options(args.model_latency),
+        model_error_rate={m: float(r) for m, r in parse_model_options(args.model_error_rate).items()},
+        verdict_style=args.verdict_style,
+        capacity=args.capacity,
+    )
+    print(f"Fake LLM server listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
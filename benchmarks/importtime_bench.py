@@ -0,0 +1,94 @@
+"""Cold-start benchmark for voice_api.py.
+
+Runs `python -X importtime -c "import voice_api"` in fresh interpreters and
+reports the cumulative import time of voice_api plus the slowest modules it
+pulls in. Use --max-ms to fail when startup regresses past a budget, and
+--json to compare results across commits.
+
+    python benchmarks/importtime_bench.py --runs 5 --max-ms 400
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must never be imported when voice_api is imported
+LAZY_MODULES = ["openai", "speech_recognition", "pyttsx3"]
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into {module: (self_us, cumulative_us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(module):
+    """Import the module in a fresh interpreter and return the parsed timings"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure voice_api import time")
+    parser.add_argument("--module", default="voice_api")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    totals_ms = [run[args.module][1] / 1000 for run in runs]
+    last = runs[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    eager = [name for name in LAZY_MODULES if name in last]
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(statistics.median(totals_ms), 2),
+        "min_ms": round(min(totals_ms), 2),
+        "max_ms": round(max(totals_ms), 2),
+        "slowest_self_ms": {name: round(self_us / 1000, 2) for name, (self_us, _) in slowest},
+        "eager_heavy_imports": eager,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{args.module}: median {report['median_ms']} ms "
+              f"(min {report['min_ms']}, max {report['max_ms']}) over {args.runs} runs")
+        print("Slowest modules (self time):")
+        for name, ms in report["slowest_self_ms"].items():
+            print(f"  {ms:8.2f} ms  {name}")
+        if eager:
+            print(f"Heavy modules imported eagerly: {', '.join(eager)}")
+
+    failed = bool(eager)
+    if args.max_ms is not None and report["median_ms"] > args.max_ms:
+        print(f"Import time {report['median_ms']} ms exceeds budget of {args.max_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
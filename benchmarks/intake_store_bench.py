@@ -0,0 +1,147 @@
+"""Query benchmark for the SQLite intake store.
+
+Seeds a scratch database with --sessions synthetic intakes (about 80%
+completed), then times the list and search queries clinicians use: the first
+page, a page deep into the results via the cursor, a time-window filter, and
+full-text searches. Also times the JSON bulk import when --import-files is
+given. Use --max-ms to fail when the slowest query's p95 regresses past a
+budget.
+
+    python benchmarks/intake_store_bench.py --sessions 100000 --max-ms 50
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import tempfile
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intake_store
+import session_store
+from intake_templates import registry as template_registry
+
+COMPLAINTS = ["headache", "migraine", "knee pain", "back pain", "cough", "fever", "rash",
+              "chest tightness", "dizziness", "sore throat", "abdominal pain", "fatigue"]
+ALLERGIES = ["none", "penicillin", "latex", "peanuts", "sulfa drugs", "shellfish"]
+FIELDS = ["chief_complaint", "duration", "severity", "location", "quality", "alleviating_factors",
+          "aggravating_factors", "associated_symptoms", "previous_treatment", "medical_history",
+          "medications", "allergies", "family_history"]
+
+
+def synthetic_fields(rng, complete):
+    fields = {field: f"{field.replace('_', ' ')} {rng.randint(1, 500)}" for field in FIELDS}
+    fields["chief_complaint"] = rng.choice(COMPLAINTS)
+    fields["allergies"] = rng.choice(ALLERGIES)
+    if not complete:
+        for field in FIELDS[rng.randint(1, len(FIELDS) - 1):]:
+            fields[field] = ""
+    return fields
+
+
+def seed(count, rng, start_at):
+    conn = intake_store.get_connection()
+    template = template_registry.default
+    rows = []
+    for i in range(count):
+        fields = synthetic_fields(rng, rng.random() < 0.8)
+        rows.append(intake_store._row_values(f"bench-{i}", fields, start_at + i * 0.5, True, template))
+        if len(rows) == 5000:
+            with intake_store.transaction(conn):
+                conn.executemany(intake_store.UPSERT_SQL, rows)
+            rows = []
+    if rows:
+        with intake_store.transaction(conn):
+            conn.executemany(intake_store.UPSERT_SQL, rows)
+
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+    }
+
+
+def deep_cursor(pages):
+    """Cursor pointing `pages` pages into the completed list"""
+    cursor = None
+    for _ in range(pages):
+        cursor = intake_store.list_intakes(status="completed", limit=50, cursor=cursor)["next_cursor"]
+    return cursor
+
+
+def write_json_files(directory, count, rng):
+    for i in range(count):
+        session_store.write_json(os.path.join(directory, f"schema_file-{i}.json"),
+                                 synthetic_fields(rng, rng.random() < 0.8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intake list/search queries")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--import-files", type=int, default=0,
+                        help="Also time importing this many schema JSON files")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-ms", type=float, help="Fail if any query's p95 exceeds this")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        intake_store.INTAKE_DB = os.path.join(directory, "intakes.db")
+        start_at = 1_700_000_000.0
+
+        started = time.perf_counter()
+        seed(args.sessions, rng, start_at)
+        report = {
+            "sessions": args.sessions,
+            "seed_seconds": round(time.perf_counter() - started, 2),
+            "db_mb": round(os.path.getsize(intake_store.INTAKE_DB) / 1e6, 1),
+            "queries": {},
+        }
+
+        cursor = deep_cursor(20)
+        middle = start_at + args.sessions * 0.25
+        queries = {
+            "list_first_page": lambda: intake_store.list_intakes(status="completed"),
+            "list_page_21": lambda: intake_store.list_intakes(status="completed", cursor=cursor),
+            "list_time_window": lambda: intake_store.list_intakes(since=middle, until=middle + 3600),
+            "search_common_word": lambda: intake_store.search_intakes("headache"),
+            "search_two_words": lambda: intake_store.search_intakes("migraine penicillin"),
+            "search_prefix": lambda: intake_store.search_intakes("dizz"),
+            "count_completed": lambda: intake_store.count_intakes("completed"),
+        }
+        for name, fn in queries.items():
+            report["queries"][name] = time_query(fn, args.repeat)
+
+        if args.import_files:
+            files_dir = os.path.join(directory, "files")
+            os.makedirs(files_dir)
+            write_json_files(files_dir, args.import_files, rng)
+            started = time.perf_counter()
+            result = intake_store.import_json_files(files_dir)
+            elapsed = time.perf_counter() - started
+            report["import"] = dict(result, seconds=round(elapsed, 2),
+                                    files_per_second=round(result["imported"] / elapsed))
+        intake_store.close_connection()
+
+    print(json.dumps(report, indent=2))
+    if args.max_ms is not None:
+        slowest = max(q["p95_ms"] for q in report["queries"].values())
+        if slowest > args.max_ms:
+            print(f"FAIL: slowest query p95 {slowest:.1f} ms exceeds {args.max_ms:.1f} ms", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
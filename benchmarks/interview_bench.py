@@ -0,0 +1,263 @@
+"""End-to-end latency benchmark for the voice API.
+
+Replays scripted multi-turn interviews through start_session ->
+process_response -> get_schema at a configurable concurrency and reports
+p50/p95/p99 per route, LLM calls per interview and throughput as JSON.
+
+By default the voice API runs in-process against the local fake LLM server
+(benchmarks/fake_llm_server.py), so results are repeatable and need no API
+keys. Pass --target to benchmark an already running service instead.
+
+    python benchmarks/interview_bench.py --interviews 50 --concurrency 10 \\
+        --latency lognormal:5.0,0.3 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm_server import start_fake_llm_server
+
+ROUTES = ["start_session", "process_response", "get_schema"]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Collects per-route latencies from many interview threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {route: [] for route in ROUTES}
+        self.errors = {route: 0 for route in ROUTES}
+        self.turns = []
+        self.completed = 0
+        self.failed = 0
+
+    def timed(self, route, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = func(*args, **kwargs)
+        except requests.RequestException:
+            with self.lock:
+                self.errors[route] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies[route].append(elapsed_ms)
+            if resp.status_code >= 400:
+                self.errors[route] += 1
+        return resp
+
+    def summary(self):
+        routes = {}
+        for route in ROUTES:
+            samples = self.latencies[route]
+            routes[route] = {
+                "count": len(samples),
+                "errors": self.errors[route],
+                "mean_ms": round(sum(samples) / len(samples), 2) if samples else None,
+                "p50_ms": round(percentile(samples, 50), 2) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 2) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+            }
+        return routes
+
+
+def run_interview(base_url, script, recorder, max_turns):
+    """Drive one interview to completion; returns the number of turns taken"""
+    session_id = f"bench-{uuid.uuid4()}"
+    http = requests.Session()
+    answers = script["answers"]
+
+    resp = recorder.timed("start_session", http.post, f"{base_url}/api/start-session/{session_id}")
+    resp.raise_for_status()
+    state = resp.json()
+
+    turns = 0
+    field_index = 0
+    while not state.get("complete") and turns < max_turns:
+        answer = answers[field_index % len(answers)]
+        resp = recorder.timed(
+            "process_response",
+            http.post,
+            f"{base_url}/api/process-response/{session_id}",
+            json={"response": answer, "current_field": state.get("current_field")},
+            headers={"Idempotency-Key": str(uuid.uuid4())},
+        )
+        resp.raise_for_status()
+        previous_field = state.get("current_field")
+        state = resp.json()
+        turns += 1
+        if state.get("current_field") != previous_field:
+            field_index += 1
+
+    resp = recorder.timed("get_schema", http.get, f"{base_url}/api/get-schema/{session_id}")
+    resp.raise_for_status()
+    if not state.get("complete"):
+        raise RuntimeError(f"Interview {session_id} did not complete in {max_turns} turns")
+    return turns
+
+
+def start_in_process_service(session_dir):
+    """Serve voice_api on a free local port in this process"""
+    import session_store
+    session_store.SESSION_DIR = session_dir
+    import voice_api
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, voice_api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def compare_reports(baseline, report):
+    """Print per-route percentile changes against a previous report"""
+    print(f"Compared with {baseline.get('commit')}:", file=sys.stderr)
+    for route in ROUTES:
+        old, new = baseline["routes"].get(route, {}), report["routes"][route]
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if old.get(key) and new.get(key):
+                change = (new[key] - old[key]) / old[key] * 100
+                deltas.append(f"{key} {old[key]} -> {new[key]} ({change:+.1f}%)")
+        print(f"  {route}: {', '.join(deltas)}", file=sys.stderr)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice API end-to-end benchmark")
+    parser.add_argument("--interviews", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--script", default=os.path.join(BENCH_DIR, "interviews.json"))
+    parser.add_argument("--max-turns", type=int, default=60)
+    parser.add_argument("--target", help="Base URL of a running voice API (skips in-process mode)")
+    parser.add_argument("--llm-stats-url", help="Fake LLM /stats URL when using --target")
+    parser.add_argument("--latency", default="lognormal:4.6,0.3", help="Fake LLM latency in ms")
+    parser.add_argument("--tokens-per-second", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--incomplete-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show voice API logs")
+    args = parser.parse_args()
+
+    with open(args.script) as f:
+        scripts = json.load(f)
+
+    llm_server = None
+    stats_url = args.llm_stats_url
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        llm_server, _, _ = start_fake_llm_server(
+            latency=args.latency,
+            tokens_per_second=args.tokens_per_second,
+            error_rate=args.error_rate,
+            incomplete_rate=args.incomplete_rate,
+            seed=args.seed,
+        )
+        os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{llm_server.server_port}/v1"
+        os.environ.setdefault("GROQ_API_KEY", "fake")
+        stats_url = f"http://127.0.0.1:{llm_server.server_port}/stats"
+        session_dir = tempfile.mkdtemp(prefix="voice-bench-")
+        _, base_url = start_in_process_service(session_dir)
+
+    if stats_url:
+        requests.post(stats_url.rstrip("/") + "/reset")
+
+    recorder = Recorder()
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    started = time.perf_counter()
+    with quiet, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_interview, base_url, scripts[i % len(scripts)], recorder, args.max_turns)
+            for i in range(args.interviews)
+        ]
+        for future in futures:
+            try:
+                turns = future.result()
+                recorder.turns.append(turns)
+                recorder.completed += 1
+            except Exception as e:
+                recorder.failed += 1
+                print(f"Interview failed: {e}", file=sys.stderr)
+    wall = time.perf_counter() - started
+
+    llm_stats = requests.get(stats_url).json() if stats_url else None
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    report = {
+        "commit": git_commit(),
+        "config": {
+            "interviews": args.interviews,
+            "concurrency": args.concurrency,
+            "target": args.target or "in-process",
+            "latency": None if args.target else args.latency,
+            "tokens_per_second": None if args.target else args.tokens_per_second,
+            "error_rate": None if args.target else args.error_rate,
+            "incomplete_rate": None if args.target else args.incomplete_rate,
+        },
+        "routes": recorder.summary(),
+        "interviews": {
+            "completed": recorder.completed,
+            "failed": recorder.failed,
+            "turns_per_interview": round(sum(recorder.turns) / len(recorder.turns), 2) if recorder.turns else None,
+            "llm_calls_per_interview": round(llm_stats["calls"] / args.interviews, 2) if llm_stats else None,
+            "llm_calls_by_kind": llm_stats["by_kind"] if llm_stats else None,
+        },
+        "throughput": {
+            "wall_seconds": round(wall, 3),
+            "interviews_per_second": round(recorder.completed / wall, 3),
+            "requests_per_second": round(total_requests / wall, 3),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
+
+    if llm_server:
+        llm_server.shutdown()
+    sys.exit(1 if recorder.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
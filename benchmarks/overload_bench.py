@@ -0,0 +1,157 @@
+"""Overload test for admission control.
+
+Sends an open-loop burst of start_session and process_response requests to
+the in-process voice API at --rate requests per second. The fake LLM server
+behind it serves at most --llm-capacity completions at once, so arrivals
+outpace what the backend can serve. Runs twice:
+
+  unbounded  admission limits high enough never to engage (the old behaviour)
+  admission  the configured limits (--limit, --max-wait-ms)
+
+For each run it reports per route how many requests were served and shed,
+the latency percentiles of served and shed requests, and the goodput. With
+admission control the p99 of served requests stays bounded by the max wait
+plus service time, and shed requests fail fast with Retry-After. Without
+it every request queues behind the backlog.
+
+    python benchmarks/overload_bench.py --rate 120 --duration 10 --llm-capacity 16
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm_server import start_fake_llm_server
+from interview_bench import percentile, start_in_process_service, git_commit
+
+ROUTES = ["start_session", "process_response"]
+
+
+def send(base_url, route, http):
+    session_id = f"overload-{uuid.uuid4().hex[:12]}"
+    start = time.perf_counter()
+    try:
+        if route == "start_session":
+            resp = http.post(f"{base_url}/api/start-session/{session_id}", timeout=120)
+        else:
+            resp = http.post(
+                f"{base_url}/api/process-response/{session_id}",
+                json={"response": "I've had a headache for three days", "current_field": "chief_complaint"},
+                timeout=120,
+            )
+        status = resp.status_code
+    except requests.RequestException:
+        status = None
+    return route, status, (time.perf_counter() - start) * 1000
+
+
+def summarize(samples, duration):
+    report = {}
+    for route in ROUTES:
+        ok = [ms for r, status, ms in samples if r == route and status == 200]
+        shed = [ms for r, status, ms in samples if r == route and status == 503]
+        failed = sum(1 for r, status, _ in samples if r == route and status not in (200, 503))
+        report[route] = {
+            "served": len(ok),
+            "shed": len(shed),
+            "failed": failed,
+            "served_p50_ms": round(percentile(ok, 50), 1) if ok else None,
+            "served_p99_ms": round(percentile(ok, 99), 1) if ok else None,
+            "shed_p99_ms": round(percentile(shed, 99), 1) if shed else None,
+            "goodput_per_s": round(len(ok) / duration, 1),
+        }
+    return report
+
+
+def run_load(base_url, rate, duration, start_share, seed):
+    """Open-loop arrivals: requests are sent on schedule whether or not earlier ones finished"""
+    rng = random.Random(seed)
+    local = threading.local()
+
+    def worker(route):
+        if not hasattr(local, "http"):
+            local.http = requests.Session()
+        return send(base_url, route, local.http)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=1024) as pool:
+        started = time.perf_counter()
+        count = int(rate * duration)
+        for i in range(count):
+            due = started + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = "start_session" if rng.random() < start_share else "process_response"
+            futures.append(pool.submit(worker, route))
+        samples = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+    return summarize(samples, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency under overload with and without admission control")
+    parser.add_argument("--rate", type=float, default=120, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per run")
+    parser.add_argument("--start-share", type=float, default=0.3, help="Fraction of requests that are new sessions")
+    parser.add_argument("--llm-latency", default="fixed:100")
+    parser.add_argument("--llm-capacity", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=16, help="Interview admission limit")
+    parser.add_argument("--max-wait-ms", type=float, default=1000)
+    parser.add_argument("--start-max-wait-ms", type=float, default=200)
+    parser.add_argument("--target-ms", type=float, default=2000)
+    parser.add_argument("--modes", default="unbounded,admission")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    llm_server, _, _ = start_fake_llm_server(latency=args.llm_latency, capacity=args.llm_capacity, seed=args.seed)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{llm_server.server_port}/v1"
+    os.environ.setdefault("GROQ_API_KEY", "fake")
+    _, base_url = start_in_process_service(tempfile.mkdtemp(prefix="overload-bench-"))
+
+    import admission
+    import voice_api
+    from voice_pipeline import pipeline
+
+    report = {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k != "modes"},
+        "runs": {},
+    }
+    for mode in args.modes.split(","):
+        if mode == "unbounded":
+            admission.interview = admission.AdmissionController("interview", 100_000, target_ms=0)
+        else:
+            admission.interview = admission.AdmissionController(
+                "interview", args.limit, turn_max_wait_ms=args.max_wait_ms,
+                start_max_wait_ms=args.start_max_wait_ms, target_ms=args.target_ms,
+            )
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            routes, elapsed = run_load(base_url, args.rate, args.duration, args.start_share, args.seed)
+        report["runs"][mode] = {
+            "seconds": round(elapsed, 1),
+            "routes": routes,
+            "admission": admission.interview.snapshot(),
+        }
+        print(f"{mode}: {json.dumps(routes)}", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    llm_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
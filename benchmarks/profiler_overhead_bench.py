@@ -0,0 +1,73 @@
+"""Per-request overhead of the request profiler.
+
+Times GET /api/get-schema (a cheap, cached request, so fixed costs show)
+through the Flask test client without the profiling hooks installed, with
+profiling off, with PROFILE_SLOW_MS set (every request sampled, none slow
+enough to keep), and with every request profiled and saved via the
+X-Profile header.
+
+    python benchmarks/profiler_overhead_bench.py --requests 5000
+"""
+import os
+import sys
+import json
+import tempfile
+import argparse
+import contextlib
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_store
+import request_profiler
+
+
+def time_requests(client, count, headers):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.get("/api/get-schema/bench", headers=headers)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "p50_us": round(statistics.median(samples), 1),
+        "p95_us": round(samples[int(len(samples) * 0.95) - 1], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request profiler overhead")
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        session_store.SESSION_DIR = directory
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            import voice_api
+            client = voice_api.app.test_client()
+            client.get("/api/get-schema/bench")
+
+            modes = {}
+            # Only the profiler's hooks; CORS registers its own
+            profiler_hooks = (voice_api.start_profile, voice_api.finish_profile, voice_api.discard_profile)
+            hooks = (voice_api.app.before_request_funcs[None], voice_api.app.after_request_funcs[None],
+                     voice_api.app.teardown_request_funcs[None])
+            saved = [list(funcs) for funcs in hooks]
+            for funcs in hooks:
+                funcs[:] = [f for f in funcs if f not in profiler_hooks]
+            modes["no_hooks"] = time_requests(client, args.requests, {})
+            for funcs, original in zip(hooks, saved):
+                funcs[:] = original
+            modes["off"] = time_requests(client, args.requests, {})
+            request_profiler.PROFILE_SLOW_MS = 60_000
+            modes["slow_threshold"] = time_requests(client, args.requests, {})
+            request_profiler.PROFILE_SLOW_MS = 0
+            request_profiler.PROFILE_TOKEN = "bench"
+            modes["header"] = time_requests(client, min(args.requests, 500), {"X-Profile": "bench"})
+
+    print(json.dumps({"requests": args.requests, "modes": modes}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
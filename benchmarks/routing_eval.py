@@ -0,0 +1,207 @@
+"""Compare model routing configurations on accuracy against latency and cost.
+
+Replays labelled patient turns (field, response, whether it is complete,
+and the expected form value) through needs_follow_up and
+summarize_response_for_schema under each routing configuration. For each
+one it reports classification accuracy, extraction match rate, per-task
+latency percentiles and the cost of the calls.
+
+Transcripts come from benchmarks/transcripts.json or from turns recorded
+by the service with TRANSCRIPT_LOG set (JSON lines in the same format).
+Review the labels of recorded turns before treating them as ground truth,
+since they are the serving model's own answers.
+
+By default the calls go to the local fake LLM server with per-model
+latency, which checks the plumbing and latency but not accuracy. Pass
+--llm-url (with GROQ_API_KEY set) to evaluate the real models:
+
+    python benchmarks/routing_eval.py --llm-url https://api.groq.com/openai/v1
+    python benchmarks/routing_eval.py --config small-generate='{"generate": ["llama-3.1-8b-instant"]}'
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm_server import start_fake_llm_server
+from interview_bench import percentile, git_commit
+from model_router import SMALL_MODEL, LARGE_MODEL
+
+PRESETS = {
+    "large-only": {task: [LARGE_MODEL] for task in ("classify", "extract", "generate")},
+    "routed": {},
+    "small-only": {task: [SMALL_MODEL] for task in ("classify", "extract", "generate")},
+}
+FAKE_MODEL_LATENCY = {
+    SMALL_MODEL: "lognormal:4.6,0.2",
+    LARGE_MODEL: "lognormal:5.8,0.3",
+}
+
+
+def load_transcripts(path):
+    """Labelled turns from a JSON list or a JSON-lines recording"""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        turns = json.loads(text)
+    else:
+        turns = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [t for t in turns if "field" in t and "response" in t and "complete" in t]
+
+
+def words(text):
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def token_f1(predicted, expected):
+    """Word-overlap F1 between a predicted and an expected form value"""
+    predicted, expected = words(predicted), words(expected)
+    if not predicted or not expected:
+        return float(predicted == expected)
+    common = sum(min(predicted.count(w), expected.count(w)) for w in set(expected))
+    if not common:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args), (time.perf_counter() - start) * 1000, None
+    except Exception as e:
+        return None, (time.perf_counter() - start) * 1000, str(e)
+
+
+def evaluate_turn(voice_api, turn):
+    verdict, classify_ms, classify_error = timed(voice_api.needs_follow_up, turn["field"], turn["response"])
+    result = {"classify_ms": classify_ms, "verdict": verdict, "error": classify_error}
+    if turn["complete"] and turn.get("value") is not None:
+        value, extract_ms, extract_error = timed(
+            voice_api.summarize_response_for_schema, turn["field"], turn["response"]
+        )
+        result.update(extract_ms=extract_ms, value=value, error=result["error"] or extract_error)
+    return result
+
+
+def evaluate(voice_api, router, name, routes, turns, concurrency):
+    router.configure(routes)
+    router.stats.reset()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda turn: evaluate_turn(voice_api, turn), turns))
+
+    correct = spurious = missed = errors = 0
+    f1_scores, classify_ms, extract_ms = [], [], []
+    for turn, result in zip(turns, results):
+        errors += int(result["error"] is not None)
+        classify_ms.append(result["classify_ms"])
+        if result["verdict"] is not None:
+            correct += int(result["verdict"] == turn["complete"])
+            # A complete answer judged incomplete means a needless follow-up question
+            spurious += int(turn["complete"] and result["verdict"] is False)
+            missed += int(not turn["complete"] and result["verdict"] is True)
+        if "extract_ms" in result:
+            extract_ms.append(result["extract_ms"])
+            f1_scores.append(token_f1(result.get("value"), turn["value"]))
+
+    stats = router.stats.snapshot()
+    cost = sum(entry["cost_usd"] for models in stats.values() for entry in models.values())
+    return {
+        "name": name,
+        "routes": {task: route["models"] for task, route in router.routes.items()},
+        "classify": {
+            "accuracy": round(correct / len(turns), 3),
+            "spurious_follow_ups": spurious,
+            "missed_follow_ups": missed,
+            "p50_ms": round(percentile(classify_ms, 50), 1),
+            "p95_ms": round(percentile(classify_ms, 95), 1),
+        },
+        "extract": {
+            "mean_f1": round(sum(f1_scores) / len(f1_scores), 3) if f1_scores else None,
+            "match_rate": round(sum(f >= 0.5 for f in f1_scores) / len(f1_scores), 3) if f1_scores else None,
+            "p50_ms": round(percentile(extract_ms, 50), 1) if extract_ms else None,
+            "p95_ms": round(percentile(extract_ms, 95), 1) if extract_ms else None,
+        },
+        "errors": errors,
+        "fallbacks": sum(entry["fallbacks"] for models in stats.values() for entry in models.values()),
+        "cost_usd_per_1k_turns": round(cost / len(turns) * 1000, 4),
+        "models": stats,
+    }
+
+
+def parse_config(value):
+    """NAME (a preset) or NAME=<JSON routes or path to a JSON file>"""
+    name, _, routes = value.partition("=")
+    if not routes:
+        if name not in PRESETS:
+            raise argparse.ArgumentTypeError(f"Unknown preset {name}; choose from {', '.join(PRESETS)}")
+        return name, PRESETS[name]
+    if os.path.exists(routes):
+        with open(routes) as f:
+            return name, json.load(f)
+    return name, json.loads(routes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate model routing configurations")
+    parser.add_argument("--transcripts", default=os.path.join(BENCH_DIR, "transcripts.json"))
+    parser.add_argument("--config", type=parse_config, action="append",
+                        help="Configuration to evaluate (repeatable); default: large-only and routed")
+    parser.add_argument("--llm-url", help="OpenAI-compatible base URL; default: local fake server")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    turns = load_transcripts(args.transcripts)
+    configs = args.config or [("large-only", PRESETS["large-only"]), ("routed", PRESETS["routed"])]
+
+    llm_server = None
+    if args.llm_url:
+        os.environ["GROQ_BASE_URL"] = args.llm_url
+    else:
+        llm_server, _, _ = start_fake_llm_server(model_latency=FAKE_MODEL_LATENCY, seed=1)
+        os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{llm_server.server_port}/v1"
+        os.environ.setdefault("GROQ_API_KEY", "fake")
+
+    import voice_api
+    from model_router import router
+
+    report = {
+        "commit": git_commit(),
+        "transcripts": {"path": args.transcripts, "turns": len(turns)},
+        "llm": args.llm_url or "fake (accuracy not meaningful)",
+        "configs": [],
+    }
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for name, routes in configs:
+            report["configs"].append(evaluate(voice_api, router, name, routes, turns, args.concurrency))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    print(f"{'config':<14}{'classify acc':>14}{'spurious':>10}{'extract f1':>12}"
+          f"{'classify p50':>14}{'extract p50':>13}{'$/1k turns':>12}", file=sys.stderr)
+    for result in report["configs"]:
+        print(f"{result['name']:<14}{result['classify']['accuracy']:>14}"
+              f"{result['classify']['spurious_follow_ups']:>10}{str(result['extract']['mean_f1']):>12}"
+              f"{result['classify']['p50_ms']:>14}{str(result['extract']['p50_ms']):>13}"
+              f"{result['cost_usd_per_1k_turns']:>12}", file=sys.stderr)
+
+    if llm_server:
+        llm_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
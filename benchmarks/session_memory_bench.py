@@ -0,0 +1,112 @@
+"""Memory benchmark for in-process session state.
+
+Builds --sessions sessions of the default intake form, each filled up to a
+random point in form order as live interviews are, in three representations:
+
+  dict         a full dict of every field, as sessions were kept before
+               templates (unfilled fields hold "")
+  filled_dict  a dict of only the filled fields
+  compact      an IntakeSession (values list plus a filled bitmask)
+
+and reports the memory each one allocates under tracemalloc. Field values
+are created before tracing and shared by all three, so the numbers are the
+per-session overhead of the container itself. Also times finding the next
+unfilled field: a dict scan against the bitmask.
+
+    python benchmarks/session_memory_bench.py --sessions 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intake_templates import registry as template_registry
+
+
+def dict_next_unfilled(schema):
+    """get_next_unfilled_field as it was for dict sessions"""
+    for field, value in schema.items():
+        if value in [None, "", []]:
+            return field
+    return None
+
+
+def synthetic_values(template, count, rng):
+    """Filled values for each session, a prefix of the form of random length"""
+    sessions = []
+    for i in range(count):
+        filled = rng.randint(0, len(template.fields))
+        sessions.append({field: f"{field.replace('_', ' ')} {i}" for field in template.fields[:filled]})
+    return sessions
+
+
+# name: (build a session from filled values, find its next unfilled field)
+REPRESENTATIONS = {
+    "dict": (lambda template, values: template.expand(values), lambda template, s: dict_next_unfilled(s)),
+    "filled_dict": (lambda template, values: dict(values), lambda template, s: template.next_unfilled(s)),
+    "compact": (lambda template, values: template.session(values), lambda template, s: s.next_unfilled()),
+}
+
+
+def measure(name, template, all_values):
+    build, next_unfilled = REPRESENTATIONS[name]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [build(template, values) for values in all_values]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for session in sessions:
+        next_unfilled(template, session)
+    elapsed = time.perf_counter() - start
+    return sessions, {
+        "mb": round(allocated / 1e6, 1),
+        "bytes_per_session": round(allocated / len(sessions)),
+        "next_unfilled_ns": round(elapsed / len(sessions) * 1e9),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per in-process session")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-bytes", type=int,
+                        help="Fail if a compact session takes more than this many bytes")
+    args = parser.parse_args()
+
+    template = template_registry.default
+    all_values = synthetic_values(template, args.sessions, random.Random(args.seed))
+    report = {
+        "sessions": args.sessions,
+        "fields": len(template.fields),
+        "mean_filled": round(sum(map(len, all_values)) / args.sessions, 1),
+        "representations": {},
+    }
+
+    results = {}
+    for name in REPRESENTATIONS:
+        sessions, report["representations"][name] = measure(name, template, all_values)
+        results[name] = sessions
+
+    # The representations must agree before their sizes mean anything
+    for full, compact in zip(results["dict"], results["compact"]):
+        assert compact.expand() == full and compact.next_unfilled() == dict_next_unfilled(full)
+
+    sizes = report["representations"]
+    report["compact_vs_dict"] = round(sizes["compact"]["bytes_per_session"] / sizes["dict"]["bytes_per_session"], 2)
+    print(json.dumps(report, indent=2))
+    if args.max_bytes is not None and sizes["compact"]["bytes_per_session"] > args.max_bytes:
+        print(f"FAIL: {sizes['compact']['bytes_per_session']} bytes per session exceeds {args.max_bytes}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
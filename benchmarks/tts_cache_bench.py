@@ -0,0 +1,95 @@
+"""TTS cache benchmark.
+
+Replays a stream of utterances through voice_api.stream_speech. A share of
+them (--repeat-share) are the service's fixed phrases from
+known_utterances(), as the degraded re-asks and closing message are; the
+rest are unique, as LLM questions are. Synthesis is replaced by a stand-in
+that takes --render-ms and returns about 200 bytes of audio per character
+(24 kbit/s Opus at a speaking pace), so no TTS engine or ffmpeg is needed.
+
+Runs with the cache off, on from cold, and on after warmup, and reports
+per-utterance latency, hit rate and bytes served from the cache.
+
+    python benchmarks/tts_cache_bench.py --utterances 1000 --repeat-share 0.4 --render-ms 150
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from interview_bench import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Utterance latency and hit rate with and without the TTS cache")
+    parser.add_argument("--utterances", type=int, default=2000)
+    parser.add_argument("--repeat-share", type=float, default=0.4, help="Share of fixed, repeated phrases")
+    parser.add_argument("--render-ms", type=float, default=150, help="Stand-in synthesis time per utterance")
+    parser.add_argument("--format", default="opus")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(open(os.devnull, "w")):
+        import session_store
+        session_store.SESSION_DIR = directory
+        import tts_cache
+        import voice_api
+
+        def render(text, output_format):
+            time.sleep(args.render_ms / 1000)
+            yield os.urandom(200 * len(text))
+
+        voice_api.render_speech = render
+        fixed = voice_api.known_utterances()
+        rng = random.Random(args.seed)
+        workload = [
+            rng.choice(fixed) if rng.random() < args.repeat_share
+            else f"Thanks for telling me about that, {i}. How has it been affecting your day?"
+            for i in range(args.utterances)
+        ]
+
+        def replay():
+            samples, hits = [], []
+            for text in workload:
+                misses = tts_cache.cache.stats["misses"]
+                start = time.perf_counter()
+                for _ in voice_api.stream_speech(text, args.format):
+                    pass
+                samples.append((time.perf_counter() - start) * 1000)
+                if tts_cache.TTS_CACHE and tts_cache.cache.stats["misses"] == misses:
+                    hits.append(samples[-1])
+            return {
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "hit_p50_ms": round(percentile(hits, 50), 3) if hits else None,
+                "total_s": round(sum(samples) / 1000, 2),
+            }
+
+        runs = {}
+        tts_cache.TTS_CACHE = False
+        runs["off"] = replay()
+        tts_cache.TTS_CACHE = True
+        for mode in ("cold", "warmed"):
+            tts_cache.cache = tts_cache.AudioCache(directory=os.path.join(directory, mode))
+            if mode == "warmed":
+                start = time.perf_counter()
+                voice_api.warm_tts_cache([args.format])
+                warmup_s = time.perf_counter() - start
+                tts_cache.cache.stats = dict.fromkeys(tts_cache.cache.stats, 0)
+            runs[mode] = replay()
+            runs[mode].update(tts_cache.cache.snapshot())
+        runs["warmed"]["warmup_s"] = round(warmup_s, 2)
+
+    print(json.dumps({"config": vars(args), "fixed_phrases": len(fixed), "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
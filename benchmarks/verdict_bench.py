@@ -0,0 +1,134 @@
+"""Spurious follow-up benchmark for the completeness verdict.
+
+Replays the scripted interviews in-process against the fake LLM server,
+which phrases its completeness answers the way unconstrained models do
+("Yes.", "**Yes**", "Yes, the response is complete."...), under three modes:
+
+  legacy       the original prompt and exact `== "yes"` check
+  tolerant     the original prompt with verdict.parse_verdict
+  constrained  the current needs_follow_up (JSON mode, max_tokens, parser)
+
+A follow-up question asked after the fake server answered "complete" is
+spurious: the patient is asked again for something they already gave.
+
+    python benchmarks/verdict_bench.py --interviews 40 --incomplete-rate 0.1
+"""
+import os
+import sys
+import json
+import tempfile
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_llm_server import start_fake_llm_server
+from interview_bench import Recorder, run_interview, start_in_process_service, git_commit
+
+LEGACY_PROMPT = (
+    "You are helping a nurse complete a patient intake form. "
+    "Decide if the patient's response gives enough information to complete the field. "
+    "Reply only with 'yes' or 'no'. Be strict: if you're unsure, return 'no'."
+)
+
+
+def legacy_answer(voice_api, field, response):
+    user_prompt = f"Field: {field}\nPatient response: \"{response}\"\nIs this complete?"
+    return voice_api.complete_chat(LEGACY_PROMPT, user_prompt, temperature=0.2, task="classify")
+
+
+def install_mode(voice_api, mode, original):
+    from verdict import parse_verdict
+
+    if mode == "legacy":
+        voice_api.needs_follow_up = lambda field, response: (
+            legacy_answer(voice_api, field, response).lower() == "yes"
+        )
+    elif mode == "tolerant":
+        voice_api.needs_follow_up = lambda field, response: bool(
+            parse_verdict(legacy_answer(voice_api, field, response)).answer
+        )
+    else:
+        voice_api.needs_follow_up = original
+
+
+def run_mode(mode, args, base_url, stats_url, scripts):
+    requests.post(stats_url + "/reset")
+    recorder = Recorder()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_interview, base_url, scripts[i % len(scripts)], recorder, args.max_turns)
+            for i in range(args.interviews)
+        ]
+        for future in futures:
+            try:
+                recorder.turns.append(future.result())
+                recorder.completed += 1
+            except Exception as e:
+                recorder.failed += 1
+                print(f"Interview failed: {e}", file=sys.stderr)
+
+    llm = requests.get(stats_url).json()
+    follow_ups = llm["by_kind"].get("follow_up", 0)
+    spurious = follow_ups - llm["verdicts"]["incomplete"]
+    return {
+        "mode": mode,
+        "completed": recorder.completed,
+        "failed": recorder.failed,
+        "turns_per_interview": round(sum(recorder.turns) / max(1, len(recorder.turns)), 2),
+        "llm_calls_per_interview": round(llm["calls"] / args.interviews, 2),
+        "follow_ups": follow_ups,
+        "needed_follow_ups": llm["verdicts"]["incomplete"],
+        "spurious_follow_ups": spurious,
+        "spurious_per_interview": round(spurious / args.interviews, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure spurious follow-up turns per verdict mode")
+    parser.add_argument("--interviews", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--script", default=os.path.join(BENCH_DIR, "interviews.json"))
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--incomplete-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--modes", default="legacy,tolerant,constrained")
+    args = parser.parse_args()
+
+    with open(args.script) as f:
+        scripts = json.load(f)
+
+    llm_server, _, _ = start_fake_llm_server(
+        incomplete_rate=args.incomplete_rate, seed=args.seed, verdict_style="auto"
+    )
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{llm_server.server_port}/v1"
+    os.environ.setdefault("GROQ_API_KEY", "fake")
+    stats_url = f"http://127.0.0.1:{llm_server.server_port}/stats"
+    _, base_url = start_in_process_service(tempfile.mkdtemp(prefix="verdict-bench-"))
+
+    import voice_api
+    original = voice_api.needs_follow_up
+    results = []
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for mode in args.modes.split(","):
+            install_mode(voice_api, mode, original)
+            results.append(run_mode(mode, args, base_url, stats_url, scripts))
+    voice_api.needs_follow_up = original
+
+    report = {
+        "commit": git_commit(),
+        "config": {"interviews": args.interviews, "incomplete_rate": args.incomplete_rate, "seed": args.seed},
+        "modes": results,
+    }
+    print(json.dumps(report, indent=2))
+    llm_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
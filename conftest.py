@@ -0,0 +1,37 @@
+import time
+import threading
+
+import pytest
+
+import session_store
+import voice_api
+
+
+@pytest.fixture
+def session_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Replace the LLM helpers with slow fakes that count their calls, in total and per helper"""
+    calls = {"count": 0}
+    calls_lock = threading.Lock()
+
+    def slow(name, result):
+        calls[name] = 0
+
+        def fake(*args, **kwargs):
+            with calls_lock:
+                calls["count"] += 1
+                calls[name] += 1
+            time.sleep(0.05)
+            return result
+        monkeypatch.setattr(voice_api, name, fake)
+
+    slow("needs_follow_up", True)
+    slow("summarize_response_for_schema", "headache")
+    slow("generate_transition_question", "How long has it lasted?")
+    slow("generate_follow_up_question", "Could you tell me more?")
+    return calls
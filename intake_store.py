@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import glob
+import time
+import base64
+import sqlite3
+import argparse
+
+import session_store
+from sqlite_db import ThreadConnections, transaction
+from intake_templates import EMPTY_VALUES, UnknownTemplate, registry as template_registry
+
+# ---- Configuration ----
+# Defaults to intakes.db next to the session files
+INTAKE_DB = os.getenv("INTAKE_DB")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_COMPLETED = "completed"
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS intakes (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    completed_at REAL,
+    fields TEXT NOT NULL,
+    template TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS intakes_updated ON intakes (updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS intakes_status_updated ON intakes (status, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS intakes_completed ON intakes (completed_at);
+"""
+
+# Indexes on columns added after the first release, created once they exist
+LATER_INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS intakes_template_updated ON intakes (template, updated_at DESC, id DESC);
+"""
+ADDED_COLUMNS = {"template": "TEXT", "summary": "TEXT"}
+
+# Full-text index over field values, kept in sync by triggers so both single
+# saves and bulk imports maintain it.
+SEARCH_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS intake_search USING fts5(body);
+CREATE TRIGGER IF NOT EXISTS intakes_search_insert AFTER INSERT ON intakes BEGIN
+    INSERT INTO intake_search (rowid, body)
+    VALUES (new.id, (SELECT group_concat(value, ' ') FROM json_each(new.fields)));
+END;
+CREATE TRIGGER IF NOT EXISTS intakes_search_update AFTER UPDATE OF fields ON intakes BEGIN
+    DELETE FROM intake_search WHERE rowid = old.id;
+    INSERT INTO intake_search (rowid, body)
+    VALUES (new.id, (SELECT group_concat(value, ' ') FROM json_each(new.fields)));
+END;
+CREATE TRIGGER IF NOT EXISTS intakes_search_delete AFTER DELETE ON intakes BEGIN
+    DELETE FROM intake_search WHERE rowid = old.id;
+END;
+"""
+
+# Newer data always wins, so re-running an import never overwrites a save.
+# The clinician summary only describes a completed intake.
+UPSERT_SQL = """
+INSERT INTO intakes (session_id, status, created_at, updated_at, completed_at, fields, template)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET
+    status = excluded.status,
+    template = excluded.template,
+    created_at = CASE WHEN ? THEN excluded.created_at ELSE intakes.created_at END,
+    updated_at = excluded.updated_at,
+    completed_at = CASE
+        WHEN excluded.status != 'completed' THEN NULL
+        ELSE coalesce(intakes.completed_at, excluded.completed_at)
+    END,
+    fields = excluded.fields,
+    summary = CASE WHEN excluded.status = 'completed' THEN intakes.summary END
+WHERE excluded.updated_at >= intakes.updated_at
+"""
+
+
+def db_path():
+    """Path of the intake database"""
+    return INTAKE_DB or os.path.join(session_store.SESSION_DIR, "intakes.db")
+
+
+# ---- Connections ----
+# One connection per thread and process (see sqlite_db.py)
+_search_available = {}
+
+
+def _setup(conn, path):
+    conn.executescript(SCHEMA_SQL)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(intakes)")}
+    for column, column_type in ADDED_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE intakes ADD COLUMN {column} {column_type}")
+    conn.executescript(LATER_INDEXES_SQL)
+    try:
+        conn.executescript(SEARCH_SQL)
+        _search_available[path] = True
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5; search falls back to a table scan
+        _search_available[path] = False
+
+
+_connections = ThreadConnections(_setup, synchronous="NORMAL")
+
+
+def get_connection():
+    """The calling thread's connection to the intake database"""
+    return _connections.get(db_path())
+
+
+def close_connection():
+    """Close the calling thread's connections"""
+    _connections.close()
+
+
+# ---- Writes ----
+def intake_status(fields, template=None):
+    """An intake is completed once every field of its form has a value"""
+    if template is not None:
+        return STATUS_COMPLETED if template.is_complete(fields) else STATUS_IN_PROGRESS
+    if fields and all(value not in EMPTY_VALUES for value in fields.values()):
+        return STATUS_COMPLETED
+    return STATUS_IN_PROGRESS
+
+
+def _row_values(session_id, fields, at, restarted, template=None):
+    status = intake_status(fields, template)
+    completed_at = at if status == STATUS_COMPLETED else None
+    if template is not None:
+        fields = template.compact(fields)
+    payload = json.dumps(fields, separators=(",", ":"))
+    template_id = template.id if template is not None else None
+    return (session_id, status, at, at, completed_at, payload, template_id, int(restarted))
+
+
+def save_intake(session_id, fields, restarted=False, at=None, template=None):
+    """Record the current field values of a session.
+
+    With a template only the filled values are stored and completion is
+    judged against the template's fields. restarted marks the start of a new
+    interview for the session, which resets its creation time. completed_at
+    keeps the time the intake first became complete.
+    """
+    at = time.time() if at is None else at
+    get_connection().execute(UPSERT_SQL, _row_values(session_id, fields, at, restarted, template))
+
+
+def save_summary(session_id, summary):
+    """Attach the clinician summary to a completed intake; False if it isn't completed"""
+    cursor = get_connection().execute(
+        "UPDATE intakes SET summary = ? WHERE session_id = ? AND status = ?",
+        (summary, session_id, STATUS_COMPLETED),
+    )
+    return bool(cursor.rowcount)
+
+
+def import_json_files(directory=None, batch_size=IMPORT_BATCH_SIZE):
+    """Bulk-load schema_<session_id>.json files into the database.
+
+    Files are inserted in batches of one transaction each, timestamped with
+    their modification time. Safe to re-run: rows saved more recently than a
+    file are left alone. Returns counts of imported and unreadable files.
+    """
+    directory = directory or session_store.SESSION_DIR
+    paths = sorted(glob.glob(os.path.join(directory, "schema_*.json")))
+    conn = get_connection()
+    imported = failed = 0
+    for start in range(0, len(paths), batch_size):
+        rows = []
+        for path in paths[start:start + batch_size]:
+            session_id = os.path.basename(path)[len("schema_"):-len(".json")]
+            try:
+                data = session_store.read_json(path)
+                at = os.path.getmtime(path)
+                template, values = template_registry.parse_session(data)
+            except (OSError, ValueError, TypeError, AttributeError):
+                failed += 1
+                continue
+            rows.append(_row_values(session_id, values, at, True, template))
+        with transaction(conn):
+            conn.executemany(UPSERT_SQL, rows)
+        imported += len(rows)
+    return {"imported": imported, "failed": failed}
+
+
+# ---- Reads ----
+def _intake(row):
+    fields = json.loads(row["fields"])
+    if row["template"] is not None:
+        try:
+            fields = template_registry.get(row["template"]).expand(fields)
+        except UnknownTemplate:
+            pass
+    return {
+        "session_id": row["session_id"],
+        "template": row["template"],
+        "status": row["status"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+        "completed_at": row["completed_at"],
+        "fields": fields,
+        "summary": row["summary"],
+    }
+
+
+def get_intake(session_id):
+    """One intake by session id, or None"""
+    row = get_connection().execute(
+        "SELECT * FROM intakes WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return _intake(row) if row is not None else None
+
+
+def encode_cursor(row):
+    payload = json.dumps([row["updated_at"], row["id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        updated_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(updated_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def page_size(limit):
+    """Clamp a requested page size"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _page(sql, params, limit):
+    """Run a query ordered newest first and split off the next-page cursor.
+
+    Pages continue from the last row seen (keyset pagination) rather than
+    using OFFSET, so deep pages cost the same as the first one.
+    """
+    limit = page_size(limit)
+    rows = get_connection().execute(
+        f"{sql} ORDER BY intakes.updated_at DESC, intakes.id DESC LIMIT ?", (*params, limit + 1)
+    ).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": [_intake(row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+
+def _filters(status, since, until, cursor, template=None):
+    clauses, params = [], []
+    if template:
+        clauses.append("intakes.template = ?")
+        params.append(template)
+    if status:
+        clauses.append("intakes.status = ?")
+        params.append(status)
+    if since is not None:
+        clauses.append("intakes.updated_at >= ?")
+        params.append(float(since))
+    if until is not None:
+        clauses.append("intakes.updated_at < ?")
+        params.append(float(until))
+    if cursor:
+        updated_at, row_id = decode_cursor(cursor)
+        clauses.append("(intakes.updated_at < ? OR (intakes.updated_at = ? AND intakes.id < ?))")
+        params.extend([updated_at, updated_at, row_id])
+    return clauses, params
+
+
+def list_intakes(status=None, since=None, until=None, limit=None, cursor=None, template=None):
+    """A page of intakes, most recently updated first.
+
+    since/until bound updated_at (epoch seconds); template restricts the
+    page to one intake form. Pass the returned next_cursor to get the
+    following page; it is None on the last page.
+    """
+    clauses, params = _filters(status, since, until, cursor, template)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return _page(f"SELECT intakes.* FROM intakes{where}", params, limit)
+
+
+def search_query(text):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    words = text.split()
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_intakes(text, status=STATUS_COMPLETED, since=None, until=None, limit=None, cursor=None,
+                   template=None):
+    """A page of intakes whose field values contain every word of text"""
+    if not text or not text.split():
+        raise ValueError("Search text is required")
+    clauses, params = _filters(status, since, until, cursor, template)
+    get_connection()
+    if _search_available.get(db_path()):
+        clauses.insert(0, "intakes.id IN (SELECT rowid FROM intake_search WHERE intake_search MATCH ?)")
+        params.insert(0, search_query(text))
+    else:
+        for word in text.split():
+            clauses.append("intakes.fields LIKE ?")
+            params.append(f"%{word}%")
+    return _page(f"SELECT intakes.* FROM intakes WHERE {' AND '.join(clauses)}", params, limit)
+
+
+def count_intakes(status=None):
+    """Number of intakes, optionally with a given status"""
+    if status:
+        row = get_connection().execute("SELECT count(*) FROM intakes WHERE status = ?", (status,)).fetchone()
+    else:
+        row = get_connection().execute("SELECT count(*) FROM intakes").fetchone()
+    return row[0]
+
+
+# ---- Migration Tool ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import schema_<session_id>.json files into the intake database")
+    parser.add_argument("directory", nargs="?", help="directory holding the JSON files (default: SESSION_DIR)")
+    parser.add_argument("--db", help="database path (default: INTAKE_DB or <SESSION_DIR>/intakes.db)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    global INTAKE_DB
+    if args.db:
+        INTAKE_DB = args.db
+    start = time.perf_counter()
+    result = import_json_files(args.directory, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {result['imported']} intakes into {db_path()} in {elapsed:.2f}s "
+          f"({result['failed']} unreadable files skipped)")
+    print(f"Completed: {count_intakes(STATUS_COMPLETED)}, total: {count_intakes()}")
+    return 0 if not result["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+
+import intake_store
+import session_store
+import voice_api
+
+
+def filled(**values):
+    schema = {field: "" for field in voice_api.make_default_schema()}
+    schema.update(values)
+    return schema
+
+
+def completed(**values):
+    schema = {field: "n/a" for field in voice_api.make_default_schema()}
+    schema.update(values)
+    return schema
+
+
+def test_status_and_timestamps(session_dir):
+    intake_store.save_intake("s1", filled(), restarted=True, at=100.0)
+    intake_store.save_intake("s1", filled(chief_complaint="headache"), at=110.0)
+    intake = intake_store.get_intake("s1")
+    assert intake["status"] == "in_progress"
+    assert intake["created_at"] == 100.0 and intake["updated_at"] == 110.0
+    assert intake["completed_at"] is None
+    assert intake["fields"]["chief_complaint"] == "headache"
+
+    intake_store.save_intake("s1", completed(), at=120.0)
+    intake_store.save_intake("s1", completed(allergies="penicillin"), at=130.0)
+    intake = intake_store.get_intake("s1")
+    assert intake["status"] == "completed"
+    assert intake["completed_at"] == 120.0
+    assert intake["created_at"] == 100.0
+
+
+def test_list_pages_with_cursor(session_dir):
+    for i in range(25):
+        fields = completed() if i % 2 else filled()
+        intake_store.save_intake(f"s{i:02d}", fields, at=1000.0 + i // 3)
+
+    seen = []
+    cursor = None
+    while True:
+        page = intake_store.list_intakes(status="completed", limit=5, cursor=cursor)
+        seen.extend(item["session_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = sorted((f"s{i:02d}" for i in range(1, 25, 2)), key=lambda s: (-(1000 + int(s[1:]) // 3), -int(s[1:])))
+    assert seen == expected
+
+    window = intake_store.list_intakes(since=1002, until=1004)
+    assert {item["session_id"] for item in window["items"]} == {f"s{i:02d}" for i in range(6, 12)}
+
+
+def test_search_matches_field_values(session_dir):
+    intake_store.save_intake("a", completed(chief_complaint="migraine headache", allergies="penicillin"), at=1.0)
+    intake_store.save_intake("b", completed(chief_complaint="knee pain"), at=2.0)
+    intake_store.save_intake("c", filled(chief_complaint="headache"), at=3.0)
+
+    assert [i["session_id"] for i in intake_store.search_intakes("headache")["items"]] == ["a"]
+    assert [i["session_id"] for i in intake_store.search_intakes("head penic")["items"]] == ["a"]
+    assert intake_store.search_intakes("headache", status=None)["items"][0]["session_id"] == "c"
+
+    # Updating the values updates the search index
+    intake_store.save_intake("b", completed(chief_complaint="tension headache"), at=4.0)
+    assert [i["session_id"] for i in intake_store.search_intakes("headache")["items"]] == ["b", "a"]
+
+
+def test_invalid_cursor_and_limit(session_dir):
+    with pytest.raises(ValueError):
+        intake_store.list_intakes(cursor="nope")
+    with pytest.raises(ValueError):
+        intake_store.list_intakes(limit=0)
+    with pytest.raises(ValueError):
+        intake_store.search_intakes("  ")
+
+
+def test_import_json_files(session_dir):
+    for i in range(7):
+        session_store.write_json(session_store.schema_path(f"old{i}"), completed() if i < 3 else filled())
+    (session_dir / "schema_broken.json").write_text("{")
+    # A newer save must survive re-running the import
+    intake_store.save_intake("old0", completed(allergies="latex"), at=4102444800.0)
+
+    result = intake_store.import_json_files(batch_size=2)
+    assert result == {"imported": 7, "failed": 1}
+    assert intake_store.count_intakes("completed") == 3
+    assert intake_store.count_intakes() == 7
+    assert intake_store.get_intake("old0")["fields"]["allergies"] == "latex"
+
+    assert intake_store.import_json_files() == {"imported": 7, "failed": 1}
+    assert intake_store.count_intakes() == 7
+
+
+def test_connection_per_thread(session_dir):
+    connections = []
+
+    def worker():
+        connections.append(intake_store.get_connection())
+        intake_store.save_intake(f"t{threading.get_ident()}", filled())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(c) for c in connections}) == 4
+    assert intake_store.count_intakes() == 4
+    mode = intake_store.get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_turns_are_recorded_and_queryable(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    client.post("/api/start-session/api")
+    client.post(
+        "/api/process-response/api",
+        json={"response": "I have a bad headache", "current_field": "chief_complaint"},
+    )
+
+    intake = client.get("/api/intakes/api").get_json()
+    assert intake["status"] == "in_progress"
+    assert intake["fields"]["chief_complaint"] == "headache"
+
+    page = client.get("/api/intakes?status=in_progress&limit=10").get_json()
+    assert [item["session_id"] for item in page["items"]] == ["api"]
+    assert page["next_cursor"] is None
+
+    assert client.get("/api/intakes/search?q=headache").get_json()["items"] == []
+    found = client.get("/api/intakes/search?q=headache&status=in_progress").get_json()
+    assert found["items"][0]["session_id"] == "api"
+
+    assert client.get("/api/intakes?cursor=bad").status_code == 400
+    assert client.get("/api/intakes/missing").status_code == 404
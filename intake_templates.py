@@ -0,0 +1,241 @@
+import os
+import json
+import glob
+import threading
+from types import MappingProxyType
+
+# ---- Configuration ----
+TEMPLATE_DIR = os.getenv(
+    "TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+)
+DEFAULT_TEMPLATE = os.getenv("DEFAULT_TEMPLATE", "default")
+
+EMPTY_VALUES = (None, "", [])
+
+
+class UnknownTemplate(ValueError):
+    """Raised for a template id or clinic that isn't registered"""
+
+
+# ---- Templates ----
+class Template:
+    """An intake form: an ordered, immutable list of field names.
+
+    One instance per form is shared by every session using it; sessions keep
+    only their filled values and expand them against the template on demand.
+    """
+
+    __slots__ = ("id", "name", "fields", "clinics", "full_mask", "_index")
+
+    def __init__(self, template_id, name, fields, clinics=()):
+        if not fields:
+            raise ValueError(f"Template {template_id} has no fields")
+        if len(set(fields)) != len(fields):
+            raise ValueError(f"Template {template_id} has duplicate fields")
+        object.__setattr__(self, "id", template_id)
+        object.__setattr__(self, "name", name or template_id)
+        object.__setattr__(self, "fields", tuple(fields))
+        object.__setattr__(self, "clinics", tuple(clinics))
+        object.__setattr__(self, "full_mask", (1 << len(fields)) - 1)
+        object.__setattr__(self, "_index", MappingProxyType({field: i for i, field in enumerate(fields)}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Templates are immutable")
+
+    def __repr__(self):
+        return f"Template({self.id!r}, {len(self.fields)} fields)"
+
+    def __contains__(self, field):
+        return field in self._index
+
+    def blank(self):
+        """A new, empty schema dict for this form"""
+        return dict.fromkeys(self.fields, "")
+
+    def expand(self, values):
+        """Full schema dict in field order, with unfilled fields empty"""
+        return {field: values.get(field, "") for field in self.fields}
+
+    def compact(self, schema):
+        """Only the filled values of this form's fields"""
+        return {
+            field: value for field, value in schema.items()
+            if field in self._index and value not in EMPTY_VALUES
+        }
+
+    def index(self, field):
+        """Position of a field in the form; KeyError for fields it doesn't have"""
+        return self._index[field]
+
+    def session(self, values=None):
+        """An IntakeSession for this form holding the filled fields of values"""
+        session = IntakeSession(self)
+        for field, value in (values or {}).items():
+            if field in self._index:
+                session.set(field, value)
+        return session
+
+    def next_unfilled(self, values):
+        """First field without a value in a values dict, or None when complete"""
+        for field in self.fields:
+            if values.get(field) in EMPTY_VALUES:
+                return field
+        return None
+
+    def is_complete(self, values):
+        return self.next_unfilled(values) is None
+
+    def describe(self):
+        return {"id": self.id, "name": self.name, "fields": list(self.fields), "clinics": list(self.clinics)}
+
+
+# ---- Sessions ----
+class IntakeSession:
+    """One session's answers, stored compactly against its template.
+
+    Values live in a list in the template's field order and a bitmask marks
+    the filled ones, so a session costs a small object and a list instead of
+    a dict keyed by every field name. Finding the next question is a
+    find-first-zero-bit on the mask rather than a scan.
+    """
+
+    __slots__ = ("template", "values", "filled")
+
+    def __init__(self, template, values=None, filled=0):
+        self.template = template
+        self.values = values if values is not None else [None] * len(template.fields)
+        self.filled = filled
+
+    def __repr__(self):
+        return f"IntakeSession({self.template.id!r}, {bin(self.filled).count('1')}/{len(self.values)} filled)"
+
+    def get(self, field, default=""):
+        i = self.template.index(field)
+        return self.values[i] if self.filled >> i & 1 else default
+
+    def set(self, field, value):
+        """Fill a field; an empty value clears it"""
+        i = self.template.index(field)
+        if value in EMPTY_VALUES:
+            self.values[i] = None
+            self.filled &= ~(1 << i)
+        else:
+            self.values[i] = value
+            self.filled |= 1 << i
+
+    def next_unfilled(self):
+        """First unfilled field in form order, or None when the form is complete"""
+        missing = ~self.filled & self.template.full_mask
+        if not missing:
+            return None
+        # missing & -missing isolates the lowest set bit
+        return self.template.fields[(missing & -missing).bit_length() - 1]
+
+    def is_complete(self):
+        return self.filled == self.template.full_mask
+
+    def copy(self):
+        return IntakeSession(self.template, list(self.values), self.filled)
+
+    def filled_values(self):
+        """Only the filled fields, as stored in session files"""
+        return {
+            field: value for field, value in zip(self.template.fields, self.values)
+            if value is not None
+        }
+
+    def expand(self):
+        """Full schema dict in field order, with unfilled fields empty"""
+        return {
+            field: "" if value is None else value
+            for field, value in zip(self.template.fields, self.values)
+        }
+
+
+# ---- Registry ----
+class TemplateRegistry:
+    """Named templates loaded once from TEMPLATE_DIR (one <id>.json per form)"""
+
+    def __init__(self, directory=None, default=None):
+        self.directory = directory or TEMPLATE_DIR
+        self.default_id = default or DEFAULT_TEMPLATE
+        self.lock = threading.Lock()
+        self._templates = None
+        self._clinics = None
+
+    def load(self):
+        """Read every template file; called at startup or on first use"""
+        templates, clinics = {}, {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            template_id = os.path.splitext(os.path.basename(path))[0]
+            with open(path) as f:
+                spec = json.load(f)
+            template = Template(template_id, spec.get("name"), spec["fields"], spec.get("clinics", ()))
+            templates[template_id] = template
+            for clinic in template.clinics:
+                if clinic in clinics:
+                    raise ValueError(f"Clinic {clinic} is assigned to {clinics[clinic]} and {template_id}")
+                clinics[clinic] = template_id
+        if self.default_id not in templates:
+            raise ValueError(f"Default template {self.default_id} not found in {self.directory}")
+        with self.lock:
+            self._templates = MappingProxyType(templates)
+            self._clinics = MappingProxyType(clinics)
+        print(f"Loaded {len(templates)} intake templates from {self.directory}")
+        return self._templates
+
+    @property
+    def templates(self):
+        # Loading twice in a race is harmless; both reads build the same set
+        if self._templates is None:
+            self.load()
+        return self._templates
+
+    def get(self, template_id=None):
+        """A template by id; the default template when template_id is empty"""
+        template = self.templates.get(template_id or self.default_id)
+        if template is None:
+            raise UnknownTemplate(f"Unknown template: {template_id}")
+        return template
+
+    def for_clinic(self, clinic):
+        """The template a clinic uses; clinics without one use the default"""
+        if self._clinics is None:
+            self.load()
+        return self.get(self._clinics.get(clinic, self.default_id))
+
+    def resolve(self, template_id=None, clinic=None):
+        """The template for a new session: explicit id first, then the clinic's"""
+        if template_id:
+            return self.get(template_id)
+        if clinic:
+            return self.for_clinic(clinic)
+        return self.get()
+
+    def parse_session(self, data):
+        """(template, values) from the contents of a session file.
+
+        Session files hold {"template": <id>, "values": {...filled fields}};
+        files written before templates existed are a flat schema dict and
+        are read as the default template.
+        """
+        if "template" in data and isinstance(data.get("values"), dict):
+            template = self.get(data["template"])
+            return template, template.compact(data["values"])
+        template = self.default
+        return template, template.compact(data)
+
+    def load_session(self, data):
+        """An IntakeSession from the contents of a session file"""
+        template, values = self.parse_session(data)
+        return template.session(values)
+
+    @property
+    def default(self):
+        return self.get()
+
+    def describe(self):
+        return [template.describe() for template in self.templates.values()]
+
+
+registry = TemplateRegistry()
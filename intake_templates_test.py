@@ -0,0 +1,139 @@
+import json
+import sqlite3
+
+import pytest
+
+import intake_store
+import voice_api
+from intake_templates import Template, TemplateRegistry, UnknownTemplate, registry
+
+
+def test_registry_loads_the_bundled_templates():
+    assert {"default", "pediatric", "follow_up"} <= set(registry.templates)
+    assert registry.default.fields[0] == "chief_complaint"
+    assert registry.for_clinic("pediatrics").id == "pediatric"
+    assert registry.for_clinic("unknown-clinic").id == "default"
+    with pytest.raises(UnknownTemplate):
+        registry.get("nope")
+
+
+def test_templates_are_immutable_and_shared():
+    template = registry.get("pediatric")
+    with pytest.raises(AttributeError):
+        template.fields = ("x",)
+    with pytest.raises(TypeError):
+        registry.templates["other"] = template
+    assert registry.get("pediatric") is template
+
+
+def test_expand_and_compact():
+    template = Template("t", "T", ["a", "b", "c"])
+    assert template.compact({"a": "1", "b": "", "c": None, "z": "ignored"}) == {"a": "1"}
+    assert template.expand({"b": "2"}) == {"a": "", "b": "2", "c": ""}
+    assert list(template.expand({"c": "3", "a": "1"})) == ["a", "b", "c"]
+    assert template.next_unfilled({"a": "1"}) == "b"
+    assert template.is_complete({"a": "1", "b": "2", "c": "3"})
+
+
+def test_registry_rejects_bad_template_sets(tmp_path):
+    (tmp_path / "default.json").write_text(json.dumps({"fields": ["a"], "clinics": ["x"]}))
+    (tmp_path / "other.json").write_text(json.dumps({"fields": ["b"], "clinics": ["x"]}))
+    with pytest.raises(ValueError, match="Clinic x"):
+        TemplateRegistry(str(tmp_path)).load()
+
+    (tmp_path / "other.json").write_text(json.dumps({"fields": ["b"]}))
+    with pytest.raises(ValueError, match="Default template"):
+        TemplateRegistry(str(tmp_path), default="missing").load()
+
+
+def test_session_files_store_only_filled_values(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    client.post("/api/start-session/compact")
+    client.post(
+        "/api/process-response/compact",
+        json={"response": "I have a bad headache", "current_field": "chief_complaint"},
+    )
+
+    stored = json.loads((session_dir / "schema_compact.json").read_text())
+    assert stored == {"template": "default", "values": {"chief_complaint": "headache"}}
+
+    schema = client.get("/api/get-schema/compact").get_json()
+    assert list(schema) == list(registry.default.fields)
+    assert schema["chief_complaint"] == "headache" and schema["duration"] == ""
+
+
+def test_start_session_with_clinic_template(session_dir, fake_llm, monkeypatch):
+    monkeypatch.setattr(voice_api, "generate_first_question", lambda field, on_sentence=None: f"About {field}?")
+    client = voice_api.app.test_client()
+    body = client.post("/api/start-session/kid", json={"clinic": "pediatrics"}).get_json()
+    assert body["template"] == "pediatric"
+
+    # Restarting keeps the session's form
+    assert client.post("/api/start-session/kid").get_json()["template"] == "pediatric"
+
+    body = client.post("/api/start-session/kid?template=follow_up").get_json()
+    assert body["template"] == "follow_up"
+    assert body["current_field"] == "condition_followed_up"
+    assert list(client.get("/api/get-schema/kid").get_json()) == list(registry.get("follow_up").fields)
+
+    assert client.post("/api/start-session/kid", json={"template": "nope"}).status_code == 400
+    assert {t["id"] for t in client.get("/api/templates").get_json()["templates"]} >= {"pediatric"}
+
+
+def test_intakes_are_judged_by_their_template(session_dir):
+    follow_up = registry.get("follow_up")
+    values = {field: "ok" for field in follow_up.fields}
+    intake_store.save_intake("fu", values, template=follow_up)
+    intake = intake_store.get_intake("fu")
+    assert intake["status"] == "completed"
+    assert intake["template"] == "follow_up"
+    assert intake_store.list_intakes(template="follow_up")["items"][0]["session_id"] == "fu"
+    assert intake_store.list_intakes(template="pediatric")["items"] == []
+
+
+def test_intake_database_gains_template_column(session_dir):
+    path = session_dir / "intakes.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE intakes (id INTEGER PRIMARY KEY, session_id TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL,
+            completed_at REAL, fields TEXT NOT NULL);
+        INSERT INTO intakes VALUES (1, 'old', 'in_progress', 1, 1, NULL, '{"chief_complaint":"cough"}');
+    """)
+    conn.close()
+
+    intake = intake_store.get_intake("old")
+    assert intake["template"] is None
+    assert intake["fields"] == {"chief_complaint": "cough"}
+
+
+def test_intake_session_tracks_filled_fields_in_a_bitmask():
+    template = Template("t", "T", ["a", "b", "c"])
+    session = template.session({"b": "2", "z": "ignored"})
+    assert session.filled == 0b010
+    assert session.next_unfilled() == "a"
+
+    session.set("a", "1")
+    assert session.next_unfilled() == "c"
+    session.set("c", "3")
+    assert session.is_complete() and session.next_unfilled() is None
+
+    session.set("b", "")
+    assert session.next_unfilled() == "b" and session.get("b") == ""
+    assert session.filled_values() == {"a": "1", "c": "3"}
+    assert session.expand() == {"a": "1", "b": "", "c": "3"}
+    with pytest.raises(KeyError):
+        session.set("z", "x")
+
+
+def test_intake_session_matches_the_dict_scan():
+    template = registry.default
+    for mask in (0, 1, 0b1011, template.full_mask >> 1, template.full_mask):
+        values = {field: "x" for i, field in enumerate(template.fields) if mask >> i & 1}
+        session = template.session(values)
+        assert session.next_unfilled() == template.next_unfilled(values)
+        assert session.filled_values() == values
+
+    copy = session.copy()
+    copy.set("duration", "")
+    assert session.is_complete() and not copy.is_complete()
@@ -0,0 +1,369 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from admission import START, TURN, Overloaded
+from percentiles import percentile_ms
+from voice_pipeline import pipeline
+
+# ---- Configuration ----
+# An interview that hasn't completed after this many turns is given up on
+MAX_TURNS = int(os.getenv("INTERVIEW_MAX_TURNS", "60"))
+# Times a shed start or turn is retried, after the server's Retry-After
+OVERLOAD_RETRIES = 3
+HTTP_WORKERS = int(os.getenv("INTERVIEW_HTTP_WORKERS", "64"))
+HTTP_TIMEOUT_SECONDS = 120
+
+
+# ---- Backends ----
+# A backend runs the interview steps: start(session_id, template, clinic) and
+# turn(session_id, response, current_field, turn_id) return the same payloads
+# as the start-session and process-response routes, schema(session_id) the
+# filled form. Both drive voice_api's begin_session and handle_turn, which
+# the Flask routes and the WebSocket channel use too, so prompts and turn
+# logic live in one place.
+class LocalInterviews:
+    """Runs interviews in this process, on the shared LLM pipeline stage"""
+
+    def __init__(self, services=None):
+        if services is None:
+            # Imported here rather than at module level; voice_api is slow to import
+            import voice_api as services
+        self.services = services
+
+    async def start(self, session_id, template=None, clinic=None):
+        return await asyncio.wrap_future(pipeline.llm.submit(
+            self.services.begin_session, session_id, None, template, clinic
+        ))
+
+    async def turn(self, session_id, response, current_field=None, turn_id=None):
+        return await asyncio.wrap_future(pipeline.llm.submit(
+            self.services.handle_turn, session_id, response, current_field, turn_id
+        ))
+
+    async def schema(self, session_id):
+        return await asyncio.get_running_loop().run_in_executor(None, self.services.load_schema, session_id)
+
+
+class HttpInterviews:
+    """Runs interviews against a voice API service over its REST routes.
+
+    A shed request (503) raises Overloaded with the server's Retry-After.
+    """
+
+    def __init__(self, base_url, workers=None):
+        self.base_url = base_url.rstrip("/")
+        self.executor = ThreadPoolExecutor(max_workers=workers or HTTP_WORKERS, thread_name_prefix="interview-http")
+        self.local = threading.local()
+
+    def _request(self, method, path, priority, **kwargs):
+        if not hasattr(self.local, "http"):
+            self.local.http = requests.Session()
+        response = self.local.http.request(method, self.base_url + path, timeout=HTTP_TIMEOUT_SECONDS, **kwargs)
+        if response.status_code == 503:
+            raise Overloaded(self.base_url, priority, int(response.headers.get("Retry-After", "1")))
+        response.raise_for_status()
+        return response.json()
+
+    async def _call(self, method, path, priority, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: self._request(method, path, priority, **kwargs))
+
+    async def start(self, session_id, template=None, clinic=None):
+        options = {k: v for k, v in (("template", template), ("clinic", clinic)) if v}
+        return await self._call("POST", f"/api/start-session/{session_id}", START, json=options)
+
+    async def turn(self, session_id, response, current_field=None, turn_id=None):
+        body = {"response": response, "current_field": current_field, "turn_id": turn_id}
+        return await self._call("POST", f"/api/process-response/{session_id}", TURN, json=body)
+
+    async def schema(self, session_id):
+        return await self._call("GET", f"/api/get-schema/{session_id}", TURN)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# ---- Interviews ----
+class Interview:
+    """One intake interview with an async step API.
+
+    start() asks the first question and step(response) answers the current
+    one; both return the route payload (current_field, question, complete,
+    ...). A step shed under overload is retried after Retry-After with the
+    same turn id, so it is applied at most once.
+    """
+
+    def __init__(self, backend, session_id=None, template=None, clinic=None):
+        self.backend = backend
+        self.session_id = session_id or f"interview-{uuid.uuid4().hex[:12]}"
+        self.template = template
+        self.clinic = clinic
+        self.current_field = None
+        self.question = None
+        self.complete = False
+        self.degraded_turns = 0
+        self.transcript = []
+        self.latencies = []
+
+    async def _run(self, call):
+        for attempt in range(OVERLOAD_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                result = await call()
+            except Overloaded as e:
+                if attempt == OVERLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(e.retry_after)
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            return result
+
+    def _apply(self, result):
+        self.complete = bool(result.get("complete"))
+        self.current_field = result.get("current_field")
+        self.question = result.get("question")
+        self.degraded_turns += int(bool(result.get("degraded")))
+        return result
+
+    async def start(self):
+        result = await self._run(lambda: self.backend.start(self.session_id, self.template, self.clinic))
+        return self._apply(result)
+
+    async def step(self, response):
+        field, question, turn_id = self.current_field, self.question, uuid.uuid4().hex
+        result = await self._run(lambda: self.backend.turn(self.session_id, response, field, turn_id))
+        self.transcript.append({"field": field, "question": question, "response": response})
+        return self._apply(result)
+
+    async def schema(self):
+        return await self.backend.schema(self.session_id)
+
+
+async def run_interview(interview, patient, max_turns=None):
+    """Put the interview's questions to a patient until it completes.
+
+    Stops early when the patient has no answer (None) or after max_turns.
+    Returns the interview.
+    """
+    max_turns = MAX_TURNS if max_turns is None else max_turns
+    turn = await interview.start()
+    while not interview.complete and len(interview.transcript) < max_turns:
+        response = await patient.answer(turn)
+        if response is None:
+            break
+        turn = await interview.step(response)
+    await patient.finish(interview, turn)
+    return interview
+
+
+# ---- Patients ----
+# The patient side of an interview: answer(turn) returns the reply to the
+# question in turn (None ends the interview), finish(interview, turn) is
+# called once it is over.
+class ConsolePatient:
+    """A person at the terminal; end of input ends the interview"""
+
+    def __init__(self, stdin=None, stdout=None):
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+
+    def write(self, line):
+        print(line, file=self.stdout, flush=True)
+
+    async def answer(self, turn):
+        self.write(f"[Nurse] {turn['question']}")
+        print("🗣️ Patient: ", end="", file=self.stdout, flush=True)
+        line = await asyncio.get_running_loop().run_in_executor(None, self.stdin.readline)
+        return line.rstrip("\n") if line else None
+
+    async def finish(self, interview, turn):
+        if interview.complete:
+            self.write("✅ All fields completed.")
+            for field, value in (turn.get("schema") or await interview.schema()).items():
+                self.write(f"  {field}: {value}")
+
+
+class RecordedPatient:
+    """Replays recorded answers, for regression runs.
+
+    answers is either a list with one answer per field, in form order (as in
+    benchmarks/interviews.json), or a map of field to the replies given to
+    its questions in order; the last reply repeats if asked again.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.index = 0
+        self.asked = {}
+        self.last_field = None
+
+    @classmethod
+    def from_file(cls, path, name=None):
+        """Load one recorded interview from a JSON list of {"name", "answers"}"""
+        with open(path) as f:
+            recordings = json.load(f)
+        recording = next((r for r in recordings if name is None or r["name"] == name), None)
+        if recording is None:
+            raise LookupError(f"No recorded interview named {name!r} in {path}")
+        return cls(recording["answers"])
+
+    async def answer(self, turn):
+        field = turn.get("current_field")
+        if isinstance(self.answers, dict):
+            replies = self.answers.get(field)
+            if not replies:
+                return None
+            count = self.asked[field] = self.asked.get(field, 0) + 1
+            return replies[min(count, len(replies)) - 1]
+        if self.last_field is not None and field != self.last_field:
+            self.index += 1
+        self.last_field = field
+        return self.answers[self.index] if self.index < len(self.answers) else None
+
+    async def finish(self, interview, turn):
+        pass
+
+
+SIMULATED_ANSWERS = {
+    "chief_complaint": ["I've had a pounding headache", "My right knee hurts", "I've had a cough and a fever"],
+    "duration": ["About three days now", "Two weeks", "Since last Monday"],
+    "severity": ["Around a seven out of ten", "Maybe a five", "It's mild, a three"],
+    "location": ["Behind my eyes", "The inside of my right knee", "In my chest"],
+    "quality": ["It throbs", "Sharp when I move, dull otherwise", "A dry, tickly cough"],
+    "alleviating_factors": ["Lying down in a dark room", "Ice and rest", "Warm drinks help"],
+    "aggravating_factors": ["Bright lights", "Stairs", "Lying flat at night"],
+    "associated_symptoms": ["Some nausea", "Swelling in the evening", "Chills and tiredness"],
+    "previous_treatment": ["Ibuprofen, it helped a little", "A knee brace", "Nothing yet"],
+    "medical_history": ["Migraines a few times a year", "Appendix out as a kid", "Mild asthma"],
+    "medications": ["A daily multivitamin", "None", "An inhaler when needed"],
+    "allergies": ["Penicillin gives me a rash", "No known allergies", "Peanuts"],
+    "family_history": ["My mother has migraines", "My dad has arthritis", "Nothing I know of"],
+}
+VAGUE_ANSWERS = ["I'm not sure", "Hard to say", "um, it's kind of hard to explain", "I don't know"]
+
+
+class SimulatedPatient:
+    """A synthetic patient for load and regression testing.
+
+    Answers each field from SIMULATED_ANSWERS (or a generic reply for
+    fields it doesn't know), first giving a vague answer with probability
+    vague_rate, and pauses think_seconds (a (low, high) range) before each
+    reply. Seed rng for repeatable runs.
+    """
+
+    def __init__(self, rng=None, vague_rate=0.2, think_seconds=(0, 0), answers=None):
+        self.rng = rng or random.Random()
+        self.vague_rate = vague_rate
+        self.think_seconds = think_seconds
+        self.answers = SIMULATED_ANSWERS if answers is None else answers
+        self.vague_fields = set()
+
+    async def answer(self, turn):
+        low, high = self.think_seconds
+        if high:
+            await asyncio.sleep(self.rng.uniform(low, high))
+        field = turn.get("current_field") or ""
+        if field not in self.vague_fields and self.rng.random() < self.vague_rate:
+            self.vague_fields.add(field)
+            return self.rng.choice(VAGUE_ANSWERS)
+        choices = self.answers.get(field)
+        if not choices:
+            return f"Nothing unusual about my {field.replace('_', ' ')}"
+        return self.rng.choice(choices)
+
+    async def finish(self, interview, turn):
+        pass
+
+
+# ---- Simulation ----
+async def simulate(backend, interviews, concurrency=None, seed=None, vague_rate=0.2,
+                   think_seconds=(0, 0), template=None, max_turns=None):
+    """Run many simulated-patient interviews at once and report how they went"""
+    rng = random.Random(seed)
+    limit = asyncio.Semaphore(concurrency or interviews)
+    finished, failed = [], []
+
+    async def one(index):
+        patient = SimulatedPatient(random.Random(rng.random()), vague_rate, think_seconds)
+        interview = Interview(backend, f"sim-{index}-{uuid.uuid4().hex[:8]}", template=template)
+        async with limit:
+            try:
+                finished.append(await run_interview(interview, patient, max_turns))
+            except Exception as e:
+                failed.append(f"{interview.session_id}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(interviews)))
+    elapsed = time.perf_counter() - started
+    latencies = [s for interview in finished for s in interview.latencies]
+    turns = [len(interview.transcript) for interview in finished]
+    return {
+        "interviews": interviews,
+        "completed": sum(1 for interview in finished if interview.complete),
+        "incomplete": sum(1 for interview in finished if not interview.complete),
+        "failed": len(failed),
+        "errors": failed[:10],
+        "degraded_turns": sum(interview.degraded_turns for interview in finished),
+        "turns_per_interview": round(sum(turns) / len(turns), 1) if turns else None,
+        "step_p50_ms": percentile_ms(latencies, 0.50),
+        "step_p99_ms": percentile_ms(latencies, 0.99),
+        "seconds": round(elapsed, 2),
+        "interviews_per_second": round(len(finished) / elapsed, 2) if elapsed else None,
+    }
+
+
+# ---- Command Line ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run intake interviews from the terminal, a recording or simulated patients")
+    parser.add_argument("mode", nargs="?", default="console", choices=["console", "replay", "simulate"])
+    parser.add_argument("--target", help="Base URL of a running voice API (default: run in this process)")
+    parser.add_argument("--session", help="Session id (console, replay)")
+    parser.add_argument("--template", help="Intake template id")
+    parser.add_argument("--recording", help="JSON file of recorded interviews (replay)")
+    parser.add_argument("--name", help="Which recorded interview to replay (default: the first)")
+    parser.add_argument("--interviews", type=int, default=100, help="Simulated interviews")
+    parser.add_argument("--concurrency", type=int, help="Simulated interviews at once (default: all)")
+    parser.add_argument("--vague-rate", type=float, default=0.2)
+    parser.add_argument("--think-ms", type=float, default=0, help="Max pause before each simulated answer")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true", help="Show voice API logs")
+    args = parser.parse_args(argv)
+
+    # The in-process voice API logs every step with print; keep it off the conversation
+    out = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    backend = HttpInterviews(args.target) if args.target else LocalInterviews()
+    if args.mode == "simulate":
+        report = asyncio.run(simulate(
+            backend, args.interviews, args.concurrency, args.seed, args.vague_rate,
+            (0, args.think_ms / 1000), args.template,
+        ))
+        print(json.dumps(report, indent=2), file=out)
+        return 0 if not report["failed"] else 1
+
+    if args.mode == "replay":
+        if not args.recording:
+            parser.error("replay needs --recording")
+        patient = RecordedPatient.from_file(args.recording, args.name)
+    else:
+        patient = ConsolePatient(stdout=out)
+    interview = Interview(backend, args.session, template=args.template)
+    asyncio.run(run_interview(interview, patient))
+    if args.mode == "replay":
+        print(json.dumps({"complete": interview.complete, "transcript": interview.transcript}, indent=2), file=out)
+    return 0 if interview.complete else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import io
+import os
+import asyncio
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import admission
+import interview_engine
+import voice_api
+from interview_engine import (
+    ConsolePatient,
+    HttpInterviews,
+    Interview,
+    LocalInterviews,
+    RecordedPatient,
+    run_interview,
+    simulate,
+)
+
+RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "interviews.json")
+FOLLOW_UP_FIELDS = [
+    "condition_followed_up", "changes_since_last_visit", "medication_adherence",
+    "side_effects", "new_symptoms", "questions_for_provider",
+]
+
+
+@pytest.fixture
+def quick_llm(session_dir, monkeypatch):
+    """LLM helpers without delays: vague answers need a follow-up, others are stored as given"""
+    monkeypatch.setattr(voice_api, "generate_first_question", lambda field, on_sentence=None: f"First, {field}?")
+    monkeypatch.setattr(voice_api, "needs_follow_up",
+                        lambda field, response: response not in interview_engine.VAGUE_ANSWERS)
+    monkeypatch.setattr(voice_api, "summarize_response_for_schema", lambda field, response: response)
+    monkeypatch.setattr(voice_api, "generate_transition_question",
+                        lambda response, field, on_sentence=None: f"Next, {field}?")
+    monkeypatch.setattr(voice_api, "generate_follow_up_question",
+                        lambda field, response, on_sentence=None: f"More about {field}?")
+
+
+def test_recorded_interview_fills_the_form(quick_llm):
+    patient = RecordedPatient.from_file(RECORDING, "knee-pain")
+    interview = asyncio.run(run_interview(Interview(LocalInterviews(voice_api), "recorded"), patient))
+
+    assert interview.complete and len(interview.transcript) == 13
+    assert interview.transcript[0] == {
+        "field": "chief_complaint", "question": "First, chief_complaint?", "response": "My right knee hurts",
+    }
+    schema = voice_api.load_schema("recorded")
+    assert schema["chief_complaint"] == "My right knee hurts"
+    assert schema["family_history"] == "My dad has arthritis"
+
+
+def test_recorded_replies_per_field_cover_follow_ups(quick_llm):
+    answers = {field: [f"{field} answer"] for field in FOLLOW_UP_FIELDS}
+    answers["side_effects"] = ["I don't know", "A dry mouth"]
+    interview = Interview(LocalInterviews(voice_api), "by-field", template="follow_up")
+    asyncio.run(run_interview(interview, RecordedPatient(answers)))
+
+    assert interview.complete
+    assert [turn["field"] for turn in interview.transcript].count("side_effects") == 2
+    assert interview.transcript[3]["question"] == "Next, side_effects?"
+    assert interview.transcript[4]["question"] == "More about side_effects?"
+    assert voice_api.load_schema("by-field")["side_effects"] == "A dry mouth"
+
+
+def test_console_patient_stops_at_end_of_input(quick_llm):
+    output = io.StringIO()
+    patient = ConsolePatient(stdin=io.StringIO("My right knee hurts\n"), stdout=output)
+    interview = asyncio.run(run_interview(Interview(LocalInterviews(voice_api), "console"), patient))
+
+    assert not interview.complete and len(interview.transcript) == 1
+    assert "[Nurse] First, chief_complaint?" in output.getvalue()
+    assert "[Nurse] Next, duration?" in output.getvalue()
+
+
+def test_simulated_patients_run_concurrently(quick_llm):
+    report = asyncio.run(simulate(LocalInterviews(voice_api), 50, seed=7, vague_rate=0.5))
+
+    assert report["completed"] == 50 and report["failed"] == 0
+    # Vague answers get a follow-up, so interviews take more turns than fields
+    assert report["turns_per_interview"] > 13
+    assert report["step_p99_ms"] is not None
+
+
+class FlakyBackend:
+    """Sheds the first turn, then answers"""
+
+    def __init__(self):
+        self.turn_ids = []
+
+    async def start(self, session_id, template=None, clinic=None):
+        return {"current_field": "chief_complaint", "question": "What brings you in?", "complete": False}
+
+    async def turn(self, session_id, response, current_field=None, turn_id=None):
+        self.turn_ids.append(turn_id)
+        if len(self.turn_ids) == 1:
+            raise admission.Overloaded("test", admission.TURN, 0)
+        return {"message": "All fields completed", "complete": True}
+
+
+def test_shed_steps_are_retried_with_the_same_turn_id():
+    backend = FlakyBackend()
+    interview = Interview(backend)
+
+    async def run():
+        await interview.start()
+        return await interview.step("A headache")
+
+    assert asyncio.run(run())["complete"]
+    assert len(backend.turn_ids) == 2 and backend.turn_ids[0] == backend.turn_ids[1]
+
+
+@pytest.fixture
+def service(quick_llm):
+    httpd = make_server("127.0.0.1", 0, voice_api.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    backend = HttpInterviews(f"http://127.0.0.1:{httpd.server_port}", workers=4)
+    yield backend
+    backend.close()
+    httpd.shutdown()
+
+
+def test_http_backend_runs_interviews_on_the_service(service):
+    patient = RecordedPatient.from_file(RECORDING, "headache")
+    interview = asyncio.run(run_interview(Interview(service, "over-http"), patient))
+
+    assert interview.complete
+    assert asyncio.run(interview.schema())["chief_complaint"] == "I've had a pounding headache"
+
+
+def test_http_backend_raises_overloaded_on_503(service, monkeypatch):
+    pool = admission.AdmissionController("test", 2, start_max_wait_ms=0, target_ms=0)
+    monkeypatch.setattr(admission, "interview", pool)
+    held = [pool.admit(), pool.admit()]
+    with pytest.raises(admission.Overloaded) as shed:
+        asyncio.run(service.start("busy"))
+    assert shed.value.retry_after >= 1
+    for ticket in held:
+        ticket.release()
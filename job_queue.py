@@ -0,0 +1,379 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import threading
+
+import session_store
+from sqlite_db import ThreadConnections, transaction
+
+# ---- Configuration ----
+# Defaults to jobs.db next to the session files
+JOB_DB = os.getenv("JOB_DB")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# A claimed job that isn't finished within its lease is handed out again, so
+# the jobs of a worker that crashed are retried rather than lost.
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+RETRY_MAX_SECONDS = 3600
+# Finished jobs are deleted after this long; dead jobs are kept
+RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+POLL_SECONDS = 1.0
+PRUNE_INTERVAL_SECONDS = 3600
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+STATUSES = (STATUS_PENDING, STATUS_RUNNING, STATUS_DONE, STATUS_DEAD)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT UNIQUE,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at);
+CREATE INDEX IF NOT EXISTS jobs_leases ON jobs (status, lease_until);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for a failure that retrying won't fix; the job is dead-lettered at once"""
+
+
+def db_path():
+    """Path of the job database"""
+    return JOB_DB or os.path.join(session_store.SESSION_DIR, "jobs.db")
+
+
+# ---- Connections ----
+# One connection per thread and process (see sqlite_db.py)
+_connections = ThreadConnections(lambda conn, path: conn.executescript(SCHEMA_SQL))
+
+
+def get_connection():
+    """The calling thread's connection to the job database"""
+    return _connections.get(db_path())
+
+
+def close_connection():
+    """Close the calling thread's connections"""
+    _connections.close()
+
+
+# ---- Queue ----
+# Delivery is at least once: a job can run again if its worker dies, or its
+# lease runs out, before it is marked done. Handlers must be idempotent.
+_wakeup = threading.Event()
+
+
+def _job(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def enqueue(kind, payload, dedupe_key=None, max_attempts=None, delay=0.0):
+    """Durably queue a job; returns its id, or None if dedupe_key was already queued.
+
+    The job is committed before this returns, so it survives a restart.
+    """
+    now = time.time()
+    cursor = get_connection().execute(
+        "INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, status, max_attempts, run_at, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (kind, json.dumps(payload, separators=(",", ":")), dedupe_key, STATUS_PENDING,
+         max_attempts or MAX_ATTEMPTS, now + delay, now, now),
+    )
+    if not cursor.rowcount:
+        return None
+    _wakeup.set()
+    return cursor.lastrowid
+
+
+def claim(lease_seconds=None):
+    """Take the next due job, or None. Jobs whose lease expired are due again.
+
+    A job that has used all its attempts and whose lease expired (its
+    worker died every time) is dead-lettered instead of run again.
+    """
+    lease_seconds = LEASE_SECONDS if lease_seconds is None else lease_seconds
+    conn = get_connection()
+    while True:
+        now = time.time()
+        with transaction(conn):
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND run_at <= ?) OR (status = ? AND lease_until <= ?)"
+                " ORDER BY run_at, id LIMIT 1",
+                (STATUS_PENDING, now, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == STATUS_RUNNING and row["attempts"] >= row["max_attempts"]:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, lease_until = NULL, last_error = ?, updated_at = ? WHERE id = ?",
+                    (STATUS_DEAD, row["last_error"] or "Lease expired", now, row["id"]),
+                )
+                continue
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                (STATUS_RUNNING, now + lease_seconds, now, row["id"]),
+            )
+        job = _job(row)
+        job.update(status=STATUS_RUNNING, attempts=row["attempts"] + 1)
+        return job
+
+
+def complete(job):
+    """Mark a claimed job done. Ignored if the job was claimed again since."""
+    cursor = get_connection().execute(
+        "UPDATE jobs SET status = ?, lease_until = NULL, last_error = NULL, updated_at = ?"
+        " WHERE id = ? AND status = ? AND attempts = ?",
+        (STATUS_DONE, time.time(), job["id"], STATUS_RUNNING, job["attempts"]),
+    )
+    return bool(cursor.rowcount)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter before attempt number attempts + 1"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fail(job, error, permanent=False):
+    """Record a failed attempt: retry later, or dead-letter when out of attempts"""
+    now = time.time()
+    dead = permanent or job["attempts"] >= job["max_attempts"]
+    cursor = get_connection().execute(
+        "UPDATE jobs SET status = ?, run_at = ?, lease_until = NULL, last_error = ?, updated_at = ?"
+        " WHERE id = ? AND status = ? AND attempts = ?",
+        (STATUS_DEAD if dead else STATUS_PENDING, now if dead else now + retry_delay(job["attempts"]),
+         str(error)[:2000], now, job["id"], STATUS_RUNNING, job["attempts"]),
+    )
+    return bool(cursor.rowcount)
+
+
+def retry(job_id):
+    """Re-queue a dead job with a fresh set of attempts"""
+    now = time.time()
+    cursor = get_connection().execute(
+        "UPDATE jobs SET status = ?, attempts = 0, run_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+        (STATUS_PENDING, now, now, job_id, STATUS_DEAD),
+    )
+    if cursor.rowcount:
+        _wakeup.set()
+    return bool(cursor.rowcount)
+
+
+def prune(older_than=None):
+    """Delete finished jobs last updated more than older_than seconds ago"""
+    older_than = RETENTION_SECONDS if older_than is None else older_than
+    cursor = get_connection().execute(
+        "DELETE FROM jobs WHERE status = ? AND updated_at < ?", (STATUS_DONE, time.time() - older_than)
+    )
+    return cursor.rowcount
+
+
+def get_job(job_id):
+    row = get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _job(row) if row is not None else None
+
+
+def list_jobs(status=None, kind=None, limit=50):
+    """Most recently updated jobs first"""
+    clauses, params = [], []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if kind:
+        clauses.append("kind = ?")
+        params.append(kind)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = get_connection().execute(
+        f"SELECT * FROM jobs{where} ORDER BY updated_at DESC, id DESC LIMIT ?", (*params, int(limit))
+    ).fetchall()
+    return [_job(row) for row in rows]
+
+
+def job_counts():
+    """Number of jobs per kind and status"""
+    counts = {}
+    for row in get_connection().execute("SELECT kind, status, count(*) AS n FROM jobs GROUP BY kind, status"):
+        counts.setdefault(row["kind"], dict.fromkeys(STATUSES, 0))[row["status"]] = row["n"]
+    return counts
+
+
+# ---- Handlers ----
+handlers = {}
+
+
+def handler(kind):
+    """Register fn(payload) as the handler for jobs of a kind"""
+    def register(fn):
+        handlers[kind] = fn
+        return fn
+    return register
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome; returns True if it succeeded"""
+    fn = handlers.get(job["kind"])
+    try:
+        if fn is None:
+            raise LookupError(f"No handler for {job['kind']} jobs")
+        fn(job["payload"])
+    except PermanentJobError as e:
+        print(f"Job {job['id']} ({job['kind']}) failed permanently: {e}")
+        _record_outcome(fail, job, e, permanent=True)
+        return False
+    except Exception as e:
+        print(f"Job {job['id']} ({job['kind']}) failed on attempt {job['attempts']}/{job['max_attempts']}: {e}")
+        _record_outcome(fail, job, e)
+        return False
+    _record_outcome(complete, job)
+    return True
+
+
+def _record_outcome(update, job, *args, **kwargs):
+    """Apply complete() or fail() to a job, logging database errors.
+
+    If the outcome can't be stored (e.g. the database stays locked), the
+    job is left running and handed out again once its lease expires.
+    """
+    try:
+        return update(job, *args, **kwargs)
+    except sqlite3.Error as e:
+        print(f"Error recording the outcome of job {job['id']} ({job['kind']}): {e}")
+        return False
+
+
+# ---- Workers ----
+class WorkerPool:
+    """Threads that claim and run jobs until stopped.
+
+    Several pools (one per service process) can share a job database;
+    claims are atomic, so each job goes to one worker at a time.
+    """
+
+    def __init__(self, workers=None, lease_seconds=None, poll_seconds=POLL_SECONDS):
+        self.size = JOB_WORKERS if workers is None else workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.succeeded = 0
+        self.failed = 0
+        self.busy = 0
+        self.last_prune = 0.0
+
+    def start(self):
+        if self.threads or not self.size:
+            return self
+        self.stopping.clear()
+        for i in range(self.size):
+            thread = threading.Thread(target=self.work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"Started {self.size} job workers on {db_path()}")
+        return self
+
+    def stop(self, timeout=10):
+        """Stop after the jobs in progress finish"""
+        self.stopping.set()
+        _wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def work(self):
+        try:
+            while not self.stopping.is_set():
+                try:
+                    job = claim(self.lease_seconds)
+                except sqlite3.Error as e:
+                    print(f"Error claiming job: {e}")
+                    job = None
+                if job is None:
+                    self.maybe_prune()
+                    _wakeup.wait(self.poll_seconds)
+                    _wakeup.clear()
+                    continue
+                with self.lock:
+                    self.busy += 1
+                ok = False
+                try:
+                    ok = run_job(job)
+                except Exception as e:
+                    # Never let one job take its worker thread down
+                    print(f"Error running job {job['id']} ({job['kind']}): {e}")
+                finally:
+                    with self.lock:
+                        self.busy -= 1
+                        self.succeeded += int(ok)
+                        self.failed += int(not ok)
+        finally:
+            close_connection()
+
+    def maybe_prune(self):
+        now = time.time()
+        with self.lock:
+            if now - self.last_prune < PRUNE_INTERVAL_SECONDS:
+                return
+            self.last_prune = now
+        try:
+            prune()
+        except sqlite3.Error as e:
+            print(f"Error pruning jobs: {e}")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "workers": len(self.threads),
+                "busy": self.busy,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+            }
+
+
+workers = WorkerPool()
+
+
+# ---- Admin Tool ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the job queue and re-queue dead jobs")
+    parser.add_argument("command", choices=["stats", "dead", "retry"])
+    parser.add_argument("job_ids", nargs="*", type=int, help="jobs to re-queue (retry)")
+    parser.add_argument("--db", help="database path (default: JOB_DB or <SESSION_DIR>/jobs.db)")
+    args = parser.parse_args(argv)
+
+    global JOB_DB
+    if args.db:
+        JOB_DB = args.db
+    if args.command == "stats":
+        print(json.dumps(job_counts(), indent=2))
+    elif args.command == "dead":
+        for job in list_jobs(STATUS_DEAD, limit=1000):
+            print(f"{job['id']}\t{job['kind']}\t{json.dumps(job['payload'])}\t{job['last_error']}")
+    else:
+        for job_id in args.job_ids:
+            print(f"Job {job_id}: {'re-queued' if retry(job_id) else 'not dead, skipped'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
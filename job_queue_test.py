@@ -0,0 +1,189 @@
+import json
+import time
+import sqlite3
+import threading
+
+import pytest
+
+import intake_store
+import job_queue
+import voice_api
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    monkeypatch.setattr(job_queue, "handlers", {})
+    monkeypatch.setattr(job_queue, "RETRY_BASE_SECONDS", 0.0)
+    return job_queue.handlers
+
+
+def test_jobs_are_claimed_once_and_deduplicated(session_dir):
+    first = job_queue.enqueue("summarize", {"session_id": "a"}, dedupe_key="summarize:a")
+    assert job_queue.enqueue("summarize", {"session_id": "a"}, dedupe_key="summarize:a") is None
+
+    job = job_queue.claim()
+    assert job["id"] == first and job["payload"] == {"session_id": "a"} and job["attempts"] == 1
+    assert job_queue.claim() is None
+
+    assert job_queue.complete(job)
+    assert job_queue.get_job(first)["status"] == job_queue.STATUS_DONE
+
+
+def test_failures_retry_then_dead_letter(session_dir, handlers):
+    attempts = []
+
+    @job_queue.handler("flaky")
+    def flaky(payload):
+        attempts.append(payload)
+        raise RuntimeError("downstream unavailable")
+
+    job_id = job_queue.enqueue("flaky", {"n": 1}, max_attempts=3)
+    while (job := job_queue.claim()) is not None:
+        assert not job_queue.run_job(job)
+
+    job = job_queue.get_job(job_id)
+    assert len(attempts) == 3
+    assert job["status"] == job_queue.STATUS_DEAD and "downstream unavailable" in job["last_error"]
+    assert [j["id"] for j in job_queue.list_jobs(job_queue.STATUS_DEAD)] == [job_id]
+
+    # Fixed downstream: re-queue from the dead letters
+    handlers["flaky"] = attempts.append
+    assert job_queue.retry(job_id)
+    assert job_queue.run_job(job_queue.claim())
+    assert job_queue.get_job(job_id)["status"] == job_queue.STATUS_DONE
+
+
+def test_permanent_errors_skip_retries(session_dir, handlers):
+    @job_queue.handler("bad")
+    def bad(payload):
+        raise job_queue.PermanentJobError("rejected")
+
+    job_id = job_queue.enqueue("bad", {})
+    job_queue.run_job(job_queue.claim())
+    job = job_queue.get_job(job_id)
+    assert job["status"] == job_queue.STATUS_DEAD and job["attempts"] == 1
+
+
+def test_expired_leases_are_redelivered(session_dir):
+    job_id = job_queue.enqueue("export", {}, max_attempts=2)
+    crashed = job_queue.claim(lease_seconds=0.0)
+
+    # The worker "crashed"; the job is handed out again once its lease ends
+    again = job_queue.claim(lease_seconds=0.0)
+    assert again["id"] == job_id and again["attempts"] == 2
+    # A late answer from the first worker is ignored
+    assert not job_queue.complete(crashed)
+
+    # Out of attempts and the lease expired again: dead-lettered, not re-run
+    assert job_queue.claim() is None
+    assert job_queue.get_job(job_id)["status"] == job_queue.STATUS_DEAD
+
+
+def test_worker_pool_runs_jobs_concurrently(session_dir, handlers):
+    running, peak, lock = [0], [0], threading.Lock()
+    done = []
+
+    @job_queue.handler("slow")
+    def slow(payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+            done.append(payload["n"])
+
+    for n in range(6):
+        job_queue.enqueue("slow", {"n": n})
+    pool = job_queue.WorkerPool(workers=3, poll_seconds=0.05).start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(done) < 6 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        pool.stop()
+
+    assert sorted(done) == list(range(6))
+    assert peak[0] > 1
+    assert pool.snapshot()["succeeded"] == 6
+    assert job_queue.job_counts()["slow"][job_queue.STATUS_DONE] == 6
+
+
+def test_locked_database_on_completion_keeps_the_worker(session_dir, handlers, monkeypatch):
+    runs = []
+    handlers["count"] = lambda payload: runs.append(payload["n"])
+    real_complete = job_queue.complete
+    failures = [1]
+
+    def locked_once(job):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return real_complete(job)
+
+    monkeypatch.setattr(job_queue, "complete", locked_once)
+    first = job_queue.enqueue("count", {"n": 1})
+    pool = job_queue.WorkerPool(workers=1, lease_seconds=0.2, poll_seconds=0.05).start()
+    try:
+        job_queue.enqueue("count", {"n": 2})
+        deadline = time.monotonic() + 5
+        while job_queue.get_job(first)["status"] != job_queue.STATUS_DONE and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert all(thread.is_alive() for thread in pool.threads)
+    finally:
+        pool.stop()
+
+    # The first run's outcome was lost, so its lease ran out and it ran again
+    assert sorted(runs) == [1, 1, 2]
+    assert job_queue.job_counts()["count"][job_queue.STATUS_DONE] == 2
+
+
+def test_final_turn_queues_post_interview_work(session_dir, fake_llm, monkeypatch, tmp_path):
+    monkeypatch.setattr(voice_api, "CHART_EXPORT_DIR", str(tmp_path / "charts"))
+    client = voice_api.app.test_client()
+    client.post("/api/start-session/done")
+    values = {field: "yes" for field in voice_api.template_registry.default.fields[:-1]}
+    voice_api.save_schema("done", values)
+
+    body = client.post(
+        "/api/process-response/done", json={"response": "none", "current_field": "family_history"}
+    ).get_json()
+    assert body["complete"] is True
+    summarize = job_queue.list_jobs(kind="summarize")
+    assert [job["payload"] for job in summarize] == [{"session_id": "done", "version": body["version"]}]
+
+    monkeypatch.setattr(voice_api, "generate_intake_summary", lambda session: "Headache for a week.")
+    for _ in range(2):
+        job_queue.run_job(job_queue.claim())
+
+    assert intake_store.get_intake("done")["summary"] == "Headache for a week."
+    chart = json.loads((tmp_path / "charts" / "intake_done.json").read_text())
+    assert chart["summary"] == "Headache for a week." and chart["fields"]["family_history"] == "headache"
+
+    stats = client.get("/api/jobs/stats").get_json()
+    assert stats["counts"]["export"]["done"] == 1
+
+
+def test_jobs_for_restarted_sessions_are_skipped(session_dir, fake_llm, monkeypatch):
+    calls = []
+    monkeypatch.setattr(voice_api, "generate_intake_summary", calls.append)
+    client = voice_api.app.test_client()
+    voice_api.save_schema("again", {field: "x" for field in voice_api.template_registry.default.fields})
+    version = voice_api.load_schema_version("again")[1]
+    voice_api.queue_completion_jobs("again", version)
+    client.post("/api/start-session/again")
+
+    assert job_queue.run_job(job_queue.claim())
+    assert calls == []
+
+
+def test_retry_endpoint(session_dir):
+    client = voice_api.app.test_client()
+    job_id = job_queue.enqueue("email", {})
+    assert client.post(f"/api/jobs/{job_id}/retry").status_code == 409
+    job_queue.fail(job_queue.claim(), "smtp down", permanent=True)
+
+    dead = client.get("/api/jobs?status=dead").get_json()["jobs"]
+    assert [job["id"] for job in dead] == [job_id]
+    assert client.post(f"/api/jobs/{job_id}/retry").get_json()["status"] == "pending"
+    assert client.post("/api/jobs/999/retry").status_code == 404
@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import contextlib
+
+import session_store
+from sqlite_db import ThreadConnections, transaction
+
+# ---- Configuration ----
+# Every LLM call is counted against its session, form field, helper (the
+# prompt that made it) and model. Counts are summed in memory and flushed to
+# SQLite (default llm_usage.db next to the session files) every
+# LLM_USAGE_FLUSH_SECONDS, so the hot path never touches the disk.
+LLM_USAGE = os.getenv("LLM_USAGE", "1") == "1"
+LLM_USAGE_DB = os.getenv("LLM_USAGE_DB")
+FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "30"))
+# Flush early once this many (session, field, helper, model) rows are pending
+MAX_PENDING_ROWS = 5000
+DEFAULT_REPORT_ROWS = 50
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    day TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    helper TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    latency_ms REAL NOT NULL,
+    max_latency_ms REAL NOT NULL,
+    PRIMARY KEY (day, session_id, field, helper, model)
+);
+CREATE INDEX IF NOT EXISTS llm_usage_session ON llm_usage (session_id);
+"""
+
+# Flushes add to the stored counts, so any number of workers can share the file
+UPSERT_SQL = """
+INSERT INTO llm_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, session_id, field, helper, model) DO UPDATE SET
+    calls = calls + excluded.calls,
+    failures = failures + excluded.failures,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    cost_usd = cost_usd + excluded.cost_usd,
+    latency_ms = latency_ms + excluded.latency_ms,
+    max_latency_ms = max(max_latency_ms, excluded.max_latency_ms)
+"""
+
+GROUP_COLUMNS = ("day", "session_id", "field", "helper", "model")
+
+
+def db_path():
+    """Path of the usage database"""
+    return LLM_USAGE_DB or os.path.join(session_store.SESSION_DIR, "llm_usage.db")
+
+
+# ---- Session Tag ----
+# Helpers know their field but not their session, so the entry points that
+# run a session's LLM work (turns, session starts, jobs) tag their thread.
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def session(session_id):
+    """Count the LLM calls made by this thread inside the block against session_id"""
+    previous = getattr(_local, "session_id", None)
+    _local.session_id = session_id
+    try:
+        yield
+    finally:
+        _local.session_id = previous
+
+
+def current_session():
+    return getattr(_local, "session_id", None)
+
+
+def in_session(session_id, fn, *args, **kwargs):
+    """Call fn tagged with session_id, e.g. for work submitted to another thread"""
+    with session(session_id):
+        return fn(*args, **kwargs)
+
+
+# ---- Connections ----
+# One connection per thread and process (see sqlite_db.py)
+_connections = ThreadConnections(lambda conn, path: conn.executescript(SCHEMA_SQL))
+
+
+def get_connection():
+    """The calling thread's connection to the usage database"""
+    return _connections.get(db_path())
+
+
+# ---- Ledger ----
+class UsageLedger:
+    """Token, cost and latency totals per day, session, field, helper and model.
+
+    record() only adds to a dict under a lock. One background thread,
+    started by the first record, writes the pending totals to the database
+    every flush_seconds, or sooner once max_pending rows have built up.
+    Queries flush first, so they include calls not yet written.
+    """
+
+    def __init__(self, flush_seconds=None, max_pending=None):
+        self.flush_seconds = FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.max_pending = MAX_PENDING_ROWS if max_pending is None else max_pending
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = {}
+        self.thread = None
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def record(self, helper, field, model, seconds, prompt_tokens=0, completion_tokens=0, cost=0.0,
+               failed=False, session_id=None):
+        session_id = session_id or current_session() or ""
+        key = (time.strftime("%Y-%m-%d", time.gmtime()), session_id, field or "", helper or "", model)
+        latency_ms = seconds * 1000
+        with self.lock:
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = self.pending[key] = [0, 0, 0, 0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += int(failed)
+            entry[2] += prompt_tokens
+            entry[3] += completion_tokens
+            entry[4] += cost
+            entry[5] += latency_ms
+            entry[6] = max(entry[6], latency_ms)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="llm-usage-flush", daemon=True)
+                self.thread.start()
+            if len(self.pending) >= self.max_pending:
+                self.wake.set()
+
+    def track(self, attempt, helper, field, price):
+        """Wrap a model_router attempt so each call is recorded; price(model, prompt, completion) is its cost"""
+        if not LLM_USAGE:
+            return attempt
+        session_id = current_session()
+
+        def tracked(model, timeout, has_fallback):
+            start = time.perf_counter()
+            try:
+                text, usage = attempt(model, timeout, has_fallback)
+            except Exception:
+                self.record(helper, field, model, time.perf_counter() - start, failed=True, session_id=session_id)
+                raise
+            prompt_tokens, completion_tokens = usage
+            self.record(helper, field, model, time.perf_counter() - start, prompt_tokens, completion_tokens,
+                        price(model, prompt_tokens, completion_tokens), session_id=session_id)
+            return text, usage
+
+        return tracked
+
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write the pending totals to the database; returns how many rows were written"""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+            rows = [key + tuple(entry) for key, entry in pending.items()]
+            try:
+                conn = get_connection()
+                with transaction(conn):
+                    conn.executemany(UPSERT_SQL, rows)
+            except (sqlite3.Error, OSError) as e:
+                # Keep the totals for the next flush rather than lose them
+                print(f"Error flushing LLM usage: {str(e)}")
+                with self.lock:
+                    self.flush_errors += 1
+                    for key, entry in pending.items():
+                        current = self.pending.setdefault(key, [0, 0, 0, 0, 0.0, 0.0, 0.0])
+                        for i in range(6):
+                            current[i] += entry[i]
+                        current[6] = max(current[6], entry[6])
+                return 0
+            self.flushes += 1
+            return len(rows)
+
+    def report(self, by=("field",), session_id=None, since=None, until=None, limit=DEFAULT_REPORT_ROWS):
+        """Totals grouped by the given columns, costliest first.
+
+        by is any of day, session_id, field, helper and model; since and
+        until are inclusive YYYY-MM-DD days.
+        """
+        by = [column for column in by if column]
+        unknown = [column for column in by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Can't group by {', '.join(unknown)}; use {', '.join(GROUP_COLUMNS)}")
+        self.flush()
+        where, params = [], []
+        for clause, value in (("session_id = ?", session_id), ("day >= ?", since), ("day <= ?", until)):
+            if value:
+                where.append(clause)
+                params.append(value)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        totals_sql = (
+            "sum(calls) AS calls, sum(failures) AS failures, sum(prompt_tokens) AS prompt_tokens, "
+            "sum(completion_tokens) AS completion_tokens, sum(cost_usd) AS cost_usd, "
+            "sum(latency_ms) / sum(calls) AS avg_latency_ms, max(max_latency_ms) AS max_latency_ms"
+        )
+        conn = get_connection()
+        rows = []
+        if by:
+            columns = ", ".join(by)
+            cursor = conn.execute(
+                f"SELECT {columns}, {totals_sql} FROM llm_usage {where_sql} "
+                f"GROUP BY {columns} ORDER BY cost_usd DESC, calls DESC LIMIT ?",
+                params + [limit],
+            )
+            rows = [_rounded(dict(row)) for row in cursor]
+        total = dict(conn.execute(f"SELECT {totals_sql} FROM llm_usage {where_sql}", params).fetchone())
+        return {"by": by, "rows": rows, "total": _rounded(total)}
+
+    def snapshot(self):
+        with self.lock:
+            return {"pending_rows": len(self.pending), "flushes": self.flushes, "flush_errors": self.flush_errors}
+
+
+def _rounded(row):
+    if row.get("cost_usd") is not None:
+        row["cost_usd"] = round(row["cost_usd"], 6)
+    for key in ("avg_latency_ms", "max_latency_ms"):
+        if row.get(key) is not None:
+            row[key] = round(row[key], 1)
+    return row
+
+
+ledger = UsageLedger()
+
+
+# ---- Report Tool ----
+def format_table(report):
+    """Plain-text table of a report"""
+    columns = report["by"] + ["calls", "failures", "prompt_tokens", "completion_tokens",
+                              "cost_usd", "avg_latency_ms", "max_latency_ms"]
+    rows = report["rows"] + [dict(report["total"], **{column: "" for column in report["by"]})]
+    cells = [[str(row.get(column) if row.get(column) is not None else "") for column in columns] for row in rows]
+    if report["by"]:
+        cells[-1][0] = "TOTAL"
+    widths = [max(len(column), *(len(row[i]) for row in cells)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines += ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in cells]
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report LLM tokens, cost and latency by field, helper, session or model")
+    parser.add_argument("--by", default="field,helper", help=f"comma-separated columns from {', '.join(GROUP_COLUMNS)}")
+    parser.add_argument("--session", help="only this session")
+    parser.add_argument("--since", help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day, YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=DEFAULT_REPORT_ROWS)
+    parser.add_argument("--db", help="database path (default: LLM_USAGE_DB or <SESSION_DIR>/llm_usage.db)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    global LLM_USAGE_DB
+    if args.db:
+        LLM_USAGE_DB = args.db
+    try:
+        report = ledger.report(args.by.split(","), args.session, args.since, args.until, args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(report, indent=2) if args.json else format_table(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_accounting
+import model_router
+import voice_api
+from llm_accounting import UsageLedger
+
+
+@pytest.fixture
+def ledger(session_dir, monkeypatch):
+    ledger = UsageLedger(flush_seconds=3600)
+    monkeypatch.setattr(llm_accounting, "ledger", ledger)
+    return ledger
+
+
+def test_flushes_add_up_across_ledgers(ledger):
+    ledger.record("needs_follow_up", "duration", "small", 0.1, 100, 5, 0.001, session_id="a")
+    ledger.record("needs_follow_up", "duration", "small", 0.3, 120, 5, 0.001, session_id="a")
+    with llm_accounting.session("b"):
+        ledger.record("summarize_response_for_schema", "duration", "small", 0.2, 80, 10, 0.002)
+        ledger.record("generate_follow_up_question", "severity", "large", 1.0, 300, 40, 0.01, failed=True)
+    assert ledger.flush() == 3 and ledger.snapshot()["pending_rows"] == 0
+
+    # Another worker sharing the database
+    other = UsageLedger(flush_seconds=3600)
+    other.record("needs_follow_up", "duration", "small", 0.2, 100, 5, 0.001, session_id="c")
+    other.flush()
+
+    report = ledger.report(by=["field"])
+    assert [row["field"] for row in report["rows"]] == ["severity", "duration"]
+    duration = report["rows"][1]
+    assert duration["calls"] == 4 and duration["prompt_tokens"] == 400 and duration["cost_usd"] == 0.005
+    assert duration["avg_latency_ms"] == 200.0 and duration["max_latency_ms"] == 300.0
+    assert report["total"]["calls"] == 5 and report["total"]["failures"] == 1
+
+    by_session = ledger.report(by=["helper"], session_id="a")
+    assert by_session["rows"] == [dict(by_session["total"], helper="needs_follow_up")]
+    assert ledger.report(by=[], since="2999-01-01")["total"]["calls"] is None
+    with pytest.raises(ValueError):
+        ledger.report(by=["prompt"])
+
+
+def test_failed_flush_keeps_the_totals(ledger, session_dir, monkeypatch):
+    (session_dir / "not_a_dir").write_text("")
+    monkeypatch.setattr(llm_accounting, "LLM_USAGE_DB", str(session_dir / "not_a_dir" / "usage.db"))
+    ledger.record("needs_follow_up", "duration", "small", 0.1, 100, 5, 0.001)
+    ledger.record("needs_follow_up", "duration", "small", 0.1, 100, 5, 0.001)
+    assert ledger.flush() == 0
+    assert ledger.snapshot() == {"pending_rows": 1, "flushes": 0, "flush_errors": 1}
+
+    monkeypatch.setattr(llm_accounting, "LLM_USAGE_DB", None)
+    assert ledger.report(by=["helper"])["rows"][0]["calls"] == 2
+
+
+class FakeCompletions:
+    def create(self, model, messages, temperature, stream=False, **options):
+        usage = SimpleNamespace(prompt_tokens=len(messages[1]["content"]), completion_tokens=10)
+        content = '{"answer": "yes", "confidence": 0.9}' if options.get("response_format") else "Ok."
+        if stream:
+            return iter([
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=None),
+                SimpleNamespace(choices=[], usage=usage),
+            ])
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeClient:
+    chat = SimpleNamespace(completions=FakeCompletions())
+
+    def with_options(self, **kwargs):
+        return self
+
+
+def test_turns_are_charged_to_their_session_field_and_helper(ledger, monkeypatch):
+    monkeypatch.setattr(voice_api, "_client", FakeClient())
+    monkeypatch.setattr(voice_api, "model_router", model_router.ModelRouter())
+    client = voice_api.app.test_client()
+    client.post("/api/start-session/costly")
+    client.post("/api/process-response/costly",
+                json={"response": "a headache", "current_field": "chief_complaint"})
+
+    report = client.get("/api/models/usage?by=helper,field&session_id=costly").get_json()
+    rows = {(row["helper"], row["field"]): row for row in report["rows"]}
+    assert set(rows) == {
+        ("generate_first_question", "chief_complaint"),
+        ("needs_follow_up", "chief_complaint"),
+        ("summarize_response_for_schema", "chief_complaint"),
+        ("generate_transition_question", "duration"),
+    }
+    classify = rows[("needs_follow_up", "chief_complaint")]
+    assert classify["calls"] == 1 and classify["completion_tokens"] == 10
+    expected = voice_api.model_router.cost(model_router.SMALL_MODEL, classify["prompt_tokens"], 10)
+    assert classify["cost_usd"] == round(expected, 6)
+    assert report["total"]["calls"] == 4
+
+    by_model = client.get("/api/models/usage?by=model").get_json()
+    assert {row["model"] for row in by_model["rows"]} == {model_router.SMALL_MODEL, model_router.LARGE_MODEL}
+    assert client.get("/api/models/usage?by=prompt").status_code == 400
+
+
+def test_report_tool_prints_a_table(ledger, capsys):
+    ledger.record("needs_follow_up", "duration", "small", 0.1, 100, 5, 0.001, session_id="a")
+    assert llm_accounting.main(["--by", "field,helper"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:3] == ["field", "helper", "calls"]
+    assert lines[1].split()[:3] == ["duration", "needs_follow_up", "1"]
+    assert lines[2].split()[:2] == ["TOTAL", "1"]
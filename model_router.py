@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+from percentiles import percentile_ms
+
+# ---- Configuration ----
+# Each task runs on the first model of its chain; later models are fallbacks
+# tried when a call fails or times out. Classification and extraction answer
+# in a few tokens, so a small model is enough; patient-facing questions use
+# the large one. Override with MODEL_ROUTES, e.g.
+#   MODEL_ROUTES='{"classify": ["llama-3.1-8b-instant"], "generate": {"timeout": 20}}'
+SMALL_MODEL = "llama-3.1-8b-instant"
+LARGE_MODEL = "llama-3.3-70b-versatile"
+
+DEFAULT_ROUTES = {
+    "classify": {"models": [SMALL_MODEL, LARGE_MODEL], "timeout": 5.0},
+    "extract": {"models": [SMALL_MODEL, LARGE_MODEL], "timeout": 5.0},
+    "generate": {"models": [LARGE_MODEL, SMALL_MODEL], "timeout": 15.0},
+}
+
+# USD per million tokens: (input, output). Override with MODEL_PRICES.
+DEFAULT_PRICES = {
+    SMALL_MODEL: (0.05, 0.08),
+    LARGE_MODEL: (0.59, 0.79),
+}
+
+LATENCY_SAMPLES = 1000
+
+
+class PartialOutputError(Exception):
+    """A streamed call failed after part of its output was already used.
+
+    Falling back to another model would repeat that output, so the router
+    gives up instead.
+    """
+
+
+def parse_routes(overrides=None, base=None):
+    """Merge route overrides (a dict or JSON string) over the base routes.
+
+    Each task maps to a list of models or to {"models": [...], "timeout": s}.
+    """
+    routes = {task: dict(route) for task, route in (base or DEFAULT_ROUTES).items()}
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides) if overrides.strip() else {}
+    for task, route in (overrides or {}).items():
+        if isinstance(route, list):
+            route = {"models": route}
+        merged = dict(routes.get(task, {"timeout": None}))
+        merged.update(route)
+        if not merged.get("models"):
+            raise ValueError(f"Route {task} has no models")
+        routes[task] = merged
+    return routes
+
+
+def parse_prices(overrides=None):
+    """Merge price overrides ({"model": [input, output]} or JSON) over the defaults"""
+    prices = dict(DEFAULT_PRICES)
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides) if overrides.strip() else {}
+    for model, (price_in, price_out) in (overrides or {}).items():
+        prices[model] = (float(price_in), float(price_out))
+    return prices
+
+
+def estimate_tokens(text):
+    """Rough token count for responses that don't report usage"""
+    return max(1, len(text or "") // 4)
+
+
+# ---- Stats ----
+class RouteStats:
+    """Calls, failures, latency, tokens and cost per task and model"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def _entry(self, task, model):
+        key = (task, model)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {
+                "calls": 0, "failures": 0, "fallbacks": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+                "latencies": deque(maxlen=LATENCY_SAMPLES),
+            }
+        return entry
+
+    def record(self, task, model, seconds, prompt_tokens=0, completion_tokens=0, cost=0.0,
+               failed=False, fell_back=False):
+        with self.lock:
+            entry = self._entry(task, model)
+            entry["calls"] += 1
+            entry["failures"] += int(failed)
+            entry["fallbacks"] += int(fell_back)
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["cost_usd"] += cost
+            if not failed:
+                entry["latencies"].append(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+
+    def snapshot(self):
+        with self.lock:
+            report = {}
+            for (task, model), entry in self.entries.items():
+                summary = {k: v for k, v in entry.items() if k != "latencies"}
+                summary["cost_usd"] = round(summary["cost_usd"], 6)
+                summary["p50_ms"] = percentile_ms(entry["latencies"], 0.50)
+                summary["p95_ms"] = percentile_ms(entry["latencies"], 0.95)
+                report.setdefault(task, {})[model] = summary
+            return report
+
+
+# ---- Router ----
+class ModelRouter:
+    """Runs each LLM task on its configured model chain and tracks the cost"""
+
+    def __init__(self, routes=None, prices=None):
+        self.routes = parse_routes(routes)
+        self.prices = parse_prices(prices)
+        self.stats = RouteStats()
+
+    def configure(self, routes=None, prices=None):
+        """Replace the routes (and optionally prices), e.g. to compare configurations"""
+        self.routes = parse_routes(routes)
+        if prices is not None:
+            self.prices = parse_prices(prices)
+
+    def models_for(self, task):
+        return self.routes[task]["models"]
+
+    def cost(self, model, prompt_tokens, completion_tokens):
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+    def run(self, task, attempt):
+        """Call attempt(model, timeout, has_fallback) along the task's chain.
+
+        attempt returns (text, usage), with usage a (prompt_tokens,
+        completion_tokens) pair or None to estimate from the text. The
+        first model to succeed wins; if every model fails, the last error
+        is raised.
+        """
+        route = self.routes[task]
+        models = route["models"]
+        for i, model in enumerate(models):
+            has_fallback = i < len(models) - 1
+            start = time.perf_counter()
+            try:
+                text, usage = attempt(model, route.get("timeout"), has_fallback)
+            except PartialOutputError as e:
+                self.stats.record(task, model, time.perf_counter() - start, failed=True)
+                raise e.__cause__ or e
+            except Exception as e:
+                self.stats.record(task, model, time.perf_counter() - start,
+                                  failed=True, fell_back=has_fallback)
+                if not has_fallback:
+                    raise
+                print(f"Model {model} failed for {task} ({e}); falling back to {models[i + 1]}")
+                continue
+            prompt_tokens, completion_tokens = usage or (0, estimate_tokens(text))
+            self.stats.record(
+                task, model, time.perf_counter() - start, prompt_tokens, completion_tokens,
+                self.cost(model, prompt_tokens, completion_tokens),
+            )
+            return text
+
+    def metrics(self):
+        return {"routes": self.routes, "stats": self.stats.snapshot()}
+
+
+router = ModelRouter(os.getenv("MODEL_ROUTES"), os.getenv("MODEL_PRICES"))
@@ -0,0 +1,142 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import model_router
+import voice_api
+from model_router import ModelRouter, PartialOutputError, parse_routes
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions; fails for models in `failing`"""
+
+    def __init__(self, failing=(), stream_fails_after=None):
+        self.calls = []
+        self.failing = set(failing)
+        self.stream_fails_after = stream_fails_after
+
+    def create(self, model, messages, temperature, stream=False, **options):
+        self.calls.append(model)
+        self.options = options
+        if model in self.failing:
+            raise RuntimeError(f"{model} unavailable")
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10)
+        if not stream:
+            message = SimpleNamespace(content=" yes ")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+        return self.stream(usage)
+
+    def stream(self, usage):
+        for i, delta in enumerate(["Hello there.", " How are you?", " Anything else?"]):
+            if self.stream_fails_after == i:
+                raise RuntimeError("connection reset")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class FakeClient:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+    def with_options(self, **kwargs):
+        return self
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = ModelRouter()
+    monkeypatch.setattr(voice_api, "model_router", router)
+    return router
+
+
+def use_completions(monkeypatch, completions):
+    monkeypatch.setattr(voice_api, "_client", FakeClient(completions))
+    return completions
+
+
+def test_parse_routes_merges_overrides():
+    routes = parse_routes(json.dumps({"classify": ["tiny"], "generate": {"timeout": 30}}))
+    assert routes["classify"]["models"] == ["tiny"]
+    assert routes["classify"]["timeout"] == model_router.DEFAULT_ROUTES["classify"]["timeout"]
+    assert routes["generate"]["models"] == model_router.DEFAULT_ROUTES["generate"]["models"]
+    assert routes["generate"]["timeout"] == 30
+    with pytest.raises(ValueError):
+        parse_routes({"extract": []})
+
+
+def test_tasks_use_their_routed_model(router, monkeypatch):
+    completions = use_completions(monkeypatch, FakeCompletions())
+    assert voice_api.needs_follow_up("duration", "three days") is True
+    voice_api.summarize_response_for_schema("duration", "three days")
+    voice_api.generate_follow_up_question("duration", "a while")
+    assert completions.calls == [model_router.SMALL_MODEL, model_router.SMALL_MODEL, model_router.LARGE_MODEL]
+
+    stats = router.stats.snapshot()
+    entry = stats["classify"][model_router.SMALL_MODEL]
+    assert entry["calls"] == 1 and entry["prompt_tokens"] == 100 and entry["completion_tokens"] == 10
+    assert entry["cost_usd"] == pytest.approx((100 * 0.05 + 10 * 0.08) / 1e6, abs=1e-6)
+    assert stats["generate"][model_router.LARGE_MODEL]["cost_usd"] > entry["cost_usd"]
+
+
+def test_falls_back_along_the_chain(router, monkeypatch):
+    completions = use_completions(monkeypatch, FakeCompletions(failing={model_router.SMALL_MODEL}))
+    assert voice_api.needs_follow_up("duration", "three days") is True
+    assert completions.calls == [model_router.SMALL_MODEL, model_router.LARGE_MODEL]
+
+    stats = router.stats.snapshot()["classify"]
+    assert stats[model_router.SMALL_MODEL]["failures"] == 1
+    assert stats[model_router.SMALL_MODEL]["fallbacks"] == 1
+    assert stats[model_router.LARGE_MODEL]["calls"] == 1
+
+
+def test_last_model_failure_is_raised(router, monkeypatch):
+    use_completions(monkeypatch, FakeCompletions(failing={model_router.SMALL_MODEL, model_router.LARGE_MODEL}))
+    with pytest.raises(RuntimeError, match="unavailable"):
+        voice_api.summarize_response_for_schema("duration", "three days")
+
+
+def test_streaming_falls_back_only_before_output(router, monkeypatch):
+    sentences = []
+    completions = use_completions(monkeypatch, FakeCompletions(stream_fails_after=0))
+    with pytest.raises(RuntimeError):
+        voice_api.generate_first_question("duration", on_sentence=sentences.append)
+    # Nothing was spoken yet, so the fallback model was tried too
+    assert completions.calls == [model_router.LARGE_MODEL, model_router.SMALL_MODEL]
+
+    completions = use_completions(monkeypatch, FakeCompletions(stream_fails_after=2))
+    with pytest.raises(RuntimeError, match="connection reset"):
+        voice_api.generate_first_question("duration", on_sentence=sentences.append)
+    # The first sentence was already spoken; retrying would repeat it
+    assert completions.calls == [model_router.LARGE_MODEL]
+    assert sentences == ["Hello there."]
+
+
+def test_router_estimates_missing_usage():
+    router = ModelRouter({"classify": ["m"]}, {"m": [1000000, 1000000]})
+    assert router.run("classify", lambda model, timeout, has_fallback: ("yes" * 8, None)) == "yes" * 8
+    entry = router.stats.snapshot()["classify"]["m"]
+    assert entry["completion_tokens"] == 6
+    assert entry["cost_usd"] == 6
+
+
+def test_partial_output_is_not_retried():
+    router = ModelRouter({"generate": ["a", "b"]})
+    calls = []
+
+    def attempt(model, timeout, has_fallback):
+        calls.append(model)
+        try:
+            raise ValueError("boom")
+        except ValueError as e:
+            raise PartialOutputError("boom") from e
+
+    with pytest.raises(ValueError):
+        router.run("generate", attempt)
+    assert calls == ["a"]
+
+
+def test_model_stats_endpoint(router):
+    body = voice_api.app.test_client().get("/api/models/stats").get_json()
+    assert body["routes"]["classify"]["models"][0] == model_router.SMALL_MODEL
+    assert body["stats"] == {}
@@ -0,0 +1,6 @@
+def percentile_ms(samples, fraction):
+    """The given percentile (0.5 for p50) of latencies in seconds, in ms; None without samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 1)
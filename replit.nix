@@ -1,6 +1,7 @@
 {pkgs}: {
   deps = [
     pkgs.espeak-ng
+    pkgs.ffmpeg
     pkgs.libxcrypt
   ];
 }
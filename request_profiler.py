@@ -0,0 +1,229 @@
+import os
+import sys
+import glob
+import time
+import uuid
+import threading
+import contextlib
+
+import session_store
+
+# ---- Configuration ----
+# Off unless one of these is set:
+#   PROFILE_TOKEN    requests sending `X-Profile: <token>` are profiled
+#   PROFILE_SLOW_MS  every request is sampled and kept if it took this long
+PROFILE_HEADER = "X-Profile"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Defaults to profiles/ next to the session files
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+# The directory is a ring buffer: the oldest captures are deleted beyond this
+MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "50"))
+MAX_STACK_DEPTH = 64
+MAX_STACKS = 2000
+
+
+def profile_dir():
+    return PROFILE_DIR or os.path.join(session_store.SESSION_DIR, "profiles")
+
+
+def enabled():
+    return bool(PROFILE_TOKEN or PROFILE_SLOW_MS > 0)
+
+
+# ---- Captures ----
+class Capture:
+    """Stack samples and stage timings for one request"""
+
+    def __init__(self, trigger, thread_id=None):
+        self.id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        self.trigger = trigger
+        self.thread_id = thread_id or threading.get_ident()
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.samples = 0
+        self.dropped = 0
+        self.stacks = {}
+        self.stages = {}
+
+    def add_sample(self, stack):
+        self.samples += 1
+        if stack in self.stacks or len(self.stacks) < MAX_STACKS:
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        else:
+            self.dropped += 1
+
+    def add_stage(self, name, seconds):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {"count": 0, "total_ms": 0.0}
+        entry["count"] += 1
+        entry["total_ms"] += seconds * 1000
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        return self.duration_ms
+
+    def to_dict(self, **request_info):
+        stages = {name: dict(entry, total_ms=round(entry["total_ms"], 2)) for name, entry in self.stages.items()}
+        accounted = sum(entry["total_ms"] for entry in self.stages.values())
+        return dict(
+            request_info,
+            id=self.id,
+            trigger=self.trigger,
+            started_at=self.started_at,
+            duration_ms=round(self.duration_ms, 2),
+            interval_ms=PROFILE_INTERVAL_MS,
+            samples=self.samples,
+            dropped_samples=self.dropped,
+            stages=stages,
+            other_ms=round(max(0.0, self.duration_ms - accounted), 2),
+            stacks=self.stacks,
+        )
+
+
+def frame_stack(frame):
+    """Folded stack of a frame, root first: "file:function;file:function;..." """
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# ---- Sampler ----
+class Sampler:
+    """One thread that samples the stacks of every thread with an open capture.
+
+    It only runs while captures are open, so with profiling off there is no
+    sampling thread at all.
+    """
+
+    def __init__(self, interval_ms=None):
+        self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+        self.lock = threading.Lock()
+        self.captures = {}
+        self.thread = None
+
+    def add(self, capture):
+        with self.lock:
+            self.captures[capture.thread_id] = capture
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+                self.thread.start()
+
+    def remove(self, capture):
+        with self.lock:
+            if self.captures.get(capture.thread_id) is capture:
+                del self.captures[capture.thread_id]
+
+    def run(self):
+        while True:
+            # Sampling under the lock means a removed capture gets no more samples
+            with self.lock:
+                if not self.captures:
+                    self.thread = None
+                    return
+                frames = sys._current_frames()
+                for capture in self.captures.values():
+                    frame = frames.get(capture.thread_id)
+                    if frame is not None:
+                        capture.add_sample(frame_stack(frame))
+                del frames
+            time.sleep(self.interval)
+
+
+sampler = Sampler()
+_local = threading.local()
+
+
+def start_capture(trigger):
+    """Open a capture for the calling thread and start sampling it"""
+    capture = Capture(trigger)
+    _local.capture = capture
+    sampler.add(capture)
+    return capture
+
+
+def stop_capture(capture):
+    """Stop sampling a capture and return its duration in ms"""
+    sampler.remove(capture)
+    if getattr(_local, "capture", None) is capture:
+        _local.capture = None
+    return capture.finish() if capture.duration_ms is None else capture.duration_ms
+
+
+def current():
+    return getattr(_local, "capture", None)
+
+
+_no_stage = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def _timed_stage(capture, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        capture.add_stage(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """Time a block as a named stage of the request being profiled, if any"""
+    capture = getattr(_local, "capture", None)
+    if capture is None:
+        return _no_stage
+    return _timed_stage(capture, name)
+
+
+# ---- Ring Buffer ----
+def _capture_path(capture_id):
+    if not capture_id or "/" in capture_id or capture_id.startswith("."):
+        raise ValueError("Invalid capture id")
+    return os.path.join(profile_dir(), f"profile_{capture_id}.json")
+
+
+def save_capture(capture, **request_info):
+    """Write a finished capture and drop the oldest beyond MAX_CAPTURES"""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    data = capture.to_dict(**request_info)
+    session_store.write_json(_capture_path(capture.id), data)
+    paths = sorted(glob.glob(os.path.join(directory, "profile_*.json")))
+    for path in paths[:max(0, len(paths) - MAX_CAPTURES)]:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    return data
+
+
+def load_capture(capture_id):
+    """A saved capture, or None"""
+    try:
+        return session_store.read_json(_capture_path(capture_id))
+    except ValueError:
+        return None
+
+
+def list_captures():
+    """Saved captures, newest first, without their stacks"""
+    captures = []
+    for path in sorted(glob.glob(os.path.join(profile_dir(), "profile_*.json")), reverse=True):
+        try:
+            data = session_store.read_json(path)
+        except (OSError, ValueError):
+            # Dropped from the ring buffer while listing, or still being written
+            continue
+        if data is not None:
+            data.pop("stacks", None)
+            captures.append(data)
+    return captures
+
+
+def folded(data):
+    """Collapsed stacks ("stack count" per line), as flamegraph.pl and speedscope read"""
+    lines = [f"{stack} {count}" for stack, count in sorted(data.get("stacks", {}).items())]
+    return "\n".join(lines) + "\n"
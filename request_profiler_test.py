@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+import request_profiler
+import voice_api
+
+
+@pytest.fixture
+def profiling(session_dir, monkeypatch):
+    monkeypatch.setattr(voice_api, "generate_first_question", lambda field, on_sentence=None: "Hello?")
+    monkeypatch.setattr(request_profiler, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(request_profiler, "PROFILE_INTERVAL_MS", 2)
+    monkeypatch.setattr(request_profiler.sampler, "interval", 0.002)
+    return session_dir / "profiles"
+
+
+def take_turn(client, session_id, headers=None):
+    client.post(f"/api/start-session/{session_id}")
+    return client.post(
+        f"/api/process-response/{session_id}",
+        json={"response": "I have a headache", "current_field": "chief_complaint"},
+        headers=headers or {},
+    )
+
+
+def test_header_captures_stacks_and_stages(profiling, fake_llm):
+    client = voice_api.app.test_client()
+    response = take_turn(client, "prof", {"X-Profile": "secret"})
+    capture_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/profiles").get_json()["captures"]
+    assert [c["id"] for c in listed] == [capture_id]
+    assert "stacks" not in listed[0]
+
+    capture = client.get(f"/api/profiles/{capture_id}").get_json()
+    assert capture["trigger"] == "header" and capture["endpoint"] == "process_response"
+    assert capture["status"] == 200
+    assert {"schema.load", "schema.save", "intake_db"} <= set(capture["stages"])
+    # The fake LLM helpers sleep; the samples should find them
+    assert capture["samples"] > 10
+    folded = client.get(f"/api/profiles/{capture_id}?format=folded").get_data(as_text=True)
+    assert "conftest.py:fake_llm.<locals>.slow.<locals>.fake" in folded
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.splitlines())
+
+
+def test_requests_are_not_profiled_without_the_token(profiling, fake_llm):
+    client = voice_api.app.test_client()
+    assert "X-Profile-Id" not in take_turn(client, "plain").headers
+    assert "X-Profile-Id" not in take_turn(client, "wrong", {"X-Profile": "guess"}).headers
+    assert client.get("/api/profiles").get_json()["captures"] == []
+    assert request_profiler.sampler.captures == {}
+
+
+def test_slow_requests_are_kept(profiling, fake_llm, monkeypatch):
+    monkeypatch.setattr(request_profiler, "PROFILE_TOKEN", None)
+    monkeypatch.setattr(request_profiler, "PROFILE_SLOW_MS", 100)
+    client = voice_api.app.test_client()
+
+    assert "X-Profile-Id" not in client.get("/api/get-schema/quick").headers
+    slow = take_turn(client, "slow")
+    capture = request_profiler.load_capture(slow.headers["X-Profile-Id"])
+    assert capture["trigger"] == "slow" and capture["duration_ms"] >= 100
+
+
+def test_ring_buffer_keeps_the_newest_captures(profiling, monkeypatch):
+    monkeypatch.setattr(request_profiler, "MAX_CAPTURES", 3)
+    ids = []
+    for _ in range(5):
+        capture = request_profiler.start_capture("header")
+        request_profiler.stop_capture(capture)
+        request_profiler.save_capture(capture)
+        ids.append(capture.id)
+        time.sleep(0.002)
+    assert [c["id"] for c in request_profiler.list_captures()] == ids[:1:-1]
+    assert request_profiler.load_capture("../schema_x") is None
+    assert voice_api.app.test_client().get(f"/api/profiles/{ids[0]}").status_code == 404
+
+
+def test_stages_are_free_when_not_profiling():
+    assert request_profiler.stage("llm.generate") is request_profiler.stage("stt")
+    capture = request_profiler.start_capture("header")
+    try:
+        with request_profiler.stage("stt"):
+            time.sleep(0.01)
+        with request_profiler.stage("stt"):
+            pass
+    finally:
+        request_profiler.stop_capture(capture)
+    assert capture.stages["stt"]["count"] == 2 and capture.stages["stt"]["total_ms"] >= 10
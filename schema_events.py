@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+import contextlib
+from collections import OrderedDict, deque
+
+# ---- Configuration ----
+# Changes kept per session, for subscribers that fall behind or reconnect
+BUFFER_EVENTS = int(os.getenv("SCHEMA_FEED_BUFFER", "64"))
+# Sessions with a buffer in memory; the least recently updated are dropped
+MAX_SESSIONS = int(os.getenv("SCHEMA_FEED_MAX_SESSIONS", "10000"))
+# Open SSE streams and long polls; more are refused with 503
+MAX_SUBSCRIBERS = int(os.getenv("SCHEMA_FEED_MAX_SUBSCRIBERS", "256"))
+HEARTBEAT_SECONDS = 15
+# How soon an EventSource reconnects after losing the stream
+RECONNECT_MS = 3000
+MAX_POLL_SECONDS = 30
+
+
+class TooManySubscribers(Exception):
+    """Raised when the feed already has MAX_SUBSCRIBERS waiting"""
+
+
+class ChangeFeed:
+    """In-memory pub/sub of schema changes, one bounded buffer per session.
+
+    Every event gets a sequence number from one counter for the process,
+    so a subscriber resumes with the last number it saw (the SSE event id).
+    When the events after that number are no longer buffered, because the
+    buffer wrapped or the session was dropped, the subscriber is told it
+    missed some ("gap") and should take a fresh snapshot.
+
+    The counter starts from the clock (milliseconds x 1000), so numbers from
+    an earlier process are below this process's start and also count as a
+    gap, as do numbers it hasn't handed out yet.
+
+    The feed only sees saves made in this process.
+    """
+
+    def __init__(self, buffer_events=None, max_sessions=None, max_subscribers=None, start_seq=None):
+        self.buffer_events = BUFFER_EVENTS if buffer_events is None else buffer_events
+        self.max_sessions = MAX_SESSIONS if max_sessions is None else max_sessions
+        self.max_subscribers = MAX_SUBSCRIBERS if max_subscribers is None else max_subscribers
+        self.cond = threading.Condition()
+        self.start_seq = int(time.time() * 1000) * 1000 if start_seq is None else start_seq
+        self.seq = self.start_seq
+        # session_id -> [buffered events, seq of the newest event dropped from them]
+        self.sessions = OrderedDict()
+        # seq of the newest event in any session dropped to stay under max_sessions
+        self.dropped_seq = self.start_seq
+        self.subscribers = 0
+        self.published = 0
+        self.refused = 0
+
+    def publish(self, session_id, event):
+        """Add an event to a session's feed and wake its subscribers; returns its seq"""
+        with self.cond:
+            self.seq += 1
+            event = dict(event, seq=self.seq, at=time.time())
+            entry = self.sessions.pop(session_id, None)
+            if entry is None:
+                # A session dropped earlier may have had events up to dropped_seq
+                entry = [deque(), self.dropped_seq]
+            events = entry[0]
+            if len(events) == self.buffer_events:
+                entry[1] = events.popleft()["seq"]
+            events.append(event)
+            self.sessions[session_id] = entry
+            while len(self.sessions) > self.max_sessions:
+                _, (dropped, _) = self.sessions.popitem(last=False)
+                if dropped:
+                    self.dropped_seq = max(self.dropped_seq, dropped[-1]["seq"])
+            self.published += 1
+            self.cond.notify_all()
+            return self.seq
+
+    # Called with self.cond held
+    def _since(self, session_id, since):
+        if since < self.start_seq or since > self.seq:
+            # From another process, e.g. before a restart
+            return [], True
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return [], since < self.dropped_seq
+        events, floor = entry
+        if since < floor:
+            return [], True
+        return [event for event in events if event["seq"] > since], False
+
+    def events_since(self, session_id, since):
+        """(events after since, gap) without waiting"""
+        with self.cond:
+            return self._since(session_id, since)
+
+    def wait(self, session_id, since, timeout):
+        """(events after since, gap), waiting up to timeout seconds for one"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                events, gap = self._since(session_id, since)
+                remaining = deadline - time.monotonic()
+                if events or gap or remaining <= 0:
+                    return events, gap
+                self.cond.wait(remaining)
+
+    def latest(self):
+        with self.cond:
+            return self.seq
+
+    def subscribe(self):
+        """Count an open subscriber; raises TooManySubscribers past the limit"""
+        with self.cond:
+            if self.subscribers >= self.max_subscribers:
+                self.refused += 1
+                raise TooManySubscribers(f"{self.subscribers} schema feed subscribers already open")
+            self.subscribers += 1
+
+    def unsubscribe(self):
+        with self.cond:
+            self.subscribers -= 1
+
+    @contextlib.contextmanager
+    def subscription(self):
+        self.subscribe()
+        try:
+            yield
+        finally:
+            self.unsubscribe()
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "seq": self.seq,
+                "sessions": len(self.sessions),
+                "buffered_events": sum(len(events) for events, _ in self.sessions.values()),
+                "subscribers": self.subscribers,
+                "published": self.published,
+                "refused": self.refused,
+            }
+
+
+feed = ChangeFeed()
@@ -0,0 +1,177 @@
+import json
+import time
+import threading
+
+import pytest
+
+import schema_events
+import voice_api
+from schema_events import ChangeFeed, TooManySubscribers
+
+
+def test_subscribers_resume_from_their_position():
+    feed = ChangeFeed(buffer_events=2)
+    start = feed.latest()
+    first = feed.publish("a", {"type": "changed", "changed": {"duration": "3 days"}})
+    feed.publish("b", {"type": "changed", "changed": {"duration": "2 weeks"}})
+    third = feed.publish("a", {"type": "changed", "changed": {"severity": "7"}})
+
+    events, gap = feed.events_since("a", start)
+    assert [e["seq"] for e in events] == [first, third] and not gap
+    assert feed.events_since("a", first) == ([events[1]], False)
+    assert feed.events_since("unknown", start) == ([], False)
+
+    # A third event for "a" pushes the first out of its buffer
+    feed.publish("a", {"type": "changed", "changed": {"location": "temples"}})
+    assert feed.events_since("a", start) == ([], True)
+    assert len(feed.events_since("a", first)[0]) == 2
+
+
+def test_positions_from_another_process_are_a_gap():
+    before = ChangeFeed()
+    for _ in range(500):
+        before.publish("s", {"type": "changed"})
+    stale = before.latest()
+    time.sleep(0.01)  # a restart takes more than a millisecond
+
+    # After a restart the counter starts above anything handed out before
+    after = ChangeFeed()
+    after.publish("s", {"type": "changed"})
+    assert after.latest() > stale
+    assert after.events_since("s", stale) == ([], True)
+    assert after.events_since("s", 500) == ([], True)
+    # and a position from the future is no better
+    assert after.events_since("s", after.latest() + 10) == ([], True)
+    assert len(after.events_since("s", after.start_seq)[0]) == 1
+
+
+def test_dropped_sessions_report_a_gap():
+    feed = ChangeFeed(max_sessions=1)
+    seq = feed.publish("a", {"type": "reset"})
+    feed.publish("b", {"type": "reset"})
+    assert feed.snapshot()["sessions"] == 1
+    assert feed.events_since("a", seq - 1) == ([], True)
+    assert feed.events_since("a", seq) == ([], False)
+
+    # Coming back doesn't hide the events it lost
+    feed.publish("a", {"type": "changed"})
+    assert feed.events_since("a", seq - 1) == ([], True)
+    assert len(feed.events_since("a", seq)[0]) == 1
+
+
+def test_wait_returns_when_an_event_arrives():
+    feed = ChangeFeed()
+    threading.Timer(0.05, feed.publish, ("a", {"type": "changed"})).start()
+    start = time.monotonic()
+    events, _ = feed.wait("a", feed.latest(), timeout=2)
+    assert len(events) == 1 and time.monotonic() - start < 1
+    assert feed.wait("a", events[0]["seq"], timeout=0.05) == ([], False)
+
+
+def test_subscribers_are_bounded():
+    feed = ChangeFeed(max_subscribers=1)
+    with feed.subscription():
+        with pytest.raises(TooManySubscribers):
+            feed.subscribe()
+    feed.subscribe()
+    assert feed.snapshot()["subscribers"] == 1 and feed.snapshot()["refused"] == 1
+
+
+@pytest.fixture
+def interviews(session_dir, fake_llm, monkeypatch):
+    monkeypatch.setattr(voice_api, "generate_first_question", lambda field, on_sentence=None: "Hello?")
+    monkeypatch.setattr(schema_events, "feed", ChangeFeed())
+    monkeypatch.setattr(schema_events, "HEARTBEAT_SECONDS", 0.1)
+    return voice_api.app.test_client()
+
+
+def answer_later(client, session_id, delay=0.1):
+    def answer():
+        time.sleep(delay)
+        client.post(f"/api/process-response/{session_id}",
+                    json={"response": "a headache", "current_field": "chief_complaint"})
+    thread = threading.Thread(target=answer)
+    thread.start()
+    return thread
+
+
+def test_get_schema_does_not_create_unknown_sessions(interviews, session_dir):
+    response = interviews.get("/api/get-schema/never-started")
+    assert response.status_code == 200
+    assert set(response.get_json().values()) == {""}
+    assert list(session_dir.glob("schema_*")) == []
+
+
+def test_long_poll_returns_field_diffs(interviews):
+    interviews.post("/api/start-session/poll")
+    first = interviews.get("/api/schema-feed/poll/poll").get_json()
+    assert first["snapshot"]["type"] == "snapshot" and first["events"] == []
+    assert first["snapshot"]["schema"]["chief_complaint"] == ""
+
+    thread = answer_later(interviews, "poll")
+    changes = interviews.get(f"/api/schema-feed/poll/poll?since={first['seq']}&timeout=5").get_json()
+    thread.join()
+    [event] = changes["events"]
+    assert event["type"] == "changed" and event["changed"] == {"chief_complaint": "headache"}
+    assert event["version"] == interviews.get("/api/get-schema/poll").headers["ETag"].strip('"')
+    assert changes["seq"] == event["seq"] and changes["snapshot"] is None
+
+    quiet = interviews.get(f"/api/schema-feed/poll/poll?since={changes['seq']}&timeout=0.05").get_json()
+    assert quiet == {"seq": changes["seq"], "snapshot": None, "events": []}
+
+    interviews.post("/api/start-session/poll")
+    restarted = interviews.get(f"/api/schema-feed/poll/poll?since={changes['seq']}&timeout=0").get_json()
+    assert restarted["events"][0]["type"] == "reset"
+    assert restarted["events"][0]["schema"]["chief_complaint"] == ""
+
+
+def test_long_poll_from_before_a_restart_gets_a_snapshot(interviews):
+    interviews.post("/api/start-session/stale")
+    stale = interviews.get("/api/schema-feed/stale/poll?since=500&timeout=5").get_json()
+    assert stale["snapshot"]["type"] == "snapshot" and stale["events"] == []
+    assert stale["seq"] == schema_events.feed.latest()
+
+
+def read_events(response, count):
+    """Parse server-sent events from a streamed test response"""
+    events, buffer = [], ""
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buffer:
+            block, buffer = buffer.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "data" in fields:
+                events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+        if len(events) >= count:
+            return events
+    return events
+
+
+def test_event_stream_pushes_changes(interviews):
+    interviews.post("/api/start-session/live")
+    response = interviews.get("/api/schema-feed/live", buffered=False)
+    assert response.mimetype == "text/event-stream"
+
+    thread = answer_later(interviews, "live")
+    (_, kind, snapshot), (event_id, changed_kind, changed) = read_events(response, 2)
+    thread.join()
+    assert kind == "snapshot" and snapshot["complete"] is False
+    assert changed_kind == "changed" and changed["changed"] == {"chief_complaint": "headache"}
+    assert int(event_id) == changed["seq"]
+    assert schema_events.feed.snapshot()["subscribers"] == 1
+    response.close()
+    assert schema_events.feed.snapshot()["subscribers"] == 0
+
+    # Resuming from the last event id skips the snapshot
+    interviews.post("/api/start-session/live")
+    resumed = interviews.get("/api/schema-feed/live", headers={"Last-Event-ID": event_id}, buffered=False)
+    [(_, kind, reset)] = read_events(resumed, 1)
+    resumed.close()
+    assert kind == "reset" and reset["schema"]["chief_complaint"] == ""
+
+
+def test_feed_refuses_subscribers_past_the_limit(interviews, monkeypatch):
+    monkeypatch.setattr(schema_events, "feed", ChangeFeed(max_subscribers=0))
+    response = interviews.get("/api/schema-feed/full")
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    assert interviews.get("/api/schema-feed/full/poll").status_code == 503
@@ -1,8 +1,10 @@
 // This file sets up a proxy to the voice service
 import { execSync, spawn } from 'child_process';
 import { existsSync } from 'fs';
+import type { Server } from 'http';
 import { Request, Response } from 'express';
 import axios from 'axios';
+import { WebSocketServer, WebSocket, type RawData } from 'ws';
 
 // Voice service status tracking
 let voiceServiceRunning = false;
@@ -36,20 +38,42 @@ export async function startVoiceService(): Promise<boolean> {
     
     console.log('Voice service started in the background');
     
-    // Give it a moment to start
-    return new Promise((resolve) => {
-      setTimeout(() => {
-        const running = checkVoiceService();
-        console.log('Voice service running check:', running);
-        resolve(running);
-      }, 2000);
-    });
+    // Wait for the service to report ready instead of sleeping a fixed time
+    const ready = await waitForVoiceServiceReady();
+    console.log('Voice service ready check:', ready);
+    return ready;
   } catch (error) {
     console.error('Failed to start voice service:', error);
     return false;
   }
 }
 
+// Poll the voice service health endpoint until it reports ready.
+// The port binds before the heavy backends load, so a 503 means "warming up";
+// requests sent during warm-up still succeed, just more slowly.
+export async function waitForVoiceServiceReady(timeoutMs = 15000, intervalMs = 100): Promise<boolean> {
+  const deadline = Date.now() + timeoutMs;
+  let listening = false;
+  
+  while (Date.now() < deadline) {
+    try {
+      const response = await axios.get(`${getVoiceServiceUrl()}/api/health`, {
+        timeout: 1000,
+        validateStatus: () => true
+      });
+      listening = true;
+      if (response.status === 200 && response.data?.ready) {
+        return true;
+      }
+    } catch (error) {
+      // Port not bound yet
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+  
+  return listening;
+}
+
 // Check if the voice service is running
 export function checkVoiceService(): boolean {
   try {
@@ -77,6 +101,21 @@ function getVoiceServiceUrl(): string {
   return `http://${serviceHost}:${servicePort}`;
 }
 
+// Send a voice service response back to the client as-is
+function relayResponse(res: Response, status: number, headers: any, body: any) {
+  // retry-after tells a client shed by admission control when to try again;
+  // x-profile-id names the saved profile of a profiled request
+  for (const name of ['content-type', 'etag', 'vary', 'retry-after', 'x-profile-id']) {
+    if (headers[name]) {
+      res.setHeader(name, headers[name]);
+    }
+  }
+  if (status === 304) {
+    return res.status(304).end();
+  }
+  return res.status(status).send(Buffer.from(body));
+}
+
 // Proxy a request to the voice service
 async function proxyRequest(req: Request, res: Response, endpoint: string) {
   try {
@@ -98,14 +137,42 @@ async function proxyRequest(req: Request, res: Response, endpoint: string) {
     
     let response;
     
+    // Relay the voice service's bytes untouched (JSON or msgpack) instead of
+    // parsing and re-serializing them, and pass through the headers used for
+    // lean responses, conditional schema polling and request profiling.
+    const forwardHeaders: Record<string, string> = {
+      Accept: req.get('Accept') || 'application/json'
+    };
+    const prefer = req.get('Prefer');
+    if (prefer) {
+      forwardHeaders['Prefer'] = prefer;
+    }
+    const ifNoneMatch = req.get('If-None-Match');
+    if (ifNoneMatch) {
+      forwardHeaders['If-None-Match'] = ifNoneMatch;
+    }
+    const idempotencyKey = req.get('Idempotency-Key');
+    if (idempotencyKey) {
+      forwardHeaders['Idempotency-Key'] = idempotencyKey;
+    }
+    const profile = req.get('X-Profile');
+    if (profile) {
+      forwardHeaders['X-Profile'] = profile;
+    }
+    
     try {
       if (req.method === 'GET') {
         response = await axios.get(url, { 
           params: req.query,
+          headers: forwardHeaders,
+          responseType: 'arraybuffer',
+          validateStatus: (status) => status < 400 || status === 304,
           timeout: 5000 // 5 second timeout
         });
       } else if (req.method === 'POST') {
         response = await axios.post(url, req.body, { 
+          headers: forwardHeaders,
+          responseType: 'arraybuffer',
           timeout: 5000 // 5 second timeout
         });
       } else {
@@ -115,7 +182,7 @@ async function proxyRequest(req: Request, res: Response, endpoint: string) {
         });
       }
       
-      return res.status(response.status).json(response.data);
+      return relayResponse(res, response.status, response.headers, response.data);
     } catch (error) {
       console.error(`Error proxying request to ${url}:`, error);
       
@@ -128,7 +195,7 @@ async function proxyRequest(req: Request, res: Response, endpoint: string) {
         }
         
         if (error.response) {
-          return res.status(error.response.status).json(error.response.data);
+          return relayResponse(res, error.response.status, error.response.headers, error.response.data);
         }
       }
       
@@ -148,6 +215,55 @@ async function proxyRequest(req: Request, res: Response, endpoint: string) {
   }
 }
 
+// Proxy a long-lived schema feed (SSE stream or long poll) without the
+// 5 second timeout or buffering, closing the upstream when the client leaves
+async function proxyFeed(req: Request, res: Response, endpoint: string) {
+  if (!checkVoiceService()) {
+    return res.status(503).json({
+      success: false,
+      message: 'Voice service is not running'
+    });
+  }
+
+  const controller = new AbortController();
+  req.on('close', () => controller.abort());
+  const forwardHeaders: Record<string, string> = {};
+  const lastEventId = req.get('Last-Event-ID');
+  if (lastEventId) {
+    forwardHeaders['Last-Event-ID'] = lastEventId;
+  }
+
+  try {
+    const response = await axios.get(`${getVoiceServiceUrl()}${endpoint}`, {
+      params: req.query,
+      headers: forwardHeaders,
+      responseType: 'stream',
+      validateStatus: () => true,
+      signal: controller.signal
+    });
+    res.status(response.status);
+    for (const name of ['content-type', 'cache-control', 'retry-after']) {
+      if (response.headers[name]) {
+        res.setHeader(name, response.headers[name]);
+      }
+    }
+    res.setHeader('X-Accel-Buffering', 'no');
+    res.flushHeaders();
+    response.data.pipe(res);
+  } catch (error) {
+    if (axios.isCancel(error)) {
+      return;
+    }
+    console.error(`Error proxying schema feed ${endpoint}:`, error);
+    if (!res.headersSent) {
+      res.status(503).json({
+        success: false,
+        message: 'Voice service is not responding, try restarting it'
+      });
+    }
+  }
+}
+
 // Setup express routes to proxy to the voice service
 export function setupVoiceProxyRoutes(app: any) {
   // Start the service when the Express app starts
@@ -197,6 +313,28 @@ export function setupVoiceProxyRoutes(app: any) {
     proxyRequest(req, res, `/api/get-schema/${req.params.sessionId}`);
   });
   
+  // Live schema changes, pushed (SSE) or long-polled
+  app.get('/api/schema-feed/:sessionId', (req: Request, res: Response) => {
+    proxyFeed(req, res, `/api/schema-feed/${req.params.sessionId}`);
+  });
+  
+  app.get('/api/schema-feed/:sessionId/poll', (req: Request, res: Response) => {
+    proxyFeed(req, res, `/api/schema-feed/${req.params.sessionId}/poll`);
+  });
+  
+  // Intake list, search and lookup endpoints
+  app.get('/api/intakes', (req: Request, res: Response) => {
+    proxyRequest(req, res, '/api/intakes');
+  });
+  
+  app.get('/api/intakes/search', (req: Request, res: Response) => {
+    proxyRequest(req, res, '/api/intakes/search');
+  });
+  
+  app.get('/api/intakes/:sessionId', (req: Request, res: Response) => {
+    proxyRequest(req, res, `/api/intakes/${req.params.sessionId}`);
+  });
+  
   // Start session endpoint
   app.post('/api/start-session/:sessionId', (req: Request, res: Response) => {
     proxyRequest(req, res, `/api/start-session/${req.params.sessionId}`);
@@ -216,4 +354,52 @@ export function setupVoiceProxyRoutes(app: any) {
   app.post('/api/speech-to-text', (req: Request, res: Response) => {
     proxyRequest(req, res, '/api/speech-to-text');
   });
-}
\ No newline at end of file
+}
+
+// Relay WebSocket voice interviews (/ws/interview/:sessionId) to the voice
+// service, frame for frame. Call with the HTTP server returned by registerRoutes.
+export function setupVoiceWebSocketProxy(server: Server) {
+  const wss = new WebSocketServer({ noServer: true });
+  
+  server.on('upgrade', (req, socket, head) => {
+    if (!req.url?.startsWith('/ws/interview/')) {
+      return;
+    }
+    
+    wss.handleUpgrade(req, socket, head, (client) => {
+      const upstream = new WebSocket(`ws://${serviceHost}:${servicePort}${req.url}`);
+      const pending: Array<[RawData, boolean]> = [];
+      
+      upstream.on('open', () => {
+        for (const [data, isBinary] of pending) {
+          upstream.send(data, { binary: isBinary });
+        }
+        pending.length = 0;
+      });
+      
+      client.on('message', (data, isBinary) => {
+        if (upstream.readyState === WebSocket.OPEN) {
+          upstream.send(data, { binary: isBinary });
+        } else {
+          pending.push([data, isBinary]);
+        }
+      });
+      
+      upstream.on('message', (data, isBinary) => {
+        client.send(data, { binary: isBinary });
+      });
+      
+      const close = () => {
+        client.close();
+        upstream.close();
+      };
+      client.on('close', close);
+      upstream.on('close', close);
+      client.on('error', close);
+      upstream.on('error', (error) => {
+        console.error('Voice WebSocket upstream error:', error);
+        close();
+      });
+    });
+  });
+}
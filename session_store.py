@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+import fcntl
+
+# ---- Configuration ----
+SESSION_DIR = os.getenv("SESSION_DIR", ".")
+LOCK_TIMEOUT_SECONDS = float(os.getenv("SESSION_LOCK_TIMEOUT", "30"))
+DUPLICATE_WINDOW_SECONDS = float(os.getenv("DUPLICATE_WINDOW_SECONDS", "10"))
+MAX_CACHED_TURNS = 50
+
+
+class SessionBusy(Exception):
+    """Raised when a session lock cannot be acquired in time"""
+
+
+# ---- Paths ----
+def schema_path(session_id):
+    """Path of the schema file for a session"""
+    return os.path.join(SESSION_DIR, f"schema_{session_id}.json")
+
+
+def turns_path(session_id):
+    """Path of the processed-turn cache for a session"""
+    return os.path.join(SESSION_DIR, f"turns_{session_id}.json")
+
+
+def lock_path(session_id):
+    """Path of the lock file for a session"""
+    return os.path.join(SESSION_DIR, f".lock_{session_id}")
+
+
+# ---- Locking ----
+# flock() serializes workers running in different processes; the in-process
+# lock keeps threads of the same worker from spinning on the file lock. Both
+# only exist while someone holds or waits for them: the in-process lock is
+# reference counted, and the last holder deletes the lock file.
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _acquire_ref(session_id):
+    """The session's [lock, users] entry, counting the caller as a user"""
+    with _thread_locks_guard:
+        entry = _thread_locks.get(session_id)
+        if entry is None:
+            entry = _thread_locks[session_id] = [threading.Lock(), 0]
+        entry[1] += 1
+        return entry
+
+
+def _release_ref(session_id, entry):
+    """Stop counting the caller, dropping the lock once nobody uses it"""
+    with _thread_locks_guard:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _thread_locks[session_id]
+
+
+def _lock_file(session_id, deadline):
+    """Open and flock the session's lock file.
+
+    The file may be deleted by its previous holder between our open and
+    flock, so the lock only counts if the path still names the file we
+    locked.
+    """
+    path = lock_path(session_id)
+    while True:
+        f = open(path, "a")
+        try:
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise SessionBusy(f"Session {session_id} is busy")
+                    time.sleep(0.01)
+            try:
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+
+
+@contextlib.contextmanager
+def session_lock(session_id, timeout=None):
+    """Hold an exclusive lock on a session across threads and processes"""
+    if timeout is None:
+        timeout = LOCK_TIMEOUT_SECONDS
+    deadline = time.monotonic() + timeout
+
+    entry = _acquire_ref(session_id)
+    try:
+        if not entry[0].acquire(timeout=timeout):
+            raise SessionBusy(f"Session {session_id} is busy")
+        try:
+            os.makedirs(SESSION_DIR, exist_ok=True)
+            f = _lock_file(session_id, deadline)
+            try:
+                yield
+            finally:
+                # Unlinking before unlocking: waiters in other processes see
+                # the file is gone and reopen the path
+                with _thread_locks_guard:
+                    waiting = entry[1] > 1
+                if not waiting:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(lock_path(session_id))
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+        finally:
+            entry[0].release()
+    finally:
+        _release_ref(session_id, entry)
+
+
+# ---- File I/O ----
+def read_json(path, default=None):
+    """Read a JSON file, returning default if it doesn't exist"""
+    if not os.path.exists(path):
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    """Atomically replace a JSON file so readers never see a partial write"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+# ---- Idempotent Turns ----
+def turn_fingerprint(current_field, response_text):
+    """Identify a turn without an explicit idempotency key by its input"""
+    payload = json.dumps([current_field, response_text])
+    return "fp:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_turn_result(session_id, key):
+    """Return the cached result of a processed turn, if any.
+
+    Must be called while holding the session lock. Explicit idempotency keys
+    are honoured for as long as they are cached; fingerprint keys only within
+    DUPLICATE_WINDOW_SECONDS, so a patient repeating an answer later on is
+    still treated as a new turn.
+    """
+    turns = read_json(turns_path(session_id), {})
+    entry = turns.get(key)
+    if entry is None:
+        return None
+    if key.startswith("fp:") and time.time() - entry["at"] > DUPLICATE_WINDOW_SECONDS:
+        return None
+    return entry["result"]
+
+
+def save_turn_result(session_id, key, result):
+    """Cache the result of a processed turn. Must hold the session lock."""
+    turns = read_json(turns_path(session_id), {})
+    turns[key] = {"at": time.time(), "result": result}
+    if len(turns) > MAX_CACHED_TURNS:
+        oldest = sorted(turns, key=lambda k: turns[k]["at"])
+        for k in oldest[:len(turns) - MAX_CACHED_TURNS]:
+            del turns[k]
+    write_json(turns_path(session_id), turns)
+
+
+def clear_turn_results(session_id):
+    """Forget all cached turns for a session. Must hold the session lock."""
+    path = turns_path(session_id)
+    if os.path.exists(path):
+        os.remove(path)
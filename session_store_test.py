@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+import multiprocessing
+
+import session_store
+import voice_api
+
+
+def submit_concurrently(session_id, count, headers=None, body=None):
+    results = []
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(count)
+
+    def worker():
+        client = voice_api.app.test_client()
+        barrier.wait()
+        resp = client.post(
+            f"/api/process-response/{session_id}",
+            json=body or {"response": "I have a bad headache", "current_field": "chief_complaint"},
+            headers=headers or {},
+        )
+        with results_lock:
+            results.append((resp.status_code, resp.get_json()))
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_duplicate_submissions_with_idempotency_key_call_llm_once(session_dir, fake_llm):
+    results = submit_concurrently("stress-key", 20, headers={"Idempotency-Key": "turn-1"})
+
+    assert all(status == 200 for status, _ in results)
+    assert len({str(body) for _, body in results}) == 1
+    # needs_follow_up + summarize + transition for a single turn
+    assert fake_llm["count"] == 3
+    schema = voice_api.load_schema("stress-key")
+    assert schema["chief_complaint"] == "headache"
+
+
+def test_duplicate_submissions_without_key_are_deduplicated(session_dir, fake_llm):
+    results = submit_concurrently("stress-fp", 20)
+
+    assert all(status == 200 for status, _ in results)
+    assert len({str(body) for _, body in results}) == 1
+    assert fake_llm["count"] == 3
+
+
+def test_duplicates_without_field_are_deduplicated(session_dir, fake_llm):
+    results = submit_concurrently("stress-nofield", 10, body={"response": "I have a bad headache"})
+
+    assert len({str(body) for _, body in results}) == 1
+    assert fake_llm["count"] == 3
+
+
+def test_same_answer_to_consecutive_fields_is_not_a_duplicate(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    first = client.post("/api/process-response/s3", json={"response": "none"}).get_json()
+    second = client.post("/api/process-response/s3", json={"response": "none"}).get_json()
+
+    assert first["changed"].keys() != second["changed"].keys()
+    assert fake_llm["count"] == 6
+    schema = voice_api.load_schema("s3")
+    assert [field for field, value in schema.items() if value] == [*first["changed"], *second["changed"]]
+
+
+def test_new_key_processes_new_turn(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    body = {"response": "I have a bad headache", "current_field": "chief_complaint"}
+    client.post("/api/process-response/s1", json=body, headers={"Idempotency-Key": "a"})
+    client.post("/api/process-response/s1", json=body, headers={"Idempotency-Key": "b"})
+
+    assert fake_llm["count"] == 6
+
+
+def test_fingerprint_expires_after_window(session_dir, fake_llm, monkeypatch):
+    monkeypatch.setattr(session_store, "DUPLICATE_WINDOW_SECONDS", 0)
+    client = voice_api.app.test_client()
+    body = {"response": "not sure", "current_field": "duration"}
+    client.post("/api/process-response/s2", json=body)
+    time.sleep(0.01)
+    client.post("/api/process-response/s2", json=body)
+
+    assert fake_llm["count"] == 6
+
+
+def _increment_counter(directory, rounds):
+    session_store.SESSION_DIR = directory
+    path = os.path.join(directory, "counter")
+    for _ in range(rounds):
+        with session_store.session_lock("shared"):
+            with open(path) as f:
+                value = int(f.read())
+            time.sleep(0.001)
+            with open(path, "w") as f:
+                f.write(str(value + 1))
+
+
+def test_session_lock_serializes_processes(session_dir):
+    (session_dir / "counter").write_text("0")
+    procs = [
+        multiprocessing.get_context("fork").Process(
+            target=_increment_counter, args=(str(session_dir), 25)
+        )
+        for _ in range(4)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    assert (session_dir / "counter").read_text() == "100"
+
+
+def test_session_lock_times_out(session_dir):
+    with session_store.session_lock("busy"):
+        errors = []
+
+        def contender():
+            try:
+                with session_store.session_lock("busy", timeout=0.05):
+                    pass
+            except session_store.SessionBusy as e:
+                errors.append(e)
+
+        t = threading.Thread(target=contender)
+        t.start()
+        t.join()
+
+    assert len(errors) == 1
+
+
+def test_session_locks_are_dropped_when_unused(session_dir, fake_llm):
+    results = submit_concurrently("cleanup", 10, headers={"Idempotency-Key": "turn-1"})
+
+    assert all(status == 200 for status, _ in results)
+    assert session_store._thread_locks == {}
+    assert not os.path.exists(session_store.lock_path("cleanup"))
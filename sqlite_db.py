@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import threading
+import contextlib
+
+# ---- Configuration ----
+BUSY_TIMEOUT_MS = 5000
+
+
+def connect(path, setup=None, synchronous=None, busy_timeout_ms=BUSY_TIMEOUT_MS):
+    """Open an autocommit WAL connection, creating the directory, then run setup(conn, path)"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    if synchronous:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    if setup is not None:
+        setup(conn, path)
+    return conn
+
+
+# ---- Connections ----
+class ThreadConnections:
+    """One connection per database path for each thread, and each process after a fork.
+
+    SQLite connections can't be shared between threads, so each worker
+    thread opens its own. WAL lets those readers run alongside the single
+    writer.
+    """
+
+    def __init__(self, setup=None, synchronous=None):
+        self.setup = setup
+        self.synchronous = synchronous
+        self.local = threading.local()
+
+    def get(self, path):
+        """The calling thread's connection to path"""
+        connections = getattr(self.local, "connections", None)
+        if connections is None or self.local.pid != os.getpid():
+            connections = self.local.connections = {}
+            self.local.pid = os.getpid()
+        conn = connections.get(path)
+        if conn is None:
+            conn = connections[path] = connect(path, self.setup, self.synchronous)
+        return conn
+
+    def close(self):
+        """Close the calling thread's connections"""
+        for conn in getattr(self.local, "connections", {}).values():
+            conn.close()
+        self.local.connections = {}
+
+
+@contextlib.contextmanager
+def transaction(conn):
+    """Group statements on an autocommit connection into one write transaction.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a read-then-write
+    (such as claiming a job) is atomic across processes.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -15,8 +15,13 @@ PID=$!
 echo "Voice API service started with PID: $PID"
 echo "Logs are being written to voice_service.log"
 
-# Wait a moment for the service to start
-sleep 2
+# Wait for the service to report ready (up to 15 seconds)
+for i in $(seq 1 150); do
+    if curl -sf http://localhost:5001/api/health > /dev/null; then
+        break
+    fi
+    sleep 0.1
+done
 
 # Check if the process is still running
 if ps -p $PID > /dev/null; then
@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import tempfile
+import argparse
+import threading
+from collections import OrderedDict
+
+import session_store
+
+# ---- Configuration ----
+# Rendered speech, addressed by a hash of its text, voice and format. Hot
+# entries stay in memory; everything rendered is also kept on disk (default
+# tts_cache/ next to the session files) for restarts and other workers.
+TTS_CACHE = os.getenv("TTS_CACHE", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR")
+MEMORY_BYTES = int(float(os.getenv("TTS_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+DISK_BYTES = int(float(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024)
+# When the disk tier is over budget, the least recently used files are
+# deleted until it is back under this share of it
+DISK_LOW_WATER = 0.9
+# Entries larger than this share of the memory tier are served from disk only
+MAX_MEMORY_ENTRY_SHARE = 0.25
+# Block size when streaming an entry from disk
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def cache_dir():
+    return TTS_CACHE_DIR or os.path.join(session_store.SESSION_DIR, "tts_cache")
+
+
+def cache_key(text, output_format, voice=None):
+    """Content address of an utterance; whitespace differences don't matter"""
+    payload = "\0".join([voice or "default", output_format, " ".join(text.split())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---- Cache ----
+class AudioCache:
+    """Two-tier cache of encoded speech.
+
+    The memory tier is an LRU of immutable bytes, bounded by memory_bytes; a
+    hit hands out the cached object itself, so serving it copies nothing.
+    The disk tier holds one file per key, bounded by disk_bytes. A disk hit
+    small enough for the memory tier is read once and promoted; a larger
+    one is streamed from the open file by get_chunks() without being held
+    in memory. Files are written under a temporary name and renamed, so
+    workers sharing the directory never see a partial entry.
+    """
+
+    def __init__(self, memory_bytes=None, disk_bytes=None, directory=None):
+        self.memory_limit = MEMORY_BYTES if memory_bytes is None else memory_bytes
+        self.disk_limit = DISK_BYTES if disk_bytes is None else disk_bytes
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk_bytes = None
+        self.stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0,
+            "bytes_from_cache": 0, "bytes_rendered": 0,
+        }
+
+    def path_for(self, key, output_format):
+        return os.path.join(self.directory or cache_dir(), f"{key}.{output_format}")
+
+    # ---- Memory tier ----
+    # Called with self.lock held
+    def _fits_memory(self, size):
+        return size <= self.memory_limit * MAX_MEMORY_ENTRY_SHARE
+
+    def _remember(self, key, data):
+        if not self._fits_memory(len(data)):
+            return
+        previous = self.memory.pop(key, None)
+        if previous is not None:
+            self.memory_bytes -= len(previous)
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.memory_limit:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    # ---- Disk tier ----
+    def _open_file(self, path):
+        """The open entry file and its size, or None if it's missing or empty"""
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            f.close()
+            return None
+        try:
+            os.utime(path)  # recency for disk eviction
+        except OSError:
+            pass
+        return f, size
+
+    def _write_file(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tts_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _disk_entries(self):
+        return glob.glob(os.path.join(self.directory or cache_dir(), "*.*"))
+
+    def _trim_disk(self, added):
+        with self.lock:
+            if self.disk_bytes is None:
+                self.disk_bytes = sum(_size(path) for path in self._disk_entries())
+            else:
+                self.disk_bytes += added
+            if self.disk_bytes <= self.disk_limit:
+                return
+        entries = sorted(self._disk_entries(), key=_mtime)
+        total = sum(_size(path) for path in entries)
+        target = self.disk_limit * DISK_LOW_WATER
+        for path in entries:
+            if total <= target:
+                break
+            size = _size(path)
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        with self.lock:
+            self.disk_bytes = total
+
+    # ---- Lookups ----
+    def _find(self, text, output_format, voice):
+        """(bytes, None) for an entry in memory or just promoted to it,
+        (None, open file) for a disk entry too large for memory, or None"""
+        key = cache_key(text, output_format, voice)
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                self.stats["bytes_from_cache"] += len(data)
+                return data, None
+        opened = self._open_file(self.path_for(key, output_format))
+        if opened is None:
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+        f, size = opened
+        with self.lock:
+            self.stats["disk_hits"] += 1
+            self.stats["bytes_from_cache"] += size
+        if not self._fits_memory(size):
+            return None, f
+        with f:
+            data = f.read()
+        with self.lock:
+            self._remember(key, data)
+        return data, None
+
+    def get(self, text, output_format, voice=None):
+        """Cached audio for an utterance as bytes, or None"""
+        found = self._find(text, output_format, voice)
+        if found is None:
+            return None
+        data, f = found
+        if f is not None:
+            with f:
+                data = f.read()
+        return data
+
+    def get_chunks(self, text, output_format, voice=None):
+        """Cached audio for an utterance as an iterable of bytes, or None.
+
+        Entries in the memory tier are one chunk; larger ones are read from
+        disk in READ_CHUNK_BYTES blocks as the iterable is consumed.
+        """
+        found = self._find(text, output_format, voice)
+        if found is None:
+            return None
+        data, f = found
+        return [data] if f is None else _read_chunks(f)
+
+    def contains(self, text, output_format, voice=None):
+        """Whether an utterance is cached, without counting a hit or miss"""
+        key = cache_key(text, output_format, voice)
+        with self.lock:
+            if key in self.memory:
+                return True
+        return os.path.exists(self.path_for(key, output_format))
+
+    def put(self, text, output_format, data, voice=None):
+        """Store rendered audio in both tiers; returns it as bytes"""
+        data = bytes(data)
+        if not data:
+            return data
+        key = cache_key(text, output_format, voice)
+        try:
+            self._write_file(self.path_for(key, output_format), data)
+            self._trim_disk(len(data))
+        except OSError as e:
+            # The memory tier still works without the disk
+            print(f"Error writing TTS cache entry: {str(e)}")
+        with self.lock:
+            self._remember(key, data)
+        return data
+
+    def stream(self, text, output_format, render, voice=None):
+        """Yield an utterance's audio, from the cache or by render(text, output_format).
+
+        A cached entry is yielded as get_chunks() returns it. Rendered chunks
+        are passed on as they are produced and stored once the whole
+        utterance has been rendered, so an interrupted render is never cached.
+        """
+        chunks = self.get_chunks(text, output_format, voice)
+        if chunks is not None:
+            yield from chunks
+            return
+        yield from self.fill(text, output_format, render, voice)
+
+    def fill(self, text, output_format, render, voice=None):
+        """Render an utterance, yielding chunks as produced, and cache it once complete"""
+        chunks = []
+        for chunk in render(text, output_format):
+            chunks.append(chunk)
+            yield chunk
+        data = self.put(text, output_format, b"".join(chunks), voice)
+        with self.lock:
+            self.stats["bytes_rendered"] += len(data)
+
+    def warm(self, utterances, output_formats, render, voice=None):
+        """Render and store each utterance not already cached; returns how many were rendered"""
+        rendered = 0
+        for text in utterances:
+            for output_format in output_formats:
+                if self.contains(text, output_format, voice):
+                    continue
+                try:
+                    self.put(text, output_format, b"".join(render(text, output_format)), voice)
+                    rendered += 1
+                except Exception as e:
+                    print(f"Error pre-rendering {text[:40]!r} as {output_format}: {str(e)}")
+        return rendered
+
+    def clear(self):
+        """Drop both tiers (counters are kept)"""
+        with self.lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+            self.disk_bytes = None
+        for path in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else None
+            stats["memory_entries"] = len(self.memory)
+            stats["memory_bytes"] = self.memory_bytes
+            stats["disk_bytes"] = self.disk_bytes
+            return stats
+
+
+def _read_chunks(f):
+    with f:
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+cache = AudioCache()
+
+
+# ---- Admin Tool ----
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the TTS cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--dir", help="cache directory (default: TTS_CACHE_DIR or <SESSION_DIR>/tts_cache)")
+    args = parser.parse_args(argv)
+
+    disk = AudioCache(directory=args.dir)
+    entries = disk._disk_entries()
+    if args.command == "stats":
+        formats = {}
+        for path in entries:
+            output_format = path.rsplit(".", 1)[1]
+            formats.setdefault(output_format, {"entries": 0, "bytes": 0})
+            formats[output_format]["entries"] += 1
+            formats[output_format]["bytes"] += _size(path)
+        print(json.dumps({"directory": args.dir or cache_dir(), "formats": formats}, indent=2))
+    else:
+        disk.clear()
+        print(f"Removed {len(entries)} cached utterances")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
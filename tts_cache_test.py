@@ -0,0 +1,122 @@
+import os
+import time
+
+import pytest
+
+import tts_cache
+import voice_api
+from tts_cache import AudioCache
+
+
+def renderer(calls):
+    def render(text, output_format):
+        calls.append((text, output_format))
+        yield f"{output_format}:".encode()
+        yield text.encode()
+    return render
+
+
+def test_memory_hits_hand_out_the_cached_bytes(tmp_path):
+    cache = AudioCache(memory_bytes=1024, directory=str(tmp_path))
+    stored = cache.put("Hello there.", "opus", bytearray(b"x" * 100))
+
+    assert cache.get("Hello there.", "opus") is stored
+    assert cache.get("Hello  there. ", "opus") is stored  # whitespace doesn't change the key
+    assert cache.get("Hello there.", "mp3") is None
+    assert cache.get("Hello there.", "opus", voice="other") is None
+    stats = cache.snapshot()
+    assert (stats["memory_hits"], stats["misses"], stats["bytes_from_cache"]) == (2, 2, 200)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(memory_bytes=1000, directory=str(tmp_path))
+    for name in ("a", "b", "c", "d"):
+        cache.put(name, "opus", b"x" * 250)
+    cache.get("a", "opus")  # a is now the most recent
+    cache.put("e", "opus", b"x" * 250)
+
+    assert list(cache.memory) == [tts_cache.cache_key(name, "opus") for name in ("c", "d", "a", "e")]
+    assert cache.snapshot()["evictions"] == 1
+    # Evicted from memory, still on disk
+    assert cache.get("b", "opus") == b"x" * 250
+    assert cache.snapshot()["disk_hits"] == 1
+
+
+def test_disk_tier_survives_restarts_and_stays_in_budget(tmp_path):
+    first = AudioCache(directory=str(tmp_path), disk_bytes=1000)
+    for i in range(3):
+        first.put(f"phrase {i}", "opus", b"x" * 300)
+        time.sleep(0.01)
+
+    second = AudioCache(directory=str(tmp_path), disk_bytes=1000)
+    assert second.get("phrase 0", "opus") == b"x" * 300
+    assert second.snapshot()["disk_hits"] == 1
+    assert second.get("phrase 0", "opus") is second.get("phrase 0", "opus")
+
+    # phrase 0 was just read, so phrase 1 is the least recently used
+    second.put("phrase 3", "opus", b"x" * 300)
+    assert len(os.listdir(tmp_path)) == 3
+    assert not second.contains("phrase 1", "opus")
+    assert second.contains("phrase 0", "opus")
+
+
+def test_large_disk_entries_are_streamed_not_promoted(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_cache, "READ_CHUNK_BYTES", 100)
+    AudioCache(directory=str(tmp_path)).put("long answer", "wav", b"x" * 250)
+
+    cache = AudioCache(memory_bytes=400, directory=str(tmp_path))
+    chunks = cache.get_chunks("long answer", "wav")
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert cache.get("long answer", "wav") == b"x" * 250
+    assert not cache.memory and cache.snapshot()["disk_hits"] == 2
+
+
+def test_stream_renders_once_and_never_caches_partial_audio(tmp_path):
+    cache = AudioCache(directory=str(tmp_path))
+    calls = []
+    render = renderer(calls)
+
+    interrupted = cache.stream("Could you tell me more?", "opus", render)
+    next(interrupted)
+    interrupted.close()
+    assert not cache.contains("Could you tell me more?", "opus")
+
+    assert b"".join(cache.stream("Could you tell me more?", "opus", render)) == b"opus:Could you tell me more?"
+    assert b"".join(cache.stream("Could you tell me more?", "opus", render)) == b"opus:Could you tell me more?"
+    assert len(calls) == 2
+    assert cache.snapshot()["bytes_rendered"] == len(b"opus:Could you tell me more?")
+
+
+@pytest.fixture
+def speech(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(tts_cache, "cache", AudioCache(directory=str(tmp_path / "tts")))
+    monkeypatch.setattr(voice_api, "render_speech", renderer(calls))
+    return calls
+
+
+def test_repeated_utterances_are_served_from_the_cache(speech):
+    client = voice_api.app.test_client()
+    body = {"text": "Thank you, that's everything.", "format": "opus"}
+    first = client.post("/api/text-to-speech", json=body)
+    assert "X-TTS-Cache" not in first.headers
+    assert first.data == b"opus:Thank you, that's everything."
+
+    second = client.post("/api/text-to-speech", json=body)
+    assert second.headers["X-TTS-Cache"] == "hit"
+    assert second.data == first.data
+    assert len(speech) == 1
+    stats = client.get("/api/tts/cache/stats").get_json()
+    assert stats["hit_rate"] == 0.5 and stats["bytes_from_cache"] == len(second.data)
+
+
+def test_warmup_pre_renders_the_fixed_phrases(speech):
+    utterances = voice_api.known_utterances()
+    assert voice_api.COMPLETION_MESSAGE in utterances
+    assert voice_api.fallback_question("side_effects") in utterances
+
+    assert voice_api.warm_tts_cache(["opus"]) == len(utterances)
+    assert voice_api.warm_tts_cache(["opus"]) == 0
+    list(voice_api.stream_speech(voice_api.fallback_question("duration"), "opus"))
+    assert len(speech) == len(utterances)
@@ -0,0 +1,102 @@
+import re
+import json
+from collections import namedtuple
+
+# ---- Configuration ----
+# Classification prompts ask for this JSON object; with JSON mode and a small
+# max_tokens the model has little room to say anything else.
+VERDICT_FORMAT = '{"complete": "yes" or "no", "confidence": a number from 0 to 1}'
+VERDICT_MAX_TOKENS = 24
+
+YES_WORDS = {"yes", "y", "yep", "yeah", "true", "complete", "sufficient", "enough", "adequate"}
+NO_WORDS = {"no", "n", "nope", "false", "incomplete", "insufficient", "unclear", "inadequate"}
+NEGATORS = {"not", "isn't", "isnt", "doesn't", "doesnt", "never"}
+# Bare answers; one contradicting the leading answer makes the output ambiguous
+ANSWER_WORDS = {"yes", "yep", "yeah", "no", "nope"}
+
+# Confidence when the model doesn't state one
+CONFIDENCE_EXACT = 1.0      # a bare "yes" / "no"
+CONFIDENCE_LEADING = 0.9    # "Yes, it is complete."
+CONFIDENCE_MENTIONED = 0.6  # "The response is complete"
+
+Verdict = namedtuple("Verdict", ["answer", "confidence", "raw"])
+Verdict.__doc__ = """A parsed yes/no answer.
+
+answer is True, False, or None when the output could not be read;
+confidence is in [0, 1]; raw is the model output.
+"""
+
+
+def _to_answer(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        return parse_text(value)[0]
+    return None
+
+
+def _clamp(value, default):
+    try:
+        return min(1.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_json(text):
+    """(answer, confidence) from a JSON object, or None if there isn't one"""
+    match = re.search(r"\{.*\}", text, re.S)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for key in ("complete", "answer", "verdict", "result"):
+        if key in data:
+            answer = _to_answer(data[key])
+            if answer is None:
+                return None, 0.0
+            return answer, _clamp(data.get("confidence"), CONFIDENCE_LEADING)
+    return None
+
+
+def parse_text(text):
+    """(answer, confidence) from free text such as "Yes." or "It is not complete" """
+    words = re.findall(r"[a-z']+", text.lower())
+    if not words:
+        return None, 0.0
+
+    def polarity(i):
+        word = words[i]
+        negated = i > 0 and words[i - 1] in NEGATORS
+        if word in YES_WORDS:
+            return not negated
+        if word in NO_WORDS:
+            return negated and word not in ("no", "n", "nope")
+        return None
+
+    first = polarity(0)
+    if first is not None:
+        if any(words[i] in ANSWER_WORDS and polarity(i) is not first for i in range(1, len(words))):
+            return None, 0.0
+        return first, CONFIDENCE_EXACT if len(words) == 1 else CONFIDENCE_LEADING
+
+    found = {p for p in (polarity(i) for i in range(len(words))) if p is not None}
+    if len(found) == 1:
+        return found.pop(), CONFIDENCE_MENTIONED
+    return None, 0.0
+
+
+def parse_verdict(text):
+    """Read a yes/no verdict from model output, tolerating punctuation,
+    explanations, markdown and JSON. Returns a Verdict."""
+    raw = text or ""
+    parsed = parse_json(raw)
+    if parsed is None:
+        parsed = parse_text(raw)
+    answer, confidence = parsed
+    return Verdict(answer, confidence if answer is not None else 0.0, raw)
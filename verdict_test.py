@@ -0,0 +1,87 @@
+import pytest
+
+import voice_api
+from verdict import parse_verdict
+
+# Model outputs seen for the completeness prompt, with the expected reading
+YES = [
+    "yes", "Yes", "YES", "Yes.", "yes\n", " yes ", "**Yes**", "Yes!",
+    "Yes, the response is complete.",
+    "yes - the patient gave a clear answer",
+    "Yes. The patient specified the duration.",
+    "Complete.",
+    "The response is complete.",
+    "The answer is sufficient",
+    "It is not incomplete",
+    '{"complete": "yes", "confidence": 0.92}',
+    '{"complete": true}',
+    '{"answer": "Yes"}',
+    '```json\n{"complete": "yes", "confidence": 0.8}\n```',
+    'Here is my answer: {"complete": "yes", "confidence": 1}',
+]
+NO = [
+    "no", "No", "NO", "No.", "**No**",
+    "No, more detail is needed.",
+    "No - the patient did not say how long.",
+    "Incomplete.",
+    "The response is not complete.",
+    "It isn't sufficient",
+    "Not enough information",
+    '{"complete": "no", "confidence": 0.7}',
+    '{"complete": false, "confidence": 0.99}',
+]
+UNREADABLE = [
+    "", "   ", "Maybe", "I'm not sure", "The patient mentioned a headache",
+    '{"complete": "perhaps"}',
+    "yes and no",
+]
+
+
+@pytest.mark.parametrize("output", YES)
+def test_reads_yes(output):
+    verdict = parse_verdict(output)
+    assert verdict.answer is True
+    assert 0.5 <= verdict.confidence <= 1.0
+
+
+@pytest.mark.parametrize("output", NO)
+def test_reads_no(output):
+    verdict = parse_verdict(output)
+    assert verdict.answer is False
+    assert verdict.confidence > 0
+
+
+@pytest.mark.parametrize("output", UNREADABLE)
+def test_unreadable_has_no_answer(output):
+    verdict = parse_verdict(output)
+    assert verdict.answer is None
+    assert verdict.confidence == 0.0
+
+
+def test_confidence_reflects_how_the_answer_was_given():
+    assert parse_verdict("yes").confidence == 1.0
+    assert parse_verdict("Yes, it is complete").confidence == 0.9
+    assert parse_verdict("The response is complete").confidence == 0.6
+    assert parse_verdict('{"complete": "yes", "confidence": 0.3}').confidence == 0.3
+    assert parse_verdict('{"complete": "yes", "confidence": 7}').confidence == 1.0
+    assert parse_verdict(None).raw == ""
+
+
+@pytest.mark.parametrize("output, expected", [
+    ("Yes.", True),
+    ('{"complete": "yes", "confidence": 0.9}', True),
+    ('{"complete": "yes", "confidence": 0.2}', False),
+    ("No.", False),
+    ("Maybe", False),
+])
+def test_needs_follow_up_uses_the_parsed_verdict(monkeypatch, output, expected):
+    calls = []
+
+    def fake_chat(system_prompt, user_prompt, temperature, **kwargs):
+        calls.append(kwargs)
+        return output
+
+    monkeypatch.setattr(voice_api, "complete_chat", fake_chat)
+    assert voice_api.needs_follow_up("duration", "three days") is expected
+    assert calls[0]["json_mode"] is True
+    assert calls[0]["max_tokens"] <= 32
@@ -1,124 +1,556 @@
 import os
+import sys
+import atexit
 import json
+import time
+import html
+import hashlib
+import threading
+import importlib
+import tempfile
+from collections import OrderedDict, namedtuple
 try:
-    import speech_recognition as sr
-    import pyttsx3
-    from flask import Flask, request, jsonify
+    from flask import Flask, Response, g, request, jsonify, stream_with_context
     from flask_cors import CORS
-    import openai
     from dotenv import load_dotenv
 except ImportError:
     print("Some modules are missing. Make sure to install all required packages.")
     print("Run: pip install flask flask-cors openai pydantic SpeechRecognition pyttsx3 python-dotenv")
 
+from audio_transcode import (
+    TranscodeError,
+    OUTPUT_FORMATS,
+    decode_to_pcm,
+    encode_file,
+    iter_stream,
+    mimetype_for,
+    stats as transcode_stats,
+)
+from voice_pipeline import iter_sentences, pipeline
+from request_profiler import stage
+from model_router import PartialOutputError, estimate_tokens, router as model_router
+from verdict import VERDICT_FORMAT, VERDICT_MAX_TOKENS, parse_verdict
+from voice_socket import InterviewSocket
+import admission
+import intake_store
+import job_queue
+import llm_accounting
+import request_profiler
+import schema_events
+import tts_cache
+from job_queue import PermanentJobError
+from admission import Overloaded
+from schema_events import TooManySubscribers
+from intake_templates import UnknownTemplate, registry as template_registry
+from session_store import (
+    SessionBusy,
+    session_lock,
+    schema_path,
+    read_json,
+    write_json,
+    turn_fingerprint,
+    get_turn_result,
+    save_turn_result,
+    clear_turn_results,
+)
+
 # Load environment variables
 load_dotenv()
 
 # ---- Configuration ----
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-BASE_URL = "https://api.groq.com/openai/v1"
-GPT_MODEL = "llama-3.3-70b-versatile"
-SCHEMA_PATH = "./schema.json"
-
-# ---- Initialize Groq Client ----
-client = openai.OpenAI(
-    api_key=GROQ_API_KEY,
-    base_url=BASE_URL
-)
+BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+PORT = int(os.getenv("VOICE_API_PORT", "5001"))
+# A "complete" verdict below this confidence still gets a follow-up question
+MIN_VERDICT_CONFIDENCE = float(os.getenv("MIN_VERDICT_CONFIDENCE", "0.5"))
+# Append every turn's verdict and extracted value here (JSON lines) to build
+# evaluation sets for benchmarks/routing_eval.py. Contains patient answers.
+TRANSCRIPT_LOG = os.getenv("TRANSCRIPT_LOG")
+# Post-interview work (see "Post-interview Jobs"). The email goes through the
+# Node service's send-email endpoint, e.g. http://localhost:5000/api/send-email
+INTAKE_EMAIL_URL = os.getenv("INTAKE_EMAIL_URL")
+INTAKE_EMAIL_TO = os.getenv("INTAKE_EMAIL_TO")
+CHART_EXPORT_DIR = os.getenv("CHART_EXPORT_DIR")
+# Answer turns shed under overload with a templated re-ask of the current
+# question (200, "degraded": true) instead of a 503
+ADMISSION_FALLBACK_QUESTIONS = os.getenv("ADMISSION_FALLBACK_QUESTIONS", "0") == "1"
+EMAIL_TIMEOUT_SECONDS = 30
+# pyttsx3 voice id (engine default when unset); part of the TTS cache key
+TTS_VOICE = os.getenv("TTS_VOICE")
+# Formats the fixed phrases are pre-rendered in at startup (comma-separated,
+# empty to skip), and a JSON list of extra phrases to pre-render
+TTS_WARMUP_FORMATS = [f for f in os.getenv("TTS_WARMUP_FORMATS", "opus").split(",") if f]
+TTS_WARMUP_FILE = os.getenv("TTS_WARMUP_FILE")
+# Sessions whose last saved state is kept in memory (least recently used
+# dropped first); a dropped session is re-read from its file when next used
+SCHEMA_CACHE_SESSIONS = int(os.getenv("SCHEMA_CACHE_SESSIONS", "1000"))
+
+# ---- Lazy Backends ----
+# openai, speech_recognition and pyttsx3 are slow to import, so they are loaded
+# on first use or by warm_backends() once the port is bound, never at import.
+_client = None
+_client_lock = threading.Lock()
+_ready = threading.Event()
+backend_status = {}
+
+def get_client():
+    """Return the Groq client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                _client = openai.OpenAI(
+                    api_key=GROQ_API_KEY,
+                    base_url=BASE_URL
+                )
+    return _client
+
+def warm_backends():
+    """Load heavy backends in the background, then mark the service ready"""
+    loaders = [
+        ("llm", get_client),
+        ("speech_recognition", lambda: importlib.import_module("speech_recognition")),
+        ("tts", lambda: importlib.import_module("pyttsx3")),
+    ]
+    for name, loader in loaders:
+        start = time.perf_counter()
+        try:
+            loader()
+            backend_status[name] = {"loaded": True, "seconds": round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            backend_status[name] = {"loaded": False, "error": str(e)}
+        print(f"Backend {name}: {backend_status[name]}")
+    _ready.set()
+    print("Voice API ready")
+    if tts_cache.TTS_CACHE and TTS_WARMUP_FORMATS:
+        warm_tts_cache(TTS_WARMUP_FORMATS)
 
 # ---- Initialize Flask ----
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+# Compact, insertion-ordered JSON: keeps field order and skips key sorting
+app.json.compact = True
+app.json.sort_keys = False
+
+# ---- Response Encoding ----
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+def wants_msgpack():
+    """Whether the client asked for a msgpack-encoded response"""
+    accept = request.headers.get("Accept", "")
+    return any(mimetype in accept for mimetype in MSGPACK_MIMETYPES)
+
+def wants_lean():
+    """Whether the client asked for delta-only responses"""
+    return request.args.get("lean") == "1" or "return=minimal" in request.headers.get("Prefer", "")
+
+def respond(payload, status=200):
+    """Encode a payload as msgpack if requested and available, else compact JSON"""
+    if wants_msgpack():
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+        if msgpack is not None:
+            response = app.response_class(
+                msgpack.packb(payload, use_bin_type=True),
+                status=status,
+                mimetype="application/msgpack"
+            )
+            response.vary.add("Accept")
+            return response
+    response = jsonify(payload)
+    response.status_code = status
+    response.vary.add("Accept")
+    return response
+
+def overloaded_response(e):
+    """503 with Retry-After for a request shed by admission control"""
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+# ---- Request Profiling ----
+# Off unless PROFILE_TOKEN or PROFILE_SLOW_MS is set; then one sampler thread
+# records the stacks of profiled requests (see request_profiler.py). Long-lived
+# and profiling endpoints are never profiled.
+PROFILE_SKIP_ENDPOINTS = {
+    "interview_socket", "schema_feed", "poll_schema_feed", "list_profiles", "get_profile", "health",
+}
+
+@app.before_request
+def start_profile():
+    if not request_profiler.enabled() or request.endpoint in PROFILE_SKIP_ENDPOINTS:
+        return
+    token = request.headers.get(request_profiler.PROFILE_HEADER)
+    if request_profiler.PROFILE_TOKEN and token == request_profiler.PROFILE_TOKEN:
+        g.profile = request_profiler.start_capture("header")
+    elif request_profiler.PROFILE_SLOW_MS > 0:
+        g.profile = request_profiler.start_capture("slow")
+
+@app.after_request
+def finish_profile(response):
+    """Save the capture if it was asked for or the request was slow"""
+    capture = g.pop("profile", None)
+    if capture is None:
+        return response
+    duration_ms = request_profiler.stop_capture(capture)
+    if capture.trigger == "header" or duration_ms >= request_profiler.PROFILE_SLOW_MS:
+        try:
+            request_profiler.save_capture(
+                capture, method=request.method, path=request.path,
+                endpoint=request.endpoint, status=response.status_code
+            )
+            response.headers["X-Profile-Id"] = capture.id
+        except OSError as e:
+            print(f"Error saving profile {capture.id}: {str(e)}")
+    return response
+
+@app.teardown_request
+def discard_profile(error=None):
+    capture = g.pop("profile", None)
+    if capture is not None:
+        request_profiler.stop_capture(capture)
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Saved request profiles, newest first, without their stacks"""
+    return respond({
+        "enabled": request_profiler.enabled(),
+        "slow_ms": request_profiler.PROFILE_SLOW_MS,
+        "captures": request_profiler.list_captures(),
+    })
+
+@app.route('/api/profiles/<capture_id>', methods=['GET'])
+def get_profile(capture_id):
+    """One profile as JSON, or as collapsed stacks for a flamegraph with ?format=folded"""
+    data = request_profiler.load_capture(capture_id)
+    if data is None:
+        return jsonify({"error": "Profile not found"}), 404
+    if request.args.get('format') == 'folded':
+        return Response(
+            request_profiler.folded(data), mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename=profile_{capture_id}.folded"}
+        )
+    return respond(data)
 
 # ---- Text-to-Speech ----
+def synthesize_to_file(text):
+    """Render text to a temporary WAV file and return its path"""
+    import pyttsx3
+    fd, path = tempfile.mkstemp(suffix=".wav", prefix="tts_")
+    os.close(fd)
+    with stage("tts"):
+        engine = pyttsx3.init()
+        if TTS_VOICE:
+            engine.setProperty("voice", TTS_VOICE)
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+    return path
+
 def speak_text(text):
     """Convert text to speech and return audio data"""
-    engine = pyttsx3.init()
-    engine.save_to_file(text, 'temp_audio.wav')
-    engine.runAndWait()
-    
-    with open('temp_audio.wav', 'rb') as f:
-        audio_data = f.read()
-    
-    os.remove('temp_audio.wav')
-    return audio_data
+    path = synthesize_to_file(text)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def render_speech(text, output_format):
+    """Synthesize text and yield it encoded as output_format, chunk by chunk"""
+    path = synthesize_to_file(text)
+    try:
+        yield from encode_file(path, output_format)
+    finally:
+        os.remove(path)
+
+def stream_speech(text, output_format):
+    """Yield text's speech as output_format, from the TTS cache when it has it"""
+    if not tts_cache.TTS_CACHE:
+        return render_speech(text, output_format)
+    return tts_cache.cache.stream(text, output_format, render_speech, voice=TTS_VOICE)
+
+def known_utterances():
+    """Fixed phrases the service speaks: re-asks for every form field and the closing message"""
+    phrases = [COMPLETION_MESSAGE]
+    for template in template_registry.templates.values():
+        phrases.extend(fallback_question(field) for field in template.fields)
+    if TTS_WARMUP_FILE:
+        phrases.extend(read_json(TTS_WARMUP_FILE) or [])
+    return list(dict.fromkeys(phrases))
+
+def warm_tts_cache(output_formats):
+    """Pre-render the known phrases that aren't cached yet"""
+    start = time.perf_counter()
+    try:
+        rendered = tts_cache.cache.warm(known_utterances(), output_formats, render_speech, voice=TTS_VOICE)
+    except Exception as e:
+        print(f"Error warming TTS cache: {str(e)}")
+        return 0
+    print(f"TTS cache warmed: {rendered} utterances rendered in {time.perf_counter() - start:.1f}s")
+    return rendered
 
 # ---- Speech-to-Text ----
-def recognize_speech(audio_data):
-    """Convert speech to text"""
+def transcribe_pcm(pcm, sample_rate):
+    """Run speech recognition on mono 16-bit PCM"""
+    import speech_recognition as sr
     recognizer = sr.Recognizer()
-    
-    with open('temp_audio.wav', 'wb') as f:
-        f.write(audio_data)
-    
-    with sr.AudioFile('temp_audio.wav') as source:
-        audio = recognizer.record(source)
-    
-    os.remove('temp_audio.wav')
+    with stage("stt"):
+        return recognizer.recognize_google(sr.AudioData(pcm, sample_rate, 2))
+
+def recognize_speech(audio_data, content_type="audio/wav"):
+    """Convert speech to text"""
+    with stage("audio.decode"):
+        pcm, sample_rate = decode_to_pcm([audio_data], content_type)
     
     try:
-        text = recognizer.recognize_google(audio)
+        text = transcribe_pcm(pcm, sample_rate)
         return text
     except:
         return None
 
 # ---- Schema Management ----
+# A session file holds only its template id and filled values. In memory a
+# session is an IntakeSession (values in field order plus a filled bitmask);
+# the full schema dict is expanded from the shared template when needed.
+def make_default_schema():
+    """Return a fresh copy of the default intake schema"""
+    return template_registry.default.blank()
+
+def load_session(session_id):
+    """Return the session's IntakeSession, creating an empty default session if needed"""
+    path = schema_path(session_id)
+    data = read_json(path)
+    if data is not None:
+        return template_registry.load_session(data)
+    template = template_registry.default
+    write_json(path, {"template": template.id, "values": {}})
+    return template.session()
+
 def load_schema(session_id):
     """Load schema for a session, or create a new one if it doesn't exist"""
-    schema_dir = os.path.dirname(SCHEMA_PATH)
-    if not os.path.exists(schema_dir):
-        os.makedirs(schema_dir)
-        
-    session_schema_path = f"./schema_{session_id}.json"
-    
-    if os.path.exists(session_schema_path):
-        with open(session_schema_path, "r") as f:
-            return json.load(f)
+    return load_session(session_id).expand()
+
+def session_template(session_id):
+    """The template a session uses"""
+    cached = cached_schema_version(session_id)
+    if cached is not None:
+        return cached.session.template
+    return load_session(session_id).template
+
+def save_session(session_id, session, restarted=False):
+    """Save a session's filled values and record them in the intake database.
+
+    The session is kept as the cached version, so the caller must not
+    modify it afterwards. Returns the new SchemaVersion.
+    """
+    values = session.filled_values()
+    path = schema_path(session_id)
+    previous = cached_schema_version(session_id)
+    with stage("schema.save"):
+        write_json(path, {"template": session.template.id, "values": values})
+        version = remember_schema_version(session_id, path, session)
+    publish_schema_change(session_id, previous, version, restarted)
+    try:
+        with stage("intake_db"):
+            intake_store.save_intake(session_id, values, restarted=restarted, template=session.template)
+    except Exception as e:
+        # The JSON file stays authoritative for the live session; the
+        # migration tool can re-sync the database from it.
+        print(f"Error recording intake for session {session_id}: {str(e)}")
+    return version
+
+def save_schema(session_id, schema, restarted=False, template=None):
+    """Save a full schema dict for a session"""
+    template = template or session_template(session_id)
+    return save_session(session_id, template.session(schema), restarted=restarted)
+
+# ---- Schema Versions ----
+# The last state seen for each session, keyed by the file's identity. Every
+# save replaces the file (new inode), so a stat is enough to tell whether the
+# copy in memory is still current, even when another worker wrote the file.
+# Only the SCHEMA_CACHE_SESSIONS most recently used sessions are kept.
+SchemaVersion = namedtuple("SchemaVersion", ["identity", "etag", "session"])
+_schema_versions = OrderedDict()
+_schema_versions_lock = threading.Lock()
+
+def schema_etag(schema):
+    """Content hash of a schema, used as its version and HTTP ETag"""
+    payload = json.dumps(schema, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def _file_identity(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def remember_schema_version(session_id, path, session):
+    """Cache a session state that was just written to path"""
+    version = SchemaVersion(_file_identity(path), schema_etag(session.expand()), session)
+    with _schema_versions_lock:
+        _schema_versions[session_id] = version
+        _schema_versions.move_to_end(session_id)
+        while len(_schema_versions) > SCHEMA_CACHE_SESSIONS:
+            _schema_versions.popitem(last=False)
+    return version
+
+def cached_schema_version(session_id):
+    """The SchemaVersion last seen for a session, or None; may be out of date"""
+    with _schema_versions_lock:
+        cached = _schema_versions.get(session_id)
+        if cached is not None:
+            _schema_versions.move_to_end(session_id)
+    return cached
+
+def load_session_version(session_id, create=True):
+    """Return the current SchemaVersion, re-reading the file only if it changed on disk.
+
+    The cached session is shared; copy it before modifying it. An unknown
+    session is created, or with create=False returns None.
+    """
+    path = schema_path(session_id)
+    with stage("schema.load"):
+        if not os.path.exists(path):
+            if not create:
+                return None
+            load_session(session_id)
+        identity = _file_identity(path)
+        cached = cached_schema_version(session_id)
+        if cached is None or cached.identity != identity:
+            cached = remember_schema_version(session_id, path, template_registry.load_session(read_json(path)))
+    return cached
+
+def load_schema_version(session_id):
+    """Return (schema, etag) for a session; an unknown session reads as a blank default form"""
+    version = load_session_version(session_id, create=False)
+    if version is None:
+        schema = make_default_schema()
+        return schema, schema_etag(schema)
+    return version.session.expand(), version.etag
+
+# ---- Schema Change Feed ----
+# Every save publishes the fields it changed to schema_events.feed, which
+# the SSE and long-poll routes relay to dashboards instead of polling.
+def publish_schema_change(session_id, previous, version, restarted=False):
+    """Publish a save as a field-level diff against the previous version.
+
+    Restarts, template switches and saves with no earlier version in
+    memory publish a "reset" carrying the whole schema.
+    """
+    session = version.session
+    schema = session.expand()
+    if restarted or previous is None or previous.session.template is not session.template:
+        event = {"type": "reset", "schema": schema}
     else:
-        # Use default schema template
-        default_schema = {
-            "chief_complaint": "",
-            "duration": "",
-            "severity": "",
-            "location": "",
-            "quality": "",
-            "alleviating_factors": "",
-            "aggravating_factors": "",
-            "associated_symptoms": "",
-            "previous_treatment": "",
-            "medical_history": "",
-            "medications": "",
-            "allergies": "",
-            "family_history": ""
-        }
+        changed = {field: value for field, value in schema.items() if previous.session.get(field) != value}
+        if not changed:
+            return None
+        event = {"type": "changed", "changed": changed}
+    event.update(version=version.etag, template=session.template.id, complete=session.is_complete())
+    return schema_events.feed.publish(session_id, event)
+
+def schema_snapshot(session_id):
+    """The session's whole schema as a feed event, without creating unknown sessions"""
+    version = load_session_version(session_id, create=False)
+    if version is None:
+        schema = make_default_schema()
+        return {"type": "snapshot", "schema": schema, "version": schema_etag(schema),
+                "template": template_registry.default.id, "complete": False}
+    session = version.session
+    return {"type": "snapshot", "schema": session.expand(), "version": version.etag,
+            "template": session.template.id, "complete": session.is_complete()}
+
+def reset_schema(session_id, template=None):
+    """Reset a session, optionally switching it to another template"""
+    session = (template or session_template(session_id)).session()
+    save_session(session_id, session, restarted=True)
+    return session
+
+# ---- LLM Calls ----
+def _usage(usage, messages, text):
+    """(prompt_tokens, completion_tokens) as reported, or estimated"""
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens
+    prompt = " ".join(m["content"] for m in messages)
+    return estimate_tokens(prompt), estimate_tokens(text)
+
+def complete_chat(system_prompt, user_prompt, temperature, on_sentence=None, task="generate",
+                  max_tokens=None, json_mode=False, helper=None, field=None):
+    """Run a chat completion on the task's model route and return the reply text.
+
+    With on_sentence, the reply is streamed and each sentence is passed to
+    the callback as soon as it is complete, so speech can start before the
+    model has finished. A stream that fails part-way is not retried on the
+    fallback model, since its first sentences were already used.
+    max_tokens and json_mode constrain short classification answers.
+    Each call's tokens, cost and latency are counted against the helper,
+    field and the thread's session (see llm_accounting.py).
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    options = {}
+    if max_tokens is not None:
+        options["max_tokens"] = max_tokens
+    if json_mode:
+        options["response_format"] = {"type": "json_object"}
+
+    def attempt(model, timeout, has_fallback):
+        # Leave retrying to the fallback chain when there is one
+        client = get_client().with_options(timeout=timeout, max_retries=0 if has_fallback else 2)
+        if on_sentence is None:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                **options
+            )
+            text = response.choices[0].message.content.strip()
+            return text, _usage(response.usage, messages, text)
+
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            **options
+        )
+        usage = []
         
-        with open(session_schema_path, "w") as f:
-            json.dump(default_schema, f, indent=2)
+        def deltas():
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage.append(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         
-        return default_schema
+        sentences = []
+        try:
+            for sentence in iter_sentences(deltas()):
+                sentences.append(sentence)
+                on_sentence(sentence)
+        except Exception as e:
+            if sentences:
+                raise PartialOutputError(str(e)) from e
+            raise
+        text = " ".join(sentences)
+        return text, _usage(usage[-1] if usage else None, messages, text)
 
-def save_schema(session_id, schema):
-    """Save schema for a session"""
-    session_schema_path = f"./schema_{session_id}.json"
-    with open(session_schema_path, "w") as f:
-        json.dump(schema, f, indent=2)
-
-def reset_schema(session_id):
-    """Reset schema for a session"""
-    schema = load_schema(session_id)
-    cleared_schema = {k: "" for k in schema}
-    save_schema(session_id, cleared_schema)
-    return cleared_schema
+    attempt = llm_accounting.ledger.track(attempt, helper, field, model_router.cost)
+    with stage(f"llm.{task}"):
+        return model_router.run(task, attempt)
 
 # ---- Question Generation ----
-def get_next_unfilled_field(schema):
+COMPLETION_MESSAGE = "All fields completed"
+
+def get_next_unfilled_field(session):
     """Get the next field that needs to be filled"""
-    for field, value in schema.items():
-        if value in [None, "", []]:
-            return field
-    return None
+    return session.next_unfilled()
 
-def generate_first_question(field):
+def generate_first_question(field, on_sentence=None):
     """Generate the first question of the interview"""
     system_prompt = (
         "You are a warm and concise nurse starting a standard patient intake interview. "
@@ -128,18 +560,10 @@ def generate_first_question(field):
     )
     user_prompt = f"Start the conversation by asking a question related to the field: '{field}'"
 
-    response = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.7
-    )
+    return complete_chat(system_prompt, user_prompt, temperature=0.7, on_sentence=on_sentence,
+                         helper="generate_first_question", field=field)
 
-    return response.choices[0].message.content.strip()
-
-def generate_transition_question(prev_response, next_field):
+def generate_transition_question(prev_response, next_field, on_sentence=None):
     """Generate a transition to the next question"""
     system_prompt = (
         "You are a compassionate but concise nurse conducting a prescreening interview. "
@@ -150,38 +574,37 @@ def generate_transition_question(prev_response, next_field):
         f"The next field is: \"{next_field}\""
     )
 
-    response = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.7
-    )
-
-    return response.choices[0].message.content.strip()
+    return complete_chat(system_prompt, user_prompt, temperature=0.7, on_sentence=on_sentence,
+                         helper="generate_transition_question", field=next_field)
 
-def needs_follow_up(field, response):
-    """Check if the response needs a follow-up question"""
+def check_completeness(field, response):
+    """Ask whether the response completes the field; returns a Verdict"""
     system_prompt = (
         "You are helping a nurse complete a patient intake form. "
         "Decide if the patient's response gives enough information to complete the field. "
-        "Reply only with 'yes' or 'no'. Be strict: if you're unsure, return 'no'."
+        "Be strict: if you're unsure, the field is not complete. "
+        f"Answer only with JSON: {VERDICT_FORMAT}"
     )
     user_prompt = f"Field: {field}\nPatient response: \"{response}\"\nIs this complete?"
 
-    result = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.2
+    answer = complete_chat(
+        system_prompt, user_prompt, temperature=0.0, task="classify",
+        max_tokens=VERDICT_MAX_TOKENS, json_mode=True, helper="needs_follow_up", field=field
     )
+    return parse_verdict(answer)
+
+def needs_follow_up(field, response):
+    """Check if the response is complete enough to fill the field.
 
-    return result.choices[0].message.content.strip().lower() == "yes"
+    Unreadable or low-confidence answers count as incomplete, matching the
+    prompt's "if you're unsure, the field is not complete".
+    """
+    verdict = check_completeness(field, response)
+    if verdict.answer is None:
+        print(f"Could not read completeness verdict: {verdict.raw!r}")
+    return bool(verdict.answer) and verdict.confidence >= MIN_VERDICT_CONFIDENCE
 
-def generate_follow_up_question(field, response):
+def generate_follow_up_question(field, response, on_sentence=None):
     """Generate a follow-up question"""
     system_prompt = (
         "You are a helpful nurse. The patient's response was unclear or incomplete. "
@@ -189,16 +612,8 @@ def generate_follow_up_question(field, response):
     )
     user_prompt = f"Field: {field}\nPatient response: \"{response}\""
 
-    result = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.7
-    )
-
-    return result.choices[0].message.content.strip()
+    return complete_chat(system_prompt, user_prompt, temperature=0.7, on_sentence=on_sentence,
+                         helper="generate_follow_up_question", field=field)
 
 def summarize_response_for_schema(field, raw_response):
     """Extract relevant information from the response"""
@@ -209,120 +624,339 @@ def summarize_response_for_schema(field, raw_response):
     )
     user_prompt = f"Field: {field}\nResponse: \"{raw_response}\""
 
-    response = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.3
+    return complete_chat(system_prompt, user_prompt, temperature=0.3, task="extract",
+                         helper="summarize_response_for_schema", field=field)
+
+# ---- Post-interview Jobs ----
+# Completing an intake queues a summarize job. Its handler stores the
+# clinician summary, then queues the email and chart export when they are
+# configured. Job workers run them in the background (job_queue.py), so the
+# final turn returns without waiting. A job can run more than once, so each
+# handler is safe to repeat.
+def queue_completion_jobs(session_id, version):
+    """Queue the post-interview work for a session that just completed"""
+    payload = {"session_id": session_id, "version": version}
+    return job_queue.enqueue("summarize", payload, dedupe_key=f"summarize:{session_id}:{version}")
+
+def completed_session(payload):
+    """The session a job is about, or None if it has changed since it completed"""
+    data = read_json(schema_path(payload["session_id"]))
+    if data is None:
+        return None
+    session = template_registry.load_session(data)
+    if not session.is_complete() or schema_etag(session.expand()) != payload["version"]:
+        return None
+    return session
+
+def generate_intake_summary(session):
+    """Summarize a completed intake for the clinician"""
+    system_prompt = (
+        "You are a medical assistant preparing a patient intake for a clinician. "
+        "Summarize the intake in 3 to 5 short sentences, leading with the chief complaint. "
+        "Use only the information given."
     )
+    user_prompt = "\n".join(f"{field}: {value}" for field, value in session.expand().items())
+
+    return complete_chat(system_prompt, user_prompt, temperature=0.3, helper="generate_intake_summary")
 
-    return response.choices[0].message.content.strip()
+@job_queue.handler("summarize")
+def summarize_intake_job(payload):
+    session_id = payload["session_id"]
+    session = completed_session(payload)
+    if session is None:
+        print(f"Session {session_id} changed after completing; skipping its summary")
+        return
+    with llm_accounting.session(session_id):
+        summary = generate_intake_summary(session)
+    intake_store.save_summary(session_id, summary)
+
+    follow_on = dict(payload, summary=summary)
+    if INTAKE_EMAIL_URL and INTAKE_EMAIL_TO:
+        job_queue.enqueue("email", follow_on, dedupe_key=f"email:{session_id}:{payload['version']}")
+    if CHART_EXPORT_DIR:
+        job_queue.enqueue("export", follow_on, dedupe_key=f"export:{session_id}:{payload['version']}")
+
+@job_queue.handler("email")
+def email_intake_job(payload):
+    # requests takes ~0.1 s to import and nothing else here uses it, so it is
+    # loaded by the first email rather than at startup
+    import requests
+
+    session_id = payload["session_id"]
+    session = completed_session(payload)
+    if session is None:
+        print(f"Session {session_id} changed after completing; skipping its email")
+        return
+    rows = "".join(
+        f"<tr><th>{html.escape(field)}</th><td>{html.escape(value)}</td></tr>"
+        for field, value in session.expand().items()
+    )
+    text = "\n".join(f"{field}: {value}" for field, value in session.expand().items())
+    response = requests.post(INTAKE_EMAIL_URL, json={
+        "to": INTAKE_EMAIL_TO,
+        "subject": f"Intake completed: {session_id}",
+        "html": f"<p>{html.escape(payload['summary'])}</p><table>{rows}</table>",
+        "text": f"{payload['summary']}\n\n{text}",
+    }, timeout=EMAIL_TIMEOUT_SECONDS)
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        raise PermanentJobError(f"Email rejected ({response.status_code}): {response.text[:200]}")
+    response.raise_for_status()
+
+@job_queue.handler("export")
+def export_intake_job(payload):
+    session_id = payload["session_id"]
+    session = completed_session(payload)
+    if session is None:
+        print(f"Session {session_id} changed after completing; skipping its export")
+        return
+    write_json(os.path.join(CHART_EXPORT_DIR, f"intake_{session_id}.json"), {
+        "session_id": session_id,
+        "template": session.template.id,
+        "version": payload["version"],
+        "summary": payload["summary"],
+        "fields": session.expand(),
+    })
 
 # ---- API Routes ----
+def begin_session(session_id, on_sentence=None, template_id=None, clinic=None):
+    """Reset a session and generate its first question.
+
+    A template id or clinic picks the intake form; otherwise the session
+    keeps the form it already had (the default for new sessions).
+    """
+    template = template_registry.resolve(template_id, clinic) if template_id or clinic else None
+    with session_lock(session_id):
+        session = reset_schema(session_id, template)
+        clear_turn_results(session_id)
+    field = get_next_unfilled_field(session)
+    
+    if not field:
+        print(f"All fields already completed for session {session_id}")
+        return {"message": "All fields already completed", "complete": True}
+    
+    print(f"Generating first question for field: {field}")
+    with llm_accounting.session(session_id):
+        question = generate_first_question(field, on_sentence=on_sentence)
+    print(f"Generated question: {question}")
+    
+    return {
+        "session_id": session_id,
+        "template": session.template.id,
+        "current_field": field,
+        "question": question,
+        "complete": False
+    }
+
 @app.route('/api/start-session/<session_id>', methods=['POST'])
 def start_session(session_id):
     """Initialize or reset a session"""
     print(f"Starting session {session_id}")
     try:
-        schema = reset_schema(session_id)
-        field = get_next_unfilled_field(schema)
+        options = request.get_json(silent=True) or {}
+        template_id = options.get('template') or request.args.get('template')
+        clinic = options.get('clinic') or request.args.get('clinic')
+        # New sessions yield to interviews already in progress
+        with admission.interview.admit(admission.START):
+            response = begin_session(session_id, template_id=template_id, clinic=clinic)
+        print(f"Returning response: {response}")
+        return jsonify(response)
+    except Overloaded as e:
+        print(f"Shedding start_session for {session_id}: {str(e)}")
+        return overloaded_response(e)
+    except UnknownTemplate as e:
+        print(f"Error in start_session: {str(e)}")
+        return jsonify({"error": str(e)}), 400
+    except SessionBusy as e:
+        print(f"Error in start_session: {str(e)}")
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        print(f"Error in start_session: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+_transcript_lock = threading.Lock()
+
+def record_transcript(field, response_text, complete, value=None):
+    """Append a turn to TRANSCRIPT_LOG, if set"""
+    if not TRANSCRIPT_LOG:
+        return
+    entry = {"field": field, "response": response_text, "complete": complete, "at": time.time()}
+    if value is not None:
+        entry["value"] = value
+    with _transcript_lock, open(TRANSCRIPT_LOG, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def process_turn(session_id, response_text, current_field, session, on_sentence=None, completeness=None):
+    """Apply one patient response to the session and build the API response.
+
+    on_sentence receives the next question sentence by sentence as it is
+    generated. completeness is a verdict already computed from a matching
+    partial transcript, which skips the completeness check.
+    """
+    if current_field and current_field not in session.template:
+        print(f"Field {current_field} is not on the {session.template.id} form")
+        current_field = None
+    if not current_field:
+        current_field = get_next_unfilled_field(session)
+        print(f"No field specified, using next unfilled field: {current_field}")
+    
+    # Process the current response
+    print(f"Checking if response is complete for field: {current_field}")
+    if completeness is not None:
+        complete = completeness
+    else:
+        complete = needs_follow_up(current_field, response_text)
+    print(f"Response completeness check result: {complete}")
+    
+    if complete:
+        # Save the response and move to next field
+        print(f"Response is complete, summarizing for field: {current_field}")
+        clean_value = summarize_response_for_schema(current_field, response_text)
+        print(f"Summarized value: {clean_value}")
+        record_transcript(current_field, response_text, True, clean_value)
         
-        if not field:
-            print(f"All fields already completed for session {session_id}")
-            return jsonify({"message": "All fields already completed", "complete": True})
+        session.set(current_field, clean_value)
+        version = save_session(session_id, session)
+        print(f"Updated schema saved for session {session_id}")
         
-        print(f"Generating first question for field: {field}")
-        question = generate_first_question(field)
+        # Get the next field
+        next_field = get_next_unfilled_field(session)
+        print(f"Next field to fill: {next_field}")
+        
+        if not next_field:
+            # All fields completed
+            print(f"All fields completed for session {session_id}")
+            try:
+                queue_completion_jobs(session_id, version.etag)
+            except Exception as e:
+                print(f"Error queueing post-interview jobs for session {session_id}: {str(e)}")
+            return {
+                "message": COMPLETION_MESSAGE,
+                "complete": True,
+                "schema": session.expand(),
+                "changed": {current_field: clean_value},
+                "version": version.etag
+            }
+        
+        # Generate next question
+        print(f"Generating transition question to field: {next_field}")
+        question = generate_transition_question(response_text, next_field, on_sentence=on_sentence)
         print(f"Generated question: {question}")
         
-        response = {
-            "session_id": session_id,
-            "current_field": field,
+        return {
+            "current_field": next_field,
             "question": question,
-            "complete": False
+            "complete": False,
+            "changed": {current_field: clean_value},
+            "version": version.etag
         }
-        print(f"Returning response: {response}")
-        return jsonify(response)
-    except Exception as e:
-        print(f"Error in start_session: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    else:
+        # Need follow-up for current field
+        print(f"Response is incomplete, generating follow-up for field: {current_field}")
+        record_transcript(current_field, response_text, False)
+        follow_up = generate_follow_up_question(current_field, response_text, on_sentence=on_sentence)
+        print(f"Generated follow-up question: {follow_up}")
+        
+        return {
+            "current_field": current_field,
+            "question": follow_up,
+            "complete": False,
+            "changed": {},
+            "version": schema_etag(session.expand())
+        }
+
+def answering_field(session_id):
+    """The field a turn without current_field answers, as the session stands now"""
+    version = load_session_version(session_id, create=False)
+    session = version.session if version is not None else template_registry.default.session()
+    return get_next_unfilled_field(session)
+
+def handle_turn(session_id, response_text, current_field=None, idempotency_key=None,
+                on_sentence=None, completeness=None):
+    """Process one patient turn under the session lock.
+
+    Turns for the same session are serialized with the session lock. A retried
+    turn (same idempotency key, or an identical submission within the
+    duplicate window) returns the cached result without calling the LLM again.
+    """
+    # Without a key, a turn is identified by its text and the field it answers.
+    # That field is resolved before waiting for the lock, so duplicates sent
+    # together match each other, while the same answer given to the next
+    # question is a new turn.
+    turn_key = idempotency_key or turn_fingerprint(current_field or answering_field(session_id), response_text)
+    with session_lock(session_id):
+        session = load_session_version(session_id).session.copy()
+        print(f"Loaded session {session!r}")
+        
+        cached = get_turn_result(session_id, turn_key)
+        if cached is not None:
+            print(f"Returning cached result for turn {turn_key}")
+            return cached
+        
+        with llm_accounting.session(session_id):
+            response = process_turn(
+                session_id, response_text, current_field, session, on_sentence, completeness
+            )
+        save_turn_result(session_id, turn_key, response)
+        return response
+
+def fallback_question(field):
+    """The templated re-ask used when a turn is shed"""
+    return f"Sorry, I didn't catch that. Could you tell me again about your {field.replace('_', ' ')}?"
+
+def fallback_turn(session_id, current_field=None):
+    """Ask the current question again without calling the LLM or saving the answer.
+
+    Used for turns shed under overload, so the interview carries on instead
+    of failing; the patient repeats their answer once there is capacity.
+    """
+    session = load_session_version(session_id).session
+    if not current_field or current_field not in session.template:
+        current_field = get_next_unfilled_field(session)
+    return respond({
+        "current_field": current_field,
+        "question": fallback_question(current_field),
+        "complete": False,
+        "changed": {},
+        "degraded": True,
+    })
 
 @app.route('/api/process-response/<session_id>', methods=['POST'])
 def process_response(session_id):
-    """Process a patient response"""
+    """Process a patient response.
+
+    The idempotency key comes from the Idempotency-Key header or turn_id.
+    With `Prefer: return=minimal` (or `?lean=1`) the full schema is left out
+    of the completion response; clients apply `changed` to their copy.
+    """
     print(f"Processing response for session {session_id}")
     try:
         data = request.json
         response_text = data.get('response')
         print(f"Received response: {response_text[:50]}...")
         
-        schema = load_schema(session_id)
-        print(f"Loaded schema with fields: {list(schema.keys())}")
-        
         current_field = data.get('current_field')
         print(f"Current field from request: {current_field}")
         
-        if not current_field:
-            current_field = get_next_unfilled_field(schema)
-            print(f"No field specified, using next unfilled field: {current_field}")
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('turn_id')
+        try:
+            with admission.interview.admit(admission.TURN):
+                response = handle_turn(session_id, response_text, current_field, idempotency_key)
+        except Overloaded as e:
+            print(f"Shedding turn for {session_id}: {str(e)}")
+            if not ADMISSION_FALLBACK_QUESTIONS:
+                return overloaded_response(e)
+            response = fallback_turn(session_id, current_field)
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
         
-        # Process the current response
-        print(f"Checking if response is complete for field: {current_field}")
-        complete = needs_follow_up(current_field, response_text)
-        print(f"Response completeness check result: {complete}")
-        
-        if complete:
-            # Save the response and move to next field
-            print(f"Response is complete, summarizing for field: {current_field}")
-            clean_value = summarize_response_for_schema(current_field, response_text)
-            print(f"Summarized value: {clean_value}")
-            
-            schema[current_field] = clean_value
-            save_schema(session_id, schema)
-            print(f"Updated schema saved for session {session_id}")
-            
-            # Get the next field
-            next_field = get_next_unfilled_field(schema)
-            print(f"Next field to fill: {next_field}")
-            
-            if not next_field:
-                # All fields completed
-                print(f"All fields completed for session {session_id}")
-                response = {
-                    "message": "All fields completed",
-                    "complete": True,
-                    "schema": schema
-                }
-                print(f"Returning completion response: {response}")
-                return jsonify(response)
-            
-            # Generate next question
-            print(f"Generating transition question to field: {next_field}")
-            question = generate_transition_question(response_text, next_field)
-            print(f"Generated question: {question}")
-            
-            response = {
-                "current_field": next_field,
-                "question": question,
-                "complete": False
-            }
-            print(f"Returning next question response: {response}")
-            return jsonify(response)
-        else:
-            # Need follow-up for current field
-            print(f"Response is incomplete, generating follow-up for field: {current_field}")
-            follow_up = generate_follow_up_question(current_field, response_text)
-            print(f"Generated follow-up question: {follow_up}")
-            
-            response = {
-                "current_field": current_field,
-                "question": follow_up,
-                "complete": False
-            }
-            print(f"Returning follow-up response: {response}")
-            return jsonify(response)
+        if wants_lean():
+            response = {k: v for k, v in response.items() if k != "schema"}
+        print(f"Returning response: {response}")
+        return respond(response)
+    except SessionBusy as e:
+        error_msg = f"Error in process_response: {str(e)}"
+        print(error_msg)
+        return jsonify({"error": error_msg}), 409
     except Exception as e:
         error_msg = f"Error in process_response: {str(e)}"
         print(error_msg)
@@ -330,19 +964,55 @@ def process_response(session_id):
 
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech_endpoint():
-    """Convert text to speech"""
+    """Convert text to speech.
+
+    With "format" set to opus, mp3 or wav the audio is streamed back as it is
+    encoded; without it the legacy behaviour of writing temp_audio.wav is kept.
+    """
     print("Processing text-to-speech request")
     data = request.json
     text = data.get('text')
+    output_format = data.get('format')
     
     print(f"Received text: {text}")
     if not text:
         print("Error: No text provided")
         return jsonify({"error": "No text provided"}), 400
     
+    if output_format:
+        if output_format not in OUTPUT_FORMATS:
+            return jsonify({"error": f"Unsupported format: {output_format}"}), 400
+        # Cached speech needs no synthesis, so it skips admission
+        cached = tts_cache.cache.get_chunks(text, output_format, voice=TTS_VOICE) if tts_cache.TTS_CACHE else None
+        if cached is not None:
+            print(f"Serving cached {output_format} audio for: {text[:50]}...")
+            response = Response(cached, mimetype=mimetype_for(output_format))
+            response.headers["X-TTS-Cache"] = "hit"
+            return response
+        try:
+            ticket = admission.speech.admit()
+        except Overloaded as e:
+            return overloaded_response(e)
+        print(f"Streaming {output_format} audio for: {text[:50]}...")
+        response = Response(
+            stream_with_context(
+                tts_cache.cache.fill(text, output_format, render_speech, voice=TTS_VOICE)
+                if tts_cache.TTS_CACHE else render_speech(text, output_format)
+            ),
+            mimetype=mimetype_for(output_format)
+        )
+        # The slot is held until the whole stream has been sent
+        response.call_on_close(ticket.release)
+        return response
+    
+    try:
+        ticket = admission.speech.admit()
+    except Overloaded as e:
+        return overloaded_response(e)
     try:
         # Convert text to speech
         print(f"Initializing pyttsx3 engine")
+        import pyttsx3
         engine = pyttsx3.init()
         print(f"Saving text to temp_audio.wav: {text[:50]}...")
         engine.save_to_file(text, 'temp_audio.wav')
@@ -358,62 +1028,311 @@ def text_to_speech_endpoint():
         error_msg = f"Error in text-to-speech: {str(e)}"
         print(error_msg)
         return jsonify({"error": error_msg}), 500
+    finally:
+        ticket.release()
 
 @app.route('/api/speech-to-text', methods=['POST'])
 def speech_to_text_endpoint():
-    """Convert speech to text"""
+    """Convert speech to text.
+
+    Accepts any format ffmpeg can decode (browsers send WebM/Opus); the upload
+    is streamed straight into the decoder rather than saved to disk first.
+    """
     if 'audio' not in request.files:
         return jsonify({"error": "No audio file provided"}), 400
     
     audio_file = request.files['audio']
-    audio_file.save('temp_input_audio.wav')
+    content_type = audio_file.mimetype or ""
+    generic = content_type in ("", "application/octet-stream")
+    if generic and (audio_file.filename or "").lower().endswith(".wav"):
+        content_type = "audio/wav"
     
     try:
         # Convert speech to text
-        recognizer = sr.Recognizer()
-        
-        with sr.AudioFile('temp_input_audio.wav') as source:
-            audio = recognizer.record(source)
-        
-        text = recognizer.recognize_google(audio)
-        os.remove('temp_input_audio.wav')
+        with admission.speech.admit():
+            pcm, sample_rate = decode_to_pcm(iter_stream(audio_file.stream), content_type)
+            text = transcribe_pcm(pcm, sample_rate)
         
         return jsonify({"status": "success", "text": text})
+    except Overloaded as e:
+        return overloaded_response(e)
+    except TranscodeError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        if os.path.exists('temp_input_audio.wav'):
-            os.remove('temp_input_audio.wav')
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/admission/stats', methods=['GET'])
+def admission_stats():
+    """Limits, requests in flight and waiting, and shed counts per admission pool"""
+    return jsonify({"interview": admission.interview.snapshot(), "speech": admission.speech.snapshot()})
+
+@app.route('/api/tts/cache/stats', methods=['GET'])
+def tts_cache_stats():
+    """Hit rate, bytes served from the cache and tier sizes"""
+    return jsonify(tts_cache.cache.snapshot())
+
+@app.route('/api/pipeline/stats', methods=['GET'])
+def pipeline_stats():
+    """Queue depth, wait and service time per voice pipeline stage"""
+    return jsonify(pipeline.metrics())
+
+@app.route('/api/models/stats', methods=['GET'])
+def model_stats():
+    """Model routes plus calls, fallbacks, latency, tokens and cost per task and model"""
+    return jsonify(model_router.metrics())
+
+@app.route('/api/models/usage', methods=['GET'])
+def model_usage():
+    """LLM calls, tokens, cost and latency grouped by ?by= (default field,helper), costliest first.
+
+    Filters: ?session_id=, ?since= and ?until= (YYYY-MM-DD), ?limit=.
+    """
+    try:
+        report = llm_accounting.ledger.report(
+            request.args.get('by', 'field,helper').split(','),
+            session_id=request.args.get('session_id'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=min(request.args.get('limit', default=llm_accounting.DEFAULT_REPORT_ROWS, type=int), 1000),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return respond(report)
+
+@app.route('/api/audio/stats', methods=['GET'])
+def audio_stats():
+    """Encode/decode time per second of audio"""
+    return jsonify(transcode_stats.snapshot())
+
 @app.route('/api/get-schema/<session_id>', methods=['GET'])
 def get_schema(session_id):
-    """Get the current schema for a session"""
-    schema = load_schema(session_id)
-    return jsonify(schema)
-
-# Create a sample schema.json file if it doesn't exist
-if not os.path.exists(SCHEMA_PATH):
-    default_schema = {
-        "chief_complaint": "",
-        "duration": "",
-        "severity": "",
-        "location": "",
-        "quality": "",
-        "alleviating_factors": "",
-        "aggravating_factors": "",
-        "associated_symptoms": "",
-        "previous_treatment": "",
-        "medical_history": "",
-        "medications": "",
-        "allergies": "",
-        "family_history": ""
-    }
-    
-    with open(SCHEMA_PATH, "w") as f:
-        json.dump(default_schema, f, indent=2)
+    """Get the current schema for a session.
+
+    Answers 304 Not Modified from memory when If-None-Match matches the
+    current version, so polling doesn't re-read or re-send the schema.
+    """
+    schema, etag = load_schema_version(session_id)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = respond(schema)
+    response.set_etag(etag)
+    return response
+
+def feed_position():
+    """The seq a subscriber resumes after: Last-Event-ID or ?since, None for a fresh start"""
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        return int(since) if since else None
+    except ValueError:
+        return None
+
+def sse_event(event):
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+def feed_refused(e):
+    print(f"Refusing schema feed subscriber: {str(e)}")
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(schema_events.HEARTBEAT_SECONDS)
+    return response
+
+@app.route('/api/schema-feed/stats', methods=['GET'])
+def schema_feed_stats():
+    """Sessions and events buffered, open subscribers and events published"""
+    return jsonify(schema_events.feed.snapshot())
+
+@app.route('/api/schema-feed/<session_id>', methods=['GET'])
+def schema_feed(session_id):
+    """Server-sent events with each change to a session's schema.
+
+    A new subscriber first gets a "snapshot" event with the whole schema,
+    then a "changed" event with the filled fields after each turn and a
+    "reset" with the whole schema when the session restarts. Event ids are
+    feed positions: reconnecting with Last-Event-ID resumes after it, or
+    starts over with a snapshot if those events are no longer buffered.
+    """
+    try:
+        schema_events.feed.subscribe()
+    except TooManySubscribers as e:
+        return feed_refused(e)
+    since = feed_position()
+
+    def stream():
+        nonlocal since
+        yield f"retry: {schema_events.RECONNECT_MS}\n\n"
+        while True:
+            if since is None:
+                since = schema_events.feed.latest()
+                yield sse_event(dict(schema_snapshot(session_id), seq=since))
+            events, gap = schema_events.feed.wait(session_id, since, schema_events.HEARTBEAT_SECONDS)
+            if gap:
+                since = None
+                continue
+            if not events:
+                # Also how a closed connection is noticed
+                yield ": keepalive\n\n"
+            for event in events:
+                yield sse_event(event)
+                since = event["seq"]
+
+    response = Response(stream(), mimetype="text/event-stream")
+    # Runs even if the client leaves before the stream starts
+    response.call_on_close(schema_events.feed.unsubscribe)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route('/api/schema-feed/<session_id>/poll', methods=['GET'])
+def poll_schema_feed(session_id):
+    """Long-poll alternative to the event stream.
+
+    Without ?since, answers at once with a snapshot. With it, waits up to
+    ?timeout seconds (at most 30) for changes after that position. Either
+    way "seq" is the position to pass next time; "snapshot" is set when the
+    client must replace its copy rather than apply "events".
+    """
+    since = feed_position()
+    timeout = min(request.args.get('timeout', default=25.0, type=float), schema_events.MAX_POLL_SECONDS)
+    try:
+        with schema_events.feed.subscription():
+            snapshot = None
+            events, gap = [], since is None
+            if since is not None:
+                events, gap = schema_events.feed.wait(session_id, since, max(0.0, timeout))
+            if gap:
+                since = schema_events.feed.latest()
+                snapshot = schema_snapshot(session_id)
+            elif events:
+                since = events[-1]["seq"]
+    except TooManySubscribers as e:
+        return feed_refused(e)
+    return respond({"seq": since, "snapshot": snapshot, "events": events})
+
+# ---- Intake Templates ----
+@app.route('/api/templates', methods=['GET'])
+def list_templates():
+    """The intake forms this deployment serves and the clinics using each"""
+    return respond({"default": template_registry.default_id, "templates": template_registry.describe()})
+
+# ---- Intake Queries ----
+@app.route('/api/intakes', methods=['GET'])
+def list_intakes():
+    """Page through intakes, most recently updated first.
+
+    Query parameters: status (completed or in_progress), template, since
+    and until (epoch seconds), limit, and cursor (next_cursor from the
+    previous page).
+    """
+    try:
+        page = intake_store.list_intakes(
+            template=request.args.get('template'),
+            status=request.args.get('status'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=request.args.get('limit'),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return respond(page)
+
+@app.route('/api/intakes/search', methods=['GET'])
+def search_intakes():
+    """Search completed intakes by field values (q), with the same paging as /api/intakes"""
+    try:
+        page = intake_store.search_intakes(
+            request.args.get('q', ''),
+            template=request.args.get('template'),
+            status=request.args.get('status', intake_store.STATUS_COMPLETED),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=request.args.get('limit'),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return respond(page)
+
+@app.route('/api/intakes/<session_id>', methods=['GET'])
+def get_intake(session_id):
+    """One stored intake with its status and timestamps"""
+    intake = intake_store.get_intake(session_id)
+    if intake is None:
+        return jsonify({"error": f"No intake for session {session_id}"}), 404
+    return respond(intake)
+
+# ---- Job Queue ----
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Recent background jobs; ?status=dead lists the dead-lettered ones"""
+    status = request.args.get('status')
+    if status and status not in job_queue.STATUSES:
+        return jsonify({"error": f"Unknown status: {status}"}), 400
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    return respond({"jobs": job_queue.list_jobs(status, request.args.get('kind'), limit)})
+
+@app.route('/api/jobs/stats', methods=['GET'])
+def job_stats():
+    """Jobs per kind and status, and this process's workers"""
+    return respond({"counts": job_queue.job_counts(), "workers": job_queue.workers.snapshot()})
+
+@app.route('/api/jobs/<int:job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Re-queue a dead-lettered job"""
+    if job_queue.get_job(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not job_queue.retry(job_id):
+        return jsonify({"error": "Only dead jobs can be retried"}), 409
+    return respond(job_queue.get_job(job_id))
+
+# ---- WebSocket Interview Channel ----
+@app.route('/ws/interview/<session_id>', websocket=True)
+def interview_socket(session_id):
+    """Full-duplex voice interview: audio up, question text and speech down"""
+    # Imported here rather than at module level to keep cold start fast
+    from simple_websocket import Server, ConnectionClosed
     
-    print(f"Created schema template at {SCHEMA_PATH}")
+    output_format = request.args.get('format', 'opus')
+    ws = Server(request.environ)
+    print(f"WebSocket interview connected for session {session_id}")
+    try:
+        InterviewSocket(ws, session_id, sys.modules[__name__], output_format).run()
+    except ConnectionClosed:
+        pass
+    finally:
+        ws.close()
+    print(f"WebSocket interview closed for session {session_id}")
+    return Response()
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Report whether the service is ready; 503 while backends are warming up"""
+    status = {"ready": _ready.is_set(), "backends": backend_status}
+    return jsonify(status), (200 if status["ready"] else 503)
+
+def serve():
+    """Bind the port first, then warm backends in the background"""
+    from werkzeug.serving import make_server
+    template_registry.load()
+    server = make_server('0.0.0.0', PORT, app, threaded=True)
+    print(f"Voice API listening on port {PORT}")
+    threading.Thread(target=warm_backends, daemon=True).start()
+    job_queue.workers.start()
+    # Write the LLM usage counted since the last flush on a clean shutdown
+    atexit.register(llm_accounting.ledger.flush)
+    server.serve_forever()
 
 if __name__ == '__main__':
-    print("Starting Voice API service on port 5001...")
+    print(f"Starting Voice API service on port {PORT}...")
     print(f"Using Groq API key: {'*' * len(GROQ_API_KEY) if GROQ_API_KEY else 'Not found! Set GROQ_API_KEY in .env'}")
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    if os.getenv("VOICE_API_DEBUG"):
+        template_registry.load()
+        job_queue.workers.start()
+        _ready.set()
+        app.run(host='0.0.0.0', port=PORT, debug=True)
+    else:
+        serve()
@@ -0,0 +1,90 @@
+import pytest
+
+import voice_api
+
+
+def complete_first_field(client, session_id, **kwargs):
+    return client.post(
+        f"/api/process-response/{session_id}",
+        json={"response": "I have a bad headache", "current_field": "chief_complaint"},
+        **kwargs,
+    )
+
+
+def test_process_response_reports_changed_fields(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    body = complete_first_field(client, "delta").get_json()
+
+    assert body["changed"] == {"chief_complaint": "headache"}
+    assert body["current_field"] == "duration"
+    assert body["version"] == voice_api.schema_etag(voice_api.load_schema("delta"))
+
+
+def test_lean_completion_omits_schema(session_dir, fake_llm):
+    schema = voice_api.make_default_schema()
+    schema = {field: "filled" for field in schema}
+    schema["chief_complaint"] = ""
+    voice_api.save_schema("lean", schema)
+
+    client = voice_api.app.test_client()
+    full = complete_first_field(client, "lean", headers={"Idempotency-Key": "a"}).get_json()
+    lean = complete_first_field(
+        client, "lean", headers={"Idempotency-Key": "a", "Prefer": "return=minimal"}
+    ).get_json()
+
+    assert full["complete"] and "schema" in full
+    assert lean["complete"] and "schema" not in lean
+    assert lean["changed"] == {"chief_complaint": "headache"}
+
+
+def test_get_schema_not_modified(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    first = client.get("/api/get-schema/etag")
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/get-schema/etag", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+
+    complete_first_field(client, "etag")
+    changed = client.get("/api/get-schema/etag", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["chief_complaint"] == "headache"
+
+
+def test_get_schema_sees_writes_from_other_workers(session_dir, fake_llm):
+    client = voice_api.app.test_client()
+    etag = client.get("/api/get-schema/shared").headers["ETag"]
+
+    # Simulate another worker process writing the file directly
+    schema = voice_api.make_default_schema()
+    schema["chief_complaint"] = "cough"
+    voice_api.write_json(voice_api.schema_path("shared"), schema)
+
+    resp = client.get("/api/get-schema/shared", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.get_json()["chief_complaint"] == "cough"
+
+
+def test_schema_cache_keeps_recent_sessions(session_dir, monkeypatch):
+    monkeypatch.setattr(voice_api, "SCHEMA_CACHE_SESSIONS", 2)
+    monkeypatch.setattr(voice_api, "_schema_versions", voice_api.OrderedDict())
+    for session_id in ("a", "b"):
+        voice_api.save_schema(session_id, voice_api.make_default_schema())
+    voice_api.load_session_version("a")
+    voice_api.save_schema("c", voice_api.make_default_schema())
+    assert list(voice_api._schema_versions) == ["a", "c"]
+
+    # A dropped session is read back from its file
+    assert voice_api.load_schema_version("b")[0] == voice_api.make_default_schema()
+    assert list(voice_api._schema_versions) == ["c", "b"]
+
+
+def test_msgpack_encoding(session_dir, fake_llm):
+    msgpack = pytest.importorskip("msgpack")
+    client = voice_api.app.test_client()
+    resp = complete_first_field(client, "packed", headers={"Accept": "application/msgpack"})
+
+    assert resp.mimetype == "application/msgpack"
+    assert msgpack.unpackb(resp.data)["changed"] == {"chief_complaint": "headache"}
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ---- Configuration ----
+STAGE_WORKERS = {
+    "stt": int(os.getenv("STT_WORKERS", "4")),
+    "llm": int(os.getenv("LLM_WORKERS", "8")),
+    "tts": int(os.getenv("TTS_WORKERS", "4")),
+}
+# Seconds of new audio between partial STT hypotheses; 0 disables them
+PARTIAL_HYPOTHESIS_SECONDS = float(os.getenv("PARTIAL_HYPOTHESIS_SECONDS", "1.5"))
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class Stage:
+    """A named worker pool with its own concurrency limit and queue metrics"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"stage-{name}")
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.service_seconds = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a job on this stage; returns a Future"""
+        enqueued = time.perf_counter()
+        with self.lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        def run():
+            started = time.perf_counter()
+            with self.lock:
+                self.queued -= 1
+                self.active += 1
+                self.wait_seconds += started - enqueued
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self.lock:
+                    self.active -= 1
+                    self.completed += int(ok)
+                    self.failed += int(not ok)
+                    self.service_seconds += time.perf_counter() - started
+
+        return self.executor.submit(run)
+
+    def metrics(self):
+        with self.lock:
+            done = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": round(self.wait_seconds / done * 1000, 2) if done else None,
+                "avg_service_ms": round(self.service_seconds / done * 1000, 2) if done else None,
+            }
+
+
+class Pipeline:
+    """The STT, LLM and TTS stages shared by all voice turns in the process"""
+
+    def __init__(self, workers=None):
+        self.stages = {name: Stage(name, count) for name, count in (workers or STAGE_WORKERS).items()}
+        self.lock = threading.Lock()
+        self.speculation = {"hits": 0, "misses": 0}
+
+    def __getattr__(self, name):
+        stages = self.__dict__.get("stages", {})
+        if name in stages:
+            return stages[name]
+        raise AttributeError(name)
+
+    def record_speculation(self, hit):
+        with self.lock:
+            self.speculation["hits" if hit else "misses"] += 1
+
+    def metrics(self):
+        with self.lock:
+            speculation = dict(self.speculation)
+        return {
+            "stages": {name: stage.metrics() for name, stage in self.stages.items()},
+            "speculation": speculation,
+        }
+
+
+pipeline = Pipeline()
+
+
+# ---- Text Helpers ----
+def iter_sentences(deltas):
+    """Group streamed text deltas into whole sentences as soon as each ends"""
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        parts = SENTENCE_END.split(buffer)
+        for sentence in parts[:-1]:
+            if sentence.strip():
+                yield sentence.strip()
+        buffer = parts[-1]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def normalize_transcript(text):
+    """Compare transcripts ignoring case, punctuation and spacing"""
+    return " ".join(re.sub(r"[^\w\s]", "", (text or "").lower()).split())
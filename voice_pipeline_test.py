@@ -0,0 +1,74 @@
+import time
+import threading
+
+import pytest
+
+from voice_pipeline import Stage, Pipeline, iter_sentences, normalize_transcript
+
+
+def test_iter_sentences_yields_each_sentence_as_it_completes():
+    deltas = ["Hello", " there. How", " long has it", " lasted? Any", " other symptoms"]
+    seen = []
+
+    def track():
+        for delta in deltas:
+            seen.append(delta)
+            yield delta
+
+    sentences = []
+    for sentence in iter_sentences(track()):
+        sentences.append((sentence, len(seen)))
+
+    assert sentences == [
+        ("Hello there.", 2),
+        ("How long has it lasted?", 4),
+        ("Any other symptoms", 5),
+    ]
+
+
+def test_normalize_transcript_ignores_case_and_punctuation():
+    assert normalize_transcript("I have a  bad headache.") == normalize_transcript("i have a bad headache")
+    assert normalize_transcript(None) == ""
+
+
+def test_stage_limits_concurrency_and_reports_queueing():
+    stage = Stage("test", 2)
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def job():
+        with lock:
+            active.append(1)
+            peak[0] = max(peak[0], len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+
+    futures = [stage.submit(job) for _ in range(6)]
+    for future in futures:
+        future.result()
+
+    metrics = stage.metrics()
+    assert peak[0] == 2
+    assert metrics["completed"] == 6
+    assert metrics["queued"] == 0 and metrics["active"] == 0
+    assert metrics["max_queue_depth"] >= 4
+    assert metrics["avg_wait_ms"] > 0
+
+
+def test_stage_counts_failures():
+    stage = Stage("test", 1)
+    with pytest.raises(ValueError):
+        stage.submit(int, "not a number").result()
+    assert stage.metrics()["failed"] == 1
+
+
+def test_pipeline_tracks_speculation():
+    pipeline = Pipeline({"stt": 1})
+    pipeline.record_speculation(True)
+    pipeline.record_speculation(False)
+    pipeline.record_speculation(True)
+    metrics = pipeline.metrics()
+    assert metrics["speculation"] == {"hits": 2, "misses": 1}
+    assert set(metrics["stages"]) == {"stt"}
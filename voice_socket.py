@@ -0,0 +1,310 @@
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import admission
+import llm_accounting
+from audio_transcode import STT_SAMPLE_RATE, decode_stream, mimetype_for
+from voice_pipeline import PARTIAL_HYPOTHESIS_SECONDS, normalize_transcript, pipeline
+
+
+class InterviewSocket:
+    """One full-duplex voice interview over a WebSocket.
+
+    Client -> server:
+      {"type": "start"}                         reset the session, ask the first question;
+                                                optional "template" or "clinic" picks the form
+      {"type": "audio_start", "mimetype": ...}  begin an utterance (also barges in)
+      <binary frames>                           microphone audio, any ffmpeg-decodable format
+      {"type": "audio_end"}                     end of utterance; runs STT -> turn -> TTS
+      {"type": "text", "text": ...}             typed answer instead of audio
+      {"type": "barge_in"}                      stop the question currently being spoken
+
+    Server -> client:
+      {"type": "transcript", "text": ...}
+      {"type": "question", ...}                 same fields as process_response
+      {"type": "audio_start", "mimetype": ...}  then per sentence {"type": "segment",
+                                                "text": ...} and its encoded audio as one
+                                                binary frame, then {"type": "audio_end"}
+      {"type": "audio_cancelled"}               speech stopped by barge-in
+      {"type": "metrics", ...}                  per-stage and end-to-end timings in ms
+      {"type": "error", "message": ...}         with "retry_after" (seconds) when the
+                                                server is overloaded and shed the request
+
+    Incoming audio is decoded while it streams in, and partial transcripts
+    start the completeness check before the patient has finished speaking.
+    Each socket coordinates its turns on a single thread so they stay ordered
+    while the receive loop keeps reading, which is what lets a new utterance
+    interrupt speech that is still playing. The STT, LLM and TTS work itself
+    runs on the shared pipeline stages.
+    """
+
+    def __init__(self, ws, session_id, services, output_format="opus"):
+        self.ws = ws
+        self.session_id = session_id
+        self.services = services
+        self.output_format = output_format
+        self.current_field = None
+        self.send_lock = threading.Lock()
+        self.turns = ThreadPoolExecutor(max_workers=1)
+        self.speech_cancel = threading.Event()
+        self.decoder = None
+
+    # ---- Sending ----
+    def send_event(self, event_type, **payload):
+        payload["type"] = event_type
+        with self.send_lock:
+            self.ws.send(json.dumps(payload))
+
+    def send_audio(self, chunk):
+        with self.send_lock:
+            self.ws.send(chunk)
+
+    # ---- Receive Loop ----
+    def run(self):
+        try:
+            while True:
+                message = self.ws.receive()
+                if message is None:
+                    break
+                if isinstance(message, (bytes, bytearray)):
+                    self.on_audio_chunk(bytes(message))
+                    continue
+                try:
+                    event = json.loads(message)
+                except ValueError:
+                    self.send_event("error", message="Invalid JSON message")
+                    continue
+                handler = getattr(self, f"on_{event.get('type')}", None)
+                if handler is None:
+                    self.send_event("error", message=f"Unknown message type: {event.get('type')}")
+                    continue
+                handler(event)
+        finally:
+            self.speech_cancel.set()
+            if self.decoder is not None:
+                self.decoder["chunks"].put(None)
+            self.turns.shutdown(wait=False)
+
+    # ---- Client Events ----
+    def on_start(self, event):
+        self.barge_in()
+        self.turns.submit(self.run_start, self.next_speech(), event.get("template"), event.get("clinic"))
+
+    def on_barge_in(self, event):
+        self.barge_in()
+
+    def on_audio_start(self, event):
+        self.barge_in()
+        self.start_decoder(event.get("mimetype", "audio/webm"))
+
+    def on_audio_chunk(self, chunk):
+        if self.decoder is None:
+            self.barge_in()
+            self.start_decoder("audio/webm")
+        self.decoder["chunks"].put(chunk)
+
+    def on_audio_end(self, event):
+        decoder, self.decoder = self.decoder, None
+        if decoder is None:
+            self.send_event("error", message="audio_end without audio")
+            return
+        decoder["chunks"].put(None)
+        self.turns.submit(self.run_audio_turn, decoder, time.perf_counter(), self.next_speech())
+
+    def on_text(self, event):
+        self.barge_in()
+        self.turns.submit(self.run_text_turn, event.get("text", ""), time.perf_counter(), self.next_speech())
+
+    # ---- Pipeline ----
+    def barge_in(self):
+        """Stop speech in progress or queued behind a turn that is still running"""
+        self.speech_cancel.set()
+
+    def next_speech(self):
+        """Cancel flag for the speech of a turn about to be queued"""
+        self.speech_cancel = threading.Event()
+        return self.speech_cancel
+
+    def start_decoder(self, mimetype):
+        chunks = queue.Queue()
+        decoder = {"chunks": chunks, "pcm": bytearray(), "sample_rate": None,
+                   "error": None, "speculation": None}
+        field = self.current_field
+
+        def feed():
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                yield chunk
+
+        def decode():
+            next_hypothesis = PARTIAL_HYPOTHESIS_SECONDS
+            try:
+                for pcm, sample_rate in decode_stream(feed(), mimetype):
+                    decoder["pcm"] += pcm
+                    decoder["sample_rate"] = sample_rate
+                    seconds = len(decoder["pcm"]) / (sample_rate * 2)
+                    if PARTIAL_HYPOTHESIS_SECONDS and field and seconds >= next_hypothesis:
+                        next_hypothesis = seconds + PARTIAL_HYPOTHESIS_SECONDS
+                        decoder["speculation"] = pipeline.stt.submit(
+                            self.speculate, bytes(decoder["pcm"]), sample_rate, field
+                        )
+            except Exception as e:
+                decoder["error"] = e
+
+        decoder["thread"] = threading.Thread(target=decode, daemon=True)
+        decoder["thread"].start()
+        self.decoder = decoder
+
+    def speculate(self, pcm, sample_rate, field):
+        """Transcribe partial audio and start the completeness check on it early"""
+        hypothesis = self.services.transcribe_pcm(pcm, sample_rate)
+        verdict = pipeline.llm.submit(
+            llm_accounting.in_session, self.session_id, self.services.needs_follow_up, field, hypothesis
+        )
+        return hypothesis, verdict
+
+    def speculative_verdict(self, decoder, text, metrics):
+        """The early completeness verdict, if its hypothesis matches the final transcript"""
+        speculation = decoder["speculation"]
+        if speculation is None:
+            return None
+        try:
+            hypothesis, verdict = speculation.result()
+            hit = normalize_transcript(hypothesis) == normalize_transcript(text)
+            pipeline.record_speculation(hit)
+            metrics["speculation_hit"] = hit
+            return verdict.result() if hit else None
+        except Exception:
+            return None
+
+    def run_start(self, cancel, template_id=None, clinic=None):
+        started = time.perf_counter()
+        speech = SpeechStream(self, cancel, started, {})
+        try:
+            with admission.interview.admit(admission.START):
+                result = pipeline.llm.submit(
+                    self.services.begin_session, self.session_id, speech.add_sentence, template_id, clinic
+                ).result()
+            speech.metrics["turn_ms"] = (time.perf_counter() - started) * 1000
+            self.deliver(result, speech)
+        except admission.Overloaded as e:
+            speech.finish()
+            self.send_event("error", message=str(e), retry_after=e.retry_after)
+        except Exception as e:
+            speech.finish()
+            self.send_event("error", message=f"Error starting session: {e}")
+
+    def run_audio_turn(self, decoder, speech_ended, cancel):
+        try:
+            decoder["thread"].join()
+            if decoder["error"] is not None:
+                raise decoder["error"]
+            pcm, sample_rate = bytes(decoder["pcm"]), decoder["sample_rate"] or STT_SAMPLE_RATE
+            text = pipeline.stt.submit(self.services.transcribe_pcm, pcm, sample_rate).result()
+            metrics = {"stt_ms": (time.perf_counter() - speech_ended) * 1000}
+            self.send_event("transcript", text=text)
+            completeness = self.speculative_verdict(decoder, text, metrics)
+            self.run_text_turn(text, speech_ended, cancel, metrics, completeness)
+        except Exception as e:
+            self.send_event("error", message=f"Error processing audio: {e}")
+
+    def run_text_turn(self, text, speech_ended, cancel, metrics=None, completeness=None):
+        speech = SpeechStream(self, cancel, speech_ended, dict(metrics or {}))
+        try:
+            started = time.perf_counter()
+            with admission.interview.admit(admission.TURN):
+                result = pipeline.llm.submit(
+                    self.services.handle_turn, self.session_id, text, self.current_field,
+                    None, speech.add_sentence, completeness
+                ).result()
+            speech.metrics["turn_ms"] = (time.perf_counter() - started) * 1000
+            self.deliver(result, speech)
+        except admission.Overloaded as e:
+            speech.finish()
+            self.send_event("error", message=str(e), retry_after=e.retry_after)
+        except Exception as e:
+            speech.finish()
+            self.send_event("error", message=f"Error processing response: {e}")
+
+    def deliver(self, result, speech):
+        """Send the question and finish speaking it unless interrupted"""
+        self.current_field = result.get("current_field")
+        self.send_event("question", **{k: v for k, v in result.items() if k != "schema"})
+
+        # Cached turns and non-streamed replies arrive without sentence callbacks
+        question = result.get("question")
+        if question and not speech.sentences:
+            speech.add_sentence(question)
+        speech.finish()
+        metrics = speech.metrics
+        metrics.setdefault("total_ms", (time.perf_counter() - speech.speech_ended) * 1000)
+        self.send_event("metrics", **{
+            k: round(v, 1) if isinstance(v, float) else v for k, v in metrics.items()
+        })
+
+    def render_speech(self, text):
+        return b"".join(self.services.stream_speech(text, self.output_format))
+
+
+class SpeechStream:
+    """Speaks a question sentence by sentence while it is still being generated.
+
+    Each sentence is rendered on the TTS stage as soon as the LLM finishes it;
+    a sender thread delivers the audio in order, so TTS of the first sentence
+    overlaps generation of the rest.
+    """
+
+    def __init__(self, socket, cancel, speech_ended, metrics):
+        self.socket = socket
+        self.cancel = cancel
+        self.speech_ended = speech_ended
+        self.metrics = metrics
+        self.sentences = []
+        self.pending = queue.Queue()
+        self.sender = threading.Thread(target=self.send_loop, daemon=True)
+        self.sender.start()
+
+    def add_sentence(self, sentence):
+        if not self.sentences:
+            self.tts_started = time.perf_counter()
+        self.sentences.append(sentence)
+        if not self.cancel.is_set():
+            self.pending.put((sentence, pipeline.tts.submit(self.socket.render_speech, sentence)))
+
+    def finish(self):
+        self.pending.put(None)
+        self.sender.join()
+
+    def send_loop(self):
+        sent = 0
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            sentence, audio = item
+            if self.cancel.is_set():
+                continue
+            try:
+                data = audio.result()
+            except Exception as e:
+                self.socket.send_event("error", message=f"Error in text-to-speech: {e}")
+                continue
+            if self.cancel.is_set():
+                continue
+            if not sent:
+                now = time.perf_counter()
+                self.metrics["tts_first_byte_ms"] = (now - self.tts_started) * 1000
+                self.metrics["total_ms"] = (now - self.speech_ended) * 1000
+                self.socket.send_event("audio_start", mimetype=mimetype_for(self.socket.output_format))
+            self.socket.send_event("segment", text=sentence)
+            self.socket.send_audio(data)
+            sent += 1
+        if self.cancel.is_set() and sent < len(self.sentences):
+            self.socket.send_event("audio_cancelled")
+        elif sent:
+            self.socket.send_event("audio_end")
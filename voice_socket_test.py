@@ -0,0 +1,132 @@
+import json
+import time
+import threading
+
+import pytest
+from simple_websocket import Client
+from werkzeug.serving import make_server
+
+import voice_api
+import voice_socket
+
+
+@pytest.fixture
+def server(session_dir, fake_llm, monkeypatch):
+    def fake_first_question(field, on_sentence=None):
+        if on_sentence:
+            on_sentence("Hello there.")
+            time.sleep(0.2)  # the rest of the reply is still being generated
+            on_sentence("What brings you in today?")
+        return "Hello there. What brings you in today?"
+
+    monkeypatch.setattr(voice_api, "generate_first_question", fake_first_question)
+    monkeypatch.setattr(voice_api, "transcribe_pcm", lambda pcm, rate: "I have a bad headache")
+
+    def fake_speech(text, output_format):
+        for _ in range(10):
+            time.sleep(0.01)
+            yield b"\x00" * 64
+
+    monkeypatch.setattr(voice_api, "stream_speech", fake_speech)
+    httpd = make_server("127.0.0.1", 0, voice_api.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"ws://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+def receive_until(ws, event_type, timeout=5):
+    """Collect messages until an event of the given type arrives"""
+    messages = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        message = ws.receive(timeout=deadline - time.time())
+        if message is None:
+            break
+        if isinstance(message, bytes):
+            messages.append(message)
+            continue
+        event = json.loads(message)
+        messages.append(event)
+        if event["type"] == event_type:
+            return messages
+    raise AssertionError(f"No {event_type} event received: {messages}")
+
+
+def events(messages, event_type):
+    return [m for m in messages if isinstance(m, dict) and m["type"] == event_type]
+
+
+def fake_decode(chunks, mimetype):
+    for chunk in chunks:
+        yield chunk, 16000
+
+
+def test_start_speaks_first_question(server):
+    ws = Client.connect(f"{server}/ws/interview/ws-start")
+    ws.send(json.dumps({"type": "start"}))
+    messages = receive_until(ws, "metrics")
+    ws.close()
+
+    assert events(messages, "question")[0]["question"] == "Hello there. What brings you in today?"
+    assert [e["text"] for e in events(messages, "segment")] == ["Hello there.", "What brings you in today?"]
+    assert events(messages, "audio_end")
+    assert [len(m) for m in messages if isinstance(m, bytes)] == [10 * 64, 10 * 64]
+
+
+def test_audio_turn_runs_stt_turn_and_tts(server, fake_llm, monkeypatch):
+    monkeypatch.setattr(voice_socket, "decode_stream", fake_decode)
+    ws = Client.connect(f"{server}/ws/interview/ws-audio")
+    ws.send(json.dumps({"type": "audio_start", "mimetype": "audio/webm"}))
+    ws.send(b"\x01" * 320)
+    ws.send(b"\x02" * 320)
+    ws.send(json.dumps({"type": "audio_end"}))
+    messages = receive_until(ws, "metrics")
+    ws.close()
+
+    assert events(messages, "transcript")[0]["text"] == "I have a bad headache"
+    question = events(messages, "question")[0]
+    assert question["changed"] == {"chief_complaint": "headache"}
+    assert question["current_field"] == "duration"
+    metrics = events(messages, "metrics")[0]
+    assert {"stt_ms", "turn_ms", "tts_first_byte_ms", "total_ms"} <= set(metrics)
+
+
+def test_partial_hypothesis_starts_completeness_check(server, fake_llm, monkeypatch):
+    monkeypatch.setattr(voice_socket, "decode_stream", fake_decode)
+    monkeypatch.setattr(voice_socket, "PARTIAL_HYPOTHESIS_SECONDS", 0.015)
+    ws = Client.connect(f"{server}/ws/interview/ws-speculate")
+    ws.send(json.dumps({"type": "start"}))
+    receive_until(ws, "metrics")
+    ws.send(json.dumps({"type": "audio_start", "mimetype": "audio/webm"}))
+    ws.send(b"\x01" * 320)
+    ws.send(b"\x02" * 320)
+    time.sleep(0.2)
+    ws.send(json.dumps({"type": "audio_end"}))
+    messages = receive_until(ws, "metrics")
+    ws.close()
+
+    assert events(messages, "metrics")[0]["speculation_hit"] is True
+    # The verdict from the partial transcript is reused, not asked for again
+    assert fake_llm["needs_follow_up"] == 1
+    assert events(messages, "question")[0]["current_field"] == "duration"
+
+
+def test_barge_in_cancels_speech(server):
+    ws = Client.connect(f"{server}/ws/interview/ws-barge")
+    ws.send(json.dumps({"type": "start"}))
+    receive_until(ws, "audio_start")
+    ws.send(json.dumps({"type": "barge_in"}))
+    messages = receive_until(ws, "metrics")
+    ws.close()
+
+    assert events(messages, "audio_cancelled")
+    assert not events(messages, "audio_end")
+
+
+def test_unknown_message_type(server):
+    ws = Client.connect(f"{server}/ws/interview/ws-bad")
+    ws.send(json.dumps({"type": "nope"}))
+    messages = receive_until(ws, "error")
+    ws.close()
+
+    assert "Unknown message type" in messages[-1]["message"]